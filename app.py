@@ -1,8 +1,34 @@
+import os
 import tkinter as tk
-from tkinter import ttk, messagebox
-import oracledb
+from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
 import re
+from dal import UNIQUE_VIOLATION, BatchError, DataError, open_driver
+from dal.metrics import InstrumentedDriver, Metrics, instrumented
+from db_worker import DBWorker
+from audit_drainer import AuditDrainer, interval_from_env
+from gear_cache import GearCatalog
+import gear_import
+from widgets import PagedGrid
+
+
+def db_error_code(e):
+    """Return the ORA error code of a database exception, or None for other errors."""
+    if isinstance(e, DataError):
+        return e.code
+    return None
+
+
+# Reports tab: report name -> (title, column headings), in the column order of dal.base.REPORTS
+REPORT_LAYOUTS = {
+    "revenue_by_gear": ("Revenue by Gear", ("Gear ID", "Name", "Category", "Rentals", "Subscriptions", "Total")),
+    "utilization": ("Utilization by Category", ("Category", "Items", "Units in Stock", "Active Rentals",
+                                                "Total Rentals", "Rented Days", "Utilization %",
+                                                "Active Subscriptions")),
+    "revenue_by_month": ("Revenue by Month", ("Month", "Rentals", "Subscriptions", "Penalties", "Total")),
+    "penalties": ("Penalties", ("Status", "Count", "Amount")),
+}
+
 
 class RentalSystemApp:
     def __init__(self, root):
@@ -10,26 +36,84 @@ class RentalSystemApp:
         self.root.title("Tech Gear Rental System")
         self.root.geometry("1000x600")
         
-        # Database connection
+        # Database driver (backend and settings come from RENTAL_DB_* environment variables),
+        # with every call timed for the Diagnostics tab (RENTAL_SLOW_QUERY_MS, RENTAL_SLOW_QUERY_LOG)
+        self.metrics = Metrics.from_env()
         try:
-            self.conn = oracledb.connect(user="DEISHAUN", password="4313", dsn="localhost/xepdb1")
-            self.cursor = self.conn.cursor()
-        except oracledb.Error as e:
+            self.db = InstrumentedDriver(open_driver(), self.metrics)
+        except DataError as e:
             messagebox.showerror("Database Error", f"Failed to connect: {e}")
             self.root.destroy()
             return
         
+        # Background worker for database calls, one thread per concurrent session
+        self.worker = DBWorker(self.root, max_workers=self.db.max_concurrency, on_busy_change=self.update_busy_indicator)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Gear pages kept in memory across tab switches and logins (TTL from RENTAL_GEAR_CACHE_TTL)
+        self.gear_catalog = GearCatalog(self.db)
+        
+        # Drain the async audit queue in the background if RENTAL_AUDIT_FLUSH_INTERVAL is set
+        self.audit_drainer = None
+        interval = interval_from_env()
+        if interval:
+            self.audit_drainer = AuditDrainer(self.db, interval)
+            self.audit_drainer.start()
+        
         # User session
         self.current_user_id = None
         self.current_role = None
         
+        # Status bar showing in-flight database calls
+        self.status_var = tk.StringVar()
+        ttk.Label(self.root, textvariable=self.status_var, anchor="w").pack(side="bottom", fill="x", padx=10)
+        
         # Create main container
         self.container = ttk.Frame(self.root)
         self.container.pack(fill="both", expand=True, padx=10, pady=10)
         
         # Login screen
         self.show_login_screen()
-    
+
+    def update_busy_indicator(self, in_flight):
+        if in_flight:
+            self.status_var.set(f"Working... ({in_flight} database call{'s' if in_flight > 1 else ''} in progress)")
+            self.root.config(cursor="watch")
+        else:
+            self.status_var.set("")
+            self.root.config(cursor="")
+
+    def on_tab_changed(self, event):
+        # Drop queued or running refreshes for the tab the user just left
+        current = self.notebook.nametowidget(self.notebook.select())
+        previous = getattr(self, "current_tab", None)
+        if previous is not None and previous is not current:
+            if self.worker.cancel(self.tab_tags.get(previous)):
+                self.stale_tabs.add(previous)
+        self.current_tab = current
+        
+        # A tab whose refresh was cancelled reloads when the user comes back to it
+        if current in self.stale_tabs:
+            self.stale_tabs.discard(current)
+            self.tab_refreshers[current]()
+        elif current is self.diagnostics_tab:
+            # Read from memory, so shown fresh every time
+            self.refresh_diagnostics()
+
+    def on_close(self):
+        self.worker.shutdown()
+        if self.audit_drainer:
+            self.audit_drainer.stop()
+        self.db.close()
+        # Keep the session's metrics for later comparison if RENTAL_METRICS_FILE is set
+        metrics_file = os.environ.get("RENTAL_METRICS_FILE")
+        if metrics_file:
+            try:
+                self.metrics.export(metrics_file)
+            except OSError:
+                pass
+        self.root.destroy()
+
     def show_login_screen(self):
         # Clear container
         for widget in self.container.winfo_children():
@@ -55,6 +139,7 @@ class RentalSystemApp:
         # Register button
         ttk.Button(login_frame, text="Register", command=self.show_register_screen).grid(row=3, column=0, columnspan=2, pady=5)
     
+    @instrumented
     def handle_login(self):
         email = self.email_entry.get().strip()
         password = self.password_entry.get().strip()
@@ -63,23 +148,26 @@ class RentalSystemApp:
             messagebox.showerror("Error", "Email and password are required")
             return
         
-        try:
-            self.cursor.execute("SELECT pkg_user_ops.verify_user(:email, :password) FROM dual",
-                             {"email": email, "password": password})
-            user_id = self.cursor.fetchone()[0]
-            
+        def work():
+            user_id = self.db.verify_user(email, password)
             if user_id == 0:
+                return None
+            # Fetch user role
+            return user_id, self.db.get_user_role(user_id)
+
+        def done(result):
+            if result is None:
                 messagebox.showerror("Error", "Invalid email or password")
                 return
-            
-            # Fetch user role
-            self.cursor.execute("SELECT role FROM Users WHERE user_id = :id", {"id": user_id})
-            self.current_role = self.cursor.fetchone()[0]
-            self.current_user_id = user_id
-            
+            self.current_user_id, self.current_role = result
+            # Shows up as CLIENT_IDENTIFIER on the Oracle sessions running this user's calls
+            self.metrics.client_identifier = email
             self.show_main_app()
-        except oracledb.Error as e:
+
+        def failed(e):
             messagebox.showerror("Database Error", f"Login failed: {e}")
+
+        self.worker.submit(work, on_success=done, on_error=failed)
     
     def show_register_screen(self):
         # Clear container
@@ -120,6 +208,7 @@ class RentalSystemApp:
         ttk.Button(reg_frame, text="Register", command=self.handle_register).grid(row=5, column=0, pady=10)
         ttk.Button(reg_frame, text="Back to Login", command=self.show_login_screen).grid(row=5, column=1, pady=10)
     
+    @instrumented
     def handle_register(self):
         name = self.reg_name.get().strip()
         email = self.reg_email.get().strip()
@@ -135,28 +224,26 @@ class RentalSystemApp:
             messagebox.showerror("Error", "Invalid email format")
             return
         
-        try:
-            self.cursor.execute("""
-                BEGIN
-                    pkg_user_ops.register_user(:name, :email, :phone, :password, :role);
-                    COMMIT;
-                END;
-            """, {"name": name, "email": email, "phone": phone, "password": password, "role": role})
+        def done(_):
             messagebox.showinfo("Success", "Registration successful! Please login.")
             self.show_login_screen()
-        except oracledb.Error as e:
-            error_code = e.args[0].code
+
+        def failed(e):
+            error_code = db_error_code(e)
             if error_code == 20014:
                 messagebox.showerror("Error", "Name and email are required")
             elif error_code == 20054:
                 messagebox.showerror("Error", "Password is required")
             elif error_code == 20055:
                 messagebox.showerror("Error", "Invalid role")
-            elif "ORA-00001" in e.args[0].message:
+            elif error_code == UNIQUE_VIOLATION:
                 messagebox.showerror("Error", "Email already registered")
             else:
                 messagebox.showerror("Database Error", f"Registration failed: {e}")
-    
+
+        self.worker.submit(self.db.register_user, name, email, phone, password, role,
+                           on_success=done, on_error=failed)
+
     def show_main_app(self):
         # Clear container
         for widget in self.container.winfo_children():
@@ -174,6 +261,8 @@ class RentalSystemApp:
         self.payment_tab = ttk.Frame(self.notebook)
         self.penalty_tab = ttk.Frame(self.notebook)
         self.audit_tab = ttk.Frame(self.notebook)
+        self.report_tab = ttk.Frame(self.notebook)
+        self.diagnostics_tab = ttk.Frame(self.notebook)
         
         self.notebook.add(self.user_tab, text="Users")
         self.notebook.add(self.gear_tab, text="Gear")
@@ -183,6 +272,35 @@ class RentalSystemApp:
         self.notebook.add(self.penalty_tab, text="Penalties")
         if self.current_role == "ADMIN":
             self.notebook.add(self.audit_tab, text="Audit Log")
+            self.notebook.add(self.report_tab, text="Reports")
+            self.notebook.add(self.diagnostics_tab, text="Diagnostics")
+        
+        # Worker tags per tab, so leaving a tab cancels its pending refreshes
+        self.tab_tags = {
+            self.user_tab: "users",
+            self.gear_tab: "gear",
+            self.rental_tab: "rentals",
+            self.subscription_tab: "subscriptions",
+            self.payment_tab: "payments",
+            self.penalty_tab: "penalties",
+            self.audit_tab: "audit",
+            self.report_tab: "reports",
+            self.diagnostics_tab: "diagnostics",
+        }
+        self.tab_refreshers = {
+            self.user_tab: self.refresh_user_info,
+            self.gear_tab: self.refresh_gear,
+            self.rental_tab: self.refresh_rentals,
+            self.subscription_tab: self.refresh_subscriptions,
+            self.payment_tab: self.refresh_payments,
+            self.penalty_tab: self.refresh_penalties,
+            self.audit_tab: self.refresh_audit,
+            self.report_tab: self.refresh_report,
+            self.diagnostics_tab: self.refresh_diagnostics,
+        }
+        self.stale_tabs = set()
+        self.current_tab = self.user_tab
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
         
         # Logout button
         ttk.Button(self.container, text="Logout", command=self.logout).pack(pady=5)
@@ -196,10 +314,28 @@ class RentalSystemApp:
         self.setup_penalty_tab()
         if self.current_role == "ADMIN":
             self.setup_audit_tab()
+            self.setup_report_tab()
+            self.setup_diagnostics_tab()
+            
+            # Admin menu
+            menubar = tk.Menu(self.root)
+            gear_menu = tk.Menu(menubar, tearoff=0)
+            gear_menu.add_command(label="Import from File...", command=self.import_gear_file)
+            menubar.add_cascade(label="Gear", menu=gear_menu)
+            sub_menu = tk.Menu(menubar, tearoff=0)
+            sub_menu.add_command(label="Expire Lapsed Subscriptions", command=self.expire_subscriptions)
+            menubar.add_cascade(label="Subscriptions", menu=sub_menu)
+            penalty_menu = tk.Menu(menubar, tearoff=0)
+            penalty_menu.add_command(label="Charge Overdue Rentals", command=self.sweep_overdue)
+            menubar.add_cascade(label="Penalties", menu=penalty_menu)
+            self.root.config(menu=menubar)
     
     def logout(self):
+        self.worker.cancel()
+        self.root.config(menu="")
         self.current_user_id = None
         self.current_role = None
+        self.metrics.client_identifier = None
         self.show_login_screen()
     
     def setup_user_tab(self):
@@ -217,40 +353,52 @@ class RentalSystemApp:
         
         self.refresh_user_info()
     
+    @instrumented
     def refresh_user_info(self):
-        try:
-            self.cursor.execute("SELECT pkg_user_ops.get_user_info(:id) FROM dual",
-                             {"id": self.current_user_id})
-            info = self.cursor.fetchone()[0]
+        def done(info):
             self.user_info.config(state="normal")
             self.user_info.delete(1.0, tk.END)
             self.user_info.insert(tk.END, info)
             self.user_info.config(state="disabled")
-        except oracledb.Error as e:
+
+        def failed(e):
             messagebox.showerror("Database Error", f"Failed to fetch user info: {e}")
+
+        self.worker.submit(self.db.get_user_info, self.current_user_id, on_success=done, on_error=failed, tag="users")
     
+    @instrumented
     def deactivate_user(self):
-        if messagebox.askyesno("Confirm", "Are you sure you want to deactivate your account?"):
-            try:
-                self.cursor.execute("""
-                    BEGIN
-                        pkg_user_ops.deactivate_user(:id);
-                        COMMIT;
-                    END;
-                """, {"id": self.current_user_id})
-                messagebox.showinfo("Success", "Account deactivated")
-                self.logout()
-            except oracledb.Error as e:
-                error_code = e.args[0].code
-                if error_code == 20015:
-                    messagebox.showerror("Error", "User does not exist")
-                else:
-                    messagebox.showerror("Database Error", f"Deactivation failed: {e}")
+        if not messagebox.askyesno("Confirm", "Are you sure you want to deactivate your account?"):
+            return
+
+        def done(_):
+            messagebox.showinfo("Success", "Account deactivated")
+            self.logout()
+
+        def failed(e):
+            error_code = db_error_code(e)
+            if error_code == 20015:
+                messagebox.showerror("Error", "User does not exist")
+            else:
+                messagebox.showerror("Database Error", f"Deactivation failed: {e}")
+
+        self.worker.submit(self.db.deactivate_user, self.current_user_id, on_success=done, on_error=failed)
     
     def setup_gear_tab(self):
         frame = ttk.LabelFrame(self.gear_tab, text="Gear Management")
         frame.pack(fill="both", expand=True, padx=5, pady=5)
         
+        # Free-text search: while one is active the list shows its matches, best first
+        self.gear_search = None
+        search_frame = ttk.Frame(frame)
+        search_frame.pack(fill="x", padx=5, pady=(5, 0))
+        ttk.Label(search_frame, text="Search:").pack(side="left", padx=5)
+        self.gear_search_text = ttk.Entry(search_frame, width=40)
+        self.gear_search_text.pack(side="left", padx=5)
+        self.gear_search_text.bind("<Return>", lambda event: self.search_gear())
+        ttk.Button(search_frame, text="Search", command=self.search_gear).pack(side="left", padx=5)
+        ttk.Button(search_frame, text="Clear", command=self.clear_gear_search).pack(side="left", padx=5)
+        
         # Gear list with scrollbar
         tree_frame = ttk.Frame(frame)
         tree_frame.pack(fill="both", expand=True, padx=5, pady=5)
@@ -283,10 +431,19 @@ class RentalSystemApp:
         hsb = ttk.Scrollbar(tree_frame, orient="horizontal", command=self.gear_tree.xview)
         self.gear_tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
         
-        self.gear_tree.grid(row=0, column=0, sticky="nsew")
-        vsb.grid(row=0, column=1, sticky="ns")
-        hsb.grid(row=1, column=0, sticky="ew")
-        tree_frame.grid_rowconfigure(0, weight=1)
+        # Sorted, filtered and paged in the database; the tree holds one page, served
+        # from the gear cache until its TTL runs out or a change of ours invalidates it
+        fields = ("gear_id", "name", "category", "brand", "rent_price_per_day", "sub_price_per_month", "stock")
+        self.gear_grid = PagedGrid(self.gear_tree, fields[:len(columns)], self.worker, "gear",
+                                   lambda *page: self.gear_catalog.page(*page, search=self.gear_search),
+                                   on_error=lambda e: messagebox.showerror("Database Error", f"Failed to fetch gear: {e}"))
+        
+        self.gear_grid.filter_bar.grid(row=0, column=0, sticky="ew")
+        self.gear_tree.grid(row=1, column=0, sticky="nsew")
+        vsb.grid(row=1, column=1, sticky="ns")
+        hsb.grid(row=2, column=0, sticky="ew")
+        self.gear_grid.page_bar.grid(row=3, column=0, sticky="w")
+        tree_frame.grid_rowconfigure(1, weight=1)
         tree_frame.grid_columnconfigure(0, weight=1)
         
         # Admin add gear
@@ -337,19 +494,21 @@ class RentalSystemApp:
         ttk.Button(frame, text="Refresh", command=self.refresh_gear).pack(pady=5)
         self.refresh_gear()
     
+    @instrumented
     def refresh_gear(self):
-        for item in self.gear_tree.get_children():
-            self.gear_tree.delete(item)
-        try:
-            self.cursor.execute("SELECT gear_id, name, category, brand, rent_price_per_day, sub_price_per_month, stock FROM v_available_gear")
-            for row in self.cursor:
-                if self.current_role == "ADMIN":
-                    self.gear_tree.insert("", tk.END, values=row)
-                else:
-                    self.gear_tree.insert("", tk.END, values=row[:-1])
-        except oracledb.Error as e:
-            messagebox.showerror("Database Error", f"Failed to fetch gear: {e}")
+        self.gear_grid.refresh()
+    
+    @instrumented
+    def search_gear(self):
+        self.gear_search = self.gear_search_text.get().strip() or None
+        self.gear_grid.reset()
+    
+    @instrumented
+    def clear_gear_search(self):
+        self.gear_search_text.delete(0, tk.END)
+        self.search_gear()
     
+    @instrumented
     def add_gear(self):
         name = self.gear_name.get().strip()
         category = self.gear_category.get().strip() or None
@@ -366,22 +525,9 @@ class RentalSystemApp:
             messagebox.showerror("Error", "Gear name is required")
             return
         
-        try:
-            self.cursor.execute("""
-                BEGIN
-                    pkg_gear_ops.add_gear(:user_id, :name, :category, :brand, :rent_price, :sub_price, :stock);
-                    COMMIT;
-                END;
-            """, {
-                "user_id": self.current_user_id,
-                "name": name,
-                "category": category,
-                "brand": brand,
-                "rent_price": rent_price,
-                "sub_price": sub_price,
-                "stock": stock
-            })
+        def done(_):
             messagebox.showinfo("Success", "Gear added successfully")
+            self.gear_catalog.invalidate()
             self.refresh_gear()
             # Clear entries
             self.gear_name.delete(0, tk.END)
@@ -390,8 +536,9 @@ class RentalSystemApp:
             self.gear_rent_price.delete(0, tk.END)
             self.gear_sub_price.delete(0, tk.END)
             self.gear_stock.delete(0, tk.END)
-        except oracledb.Error as e:
-            error_code = e.args[0].code
+
+        def failed(e):
+            error_code = db_error_code(e)
             if error_code == 20052:
                 messagebox.showerror("Error", "Only admins can add gear")
             elif error_code == 20016:
@@ -400,11 +547,15 @@ class RentalSystemApp:
                 messagebox.showerror("Error", "Prices and stock cannot be negative")
             elif error_code == 20015:
                 messagebox.showerror("Error", "User does not exist")
-            elif "ORA-00001" in e.args[0].message:
+            elif error_code == UNIQUE_VIOLATION:
                 messagebox.showerror("Error", "Gear name already exists")
             else:
                 messagebox.showerror("Database Error", f"Add gear failed: {e}")
+
+        self.worker.submit(self.db.add_gear, self.current_user_id, name, category, brand, rent_price, sub_price, stock,
+                           on_success=done, on_error=failed)
     
+    @instrumented
     def update_stock(self):
         try:
             gear_id = int(self.update_gear_id.get().strip())
@@ -413,28 +564,75 @@ class RentalSystemApp:
             messagebox.showerror("Error", "Gear ID and quantity must be valid numbers")
             return
         
-        try:
-            self.cursor.execute("""
-                BEGIN
-                    pkg_gear_ops.update_stock(:gear_id, :qty);
-                    COMMIT;
-                END;
-            """, {
-                "gear_id": gear_id,
-                "qty": qty
-            })
+        def done(_):
             messagebox.showinfo("Success", "Stock updated successfully")
+            self.gear_catalog.invalidate()
             self.refresh_gear()
             self.update_gear_id.delete(0, tk.END)
             self.update_qty.delete(0, tk.END)
-        except oracledb.Error as e:
-            error_code = e.args[0].code
+
+        def failed(e):
+            error_code = db_error_code(e)
             if error_code == 20018:
                 messagebox.showerror("Error", "Gear does not exist")
             elif error_code == 20019:
                 messagebox.showerror("Error", "Stock update failed")
             else:
                 messagebox.showerror("Database Error", f"Update stock failed: {e}")
+
+        self.worker.submit(self.db.update_stock, gear_id, qty, on_success=done, on_error=failed)
+    
+    @instrumented
+    def import_gear_file(self):
+        path = filedialog.askopenfilename(title="Import Gear",
+                                          filetypes=[("Gear files", "*.csv *.json *.jsonl"), ("All files", "*.*")])
+        if not path:
+            return
+        
+        # Progress comes from the worker thread; the Tk thread polls it into the status bar
+        progress = {"stats": None, "done": False}
+        errors = []
+        
+        def collect_error(number, error):
+            # Only the first few are kept for the summary, so memory stays flat for any file
+            if len(errors) < 20:
+                errors.append(f"Record {number}: {error}")
+        
+        def do_import():
+            return gear_import.import_gear(self.db, self.current_user_id, path, on_error=collect_error,
+                                           on_progress=lambda stats: progress.update(stats=str(stats)))
+        
+        def poll():
+            if progress["done"]:
+                return
+            if progress["stats"]:
+                self.status_var.set(f"Importing gear: {progress['stats']}")
+            self.root.after(200, poll)
+        
+        def done(stats):
+            progress["done"] = True
+            self.status_var.set("")
+            self.gear_catalog.invalidate()
+            self.refresh_gear()
+            summary = f"Import finished: {stats}"
+            if errors:
+                summary += "\n\n" + "\n".join(errors)
+                if stats.rejected > len(errors):
+                    summary += f"\n... and {stats.rejected - len(errors)} more"
+            messagebox.showinfo("Import Gear", summary)
+        
+        def failed(e):
+            progress["done"] = True
+            self.status_var.set("")
+            # Batches loaded before the failure stay committed
+            self.gear_catalog.invalidate()
+            if db_error_code(e) == 20052:
+                messagebox.showerror("Error", "Only admins can add gear")
+            else:
+                messagebox.showerror("Import Error", f"Import failed: {e}")
+        
+        self.worker.submit(do_import, on_success=done, on_error=failed)
+        poll()
     
     def setup_rental_tab(self):
         frame = ttk.LabelFrame(self.rental_tab, text="Rental Management")
@@ -469,17 +667,29 @@ class RentalSystemApp:
         hsb = ttk.Scrollbar(tree_frame, orient="horizontal", command=self.rental_tree.xview)
         self.rental_tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
         
-        self.rental_tree.grid(row=0, column=0, sticky="nsew")
-        vsb.grid(row=0, column=1, sticky="ns")
-        hsb.grid(row=1, column=0, sticky="ew")
-        tree_frame.grid_rowconfigure(0, weight=1)
+        # Sorted, filtered and paged in the database; customers only see their own rows
+        user_id = None if self.current_role == "ADMIN" else self.current_user_id
+        self.rental_grid = PagedGrid(self.rental_tree, ("rent_id", "user_name", "gear_name", "start_date", "end_date", "return_date", "status", "condition_returned"),
+                                     self.worker, "rentals", lambda *page: self.db.grid_page("rentals", *page, user_id=user_id),
+                                     on_error=lambda e: messagebox.showerror("Database Error", f"Failed to fetch rentals: {e}"))
+        
+        self.rental_grid.filter_bar.grid(row=0, column=0, sticky="ew")
+        self.rental_tree.grid(row=1, column=0, sticky="nsew")
+        vsb.grid(row=1, column=1, sticky="ns")
+        hsb.grid(row=2, column=0, sticky="ew")
+        self.rental_grid.page_bar.grid(row=3, column=0, sticky="w")
+        tree_frame.grid_rowconfigure(1, weight=1)
         tree_frame.grid_columnconfigure(0, weight=1)
         
+        # Unpaid rental charges and penalties, priced for every rental in one call
+        self.rental_due_var = tk.StringVar()
+        ttk.Label(frame, textvariable=self.rental_due_var).pack(pady=(0, 5))
+        
         # Rent gear
         rent_frame = ttk.LabelFrame(frame, text="Rent Gear")
         rent_frame.pack(fill="x", padx=5, pady=5)
         
-        ttk.Label(rent_frame, text="Gear ID:").grid(row=0, column=0, padx=5, pady=5)
+        ttk.Label(rent_frame, text="Gear ID(s), comma-separated:").grid(row=0, column=0, padx=5, pady=5)
         self.rent_gear_id = ttk.Entry(rent_frame)
         self.rent_gear_id.grid(row=0, column=1, padx=5, pady=5)
         
@@ -510,27 +720,26 @@ class RentalSystemApp:
         ttk.Button(frame, text="Refresh", command=self.refresh_rentals).pack(pady=5)
         self.refresh_rentals()
     
+    @instrumented
     def refresh_rentals(self):
-        for item in self.rental_tree.get_children():
-            self.rental_tree.delete(item)
-        try:
-            query = """
-                SELECT rent_id, user_name, gear_name, start_date, end_date, return_date, status, condition_returned 
-                FROM v_user_rentals
-            """
-            params = {}
-            if self.current_role != "ADMIN":
-                query += " WHERE user_id = :id AND status = 'RENTED'"
-                params["id"] = self.current_user_id
-            self.cursor.execute(query, params)
-            for row in self.cursor:
-                self.rental_tree.insert("", tk.END, values=row)
-        except oracledb.Error as e:
-            messagebox.showerror("Database Error", f"Failed to fetch rentals: {e}")
+        # Admins see every rental; customers only their active ones
+        user_id = None if self.current_role == "ADMIN" else self.current_user_id
+        self.worker.cancel("rentals")
+        self.rental_grid.refresh()
+        self.worker.submit(self.db.rental_billing, user_id, on_success=self.show_rental_due, tag="rentals")
     
+    def show_rental_due(self, rows):
+        owing = [row for row in rows if row[6]]
+        total = sum(row[6] for row in owing)
+        if owing:
+            self.rental_due_var.set(f"Amount due: ${total:.2f} across {len(owing)} rental{'s' if len(owing) > 1 else ''}")
+        else:
+            self.rental_due_var.set("Nothing due")
+    
+    @instrumented
     def rent_gear(self):
         try:
-            gear_id = int(self.rent_gear_id.get().strip())
+            gear_ids = [int(part) for part in self.rent_gear_id.get().split(",")]
             start_date = self.rent_start.get().strip()
             end_date = self.rent_end.get().strip() or None
         except ValueError:
@@ -544,40 +753,43 @@ class RentalSystemApp:
             messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format")
             return
         
-        try:
-            self.cursor.execute("""
-                BEGIN
-                    pkg_rental_ops.rent_gear(:user_id, :gear_id, TO_DATE(:start, 'YYYY-MM-DD'), 
-                                             TO_DATE(:end, 'YYYY-MM-DD'));
-                    COMMIT;
-                END;
-            """, {
-                "user_id": self.current_user_id,
-                "gear_id": gear_id,
-                "start": start_date,
-                "end": end_date
-            })
-            messagebox.showinfo("Success", "Gear rented successfully")
+        def done(_):
+            messagebox.showinfo("Success", "Gear rented successfully" if len(gear_ids) == 1 else f"{len(gear_ids)} items rented successfully")
             self.refresh_rentals()
+            self.gear_catalog.invalidate()
             self.refresh_gear()
             self.rent_gear_id.delete(0, tk.END)
             self.rent_start.delete(0, tk.END)
             self.rent_end.delete(0, tk.END)
-        except oracledb.Error as e:
-            error_code = e.args[0].code
-            if error_code == 20021:
-                messagebox.showerror("Error", "User does not exist")
-            elif error_code == 20022:
-                messagebox.showerror("Error", "Gear does not exist")
-            elif error_code == 20023:
-                messagebox.showerror("Error", "Gear not available for rent")
-            elif error_code == 20053:
-                messagebox.showerror("Error", "User has reached rental limit of 3 active rentals")
-            elif "ORA-00001" in e.args[0].message:
-                messagebox.showerror("Error", "Rental already exists for this user, gear, and start date")
+
+        def failed(e):
+            if isinstance(e, BatchError):
+                # Nothing was rented; list what is wrong with each rejected item
+                lines = [f"Gear {gear_ids[i]}: {self.rent_error_message(error) or error}" for i, error in sorted(e.errors.items())]
+                messagebox.showerror("Error", "No items were rented:\n" + "\n".join(lines))
+            elif self.rent_error_message(e):
+                messagebox.showerror("Error", self.rent_error_message(e))
             else:
                 messagebox.showerror("Database Error", f"Rent gear failed: {e}")
+
+        # A kit of several items is rented in one transaction and one round trip
+        if len(gear_ids) == 1:
+            self.worker.submit(self.db.rent_gear, self.current_user_id, gear_ids[0], start, end,
+                               on_success=done, on_error=failed)
+        else:
+            self.worker.submit(self.db.rent_gear_batch, self.current_user_id, [(gear_id, start, end) for gear_id in gear_ids],
+                               on_success=done, on_error=failed)
+    
+    def rent_error_message(self, e):
+        return {
+            20021: "User does not exist",
+            20022: "Gear does not exist",
+            20023: "Gear not available for rent",
+            20053: "User has reached rental limit of 3 active rentals",
+            UNIQUE_VIOLATION: "Rental already exists for this user, gear, and start date",
+        }.get(db_error_code(e))
     
+    @instrumented
     def return_gear(self):
         try:
             rent_id = int(self.return_rent_id.get().strip())
@@ -590,44 +802,32 @@ class RentalSystemApp:
             messagebox.showerror("Error", "Condition is required")
             return
         
-        try:
+        def do_return():
             # Calculate rental charge
-            self.cursor.execute("SELECT pkg_rental_ops.calc_rental_charge(:rent_id) FROM dual",
-                             {"rent_id": rent_id})
-            charge = self.cursor.fetchone()[0]
+            charge = self.db.calc_rental_charge(rent_id)
             
             # Return gear
-            self.cursor.execute("""
-                BEGIN
-                    pkg_rental_ops.return_gear(:rent_id, SYSDATE, :condition);
-                    COMMIT;
-                END;
-            """, {"rent_id": rent_id, "condition": condition})
-            
+            self.db.return_gear(rent_id, condition)
+            return charge
+
+        def returned(charge):
             # Prompt for payment
             if messagebox.askyesno("Payment Required", f"Rental charge: ${charge:.2f}. Proceed with payment?"):
-                self.cursor.execute("""
-                    BEGIN
-                        pkg_payment_gateway.make_payment(:user_id, :type, :ref_id, :amount);
-                        COMMIT;
-                    END;
-                """, {
-                    "user_id": self.current_user_id,
-                    "type": "RENTAL",
-                    "ref_id": rent_id,
-                    "amount": charge
-                })
-                messagebox.showinfo("Success", "Gear returned and payment made successfully")
+                self.worker.submit(self.db.make_payment, self.current_user_id, "RENTAL", rent_id, charge,
+                                   on_success=lambda _: messagebox.showinfo("Success", "Gear returned and payment made successfully"),
+                                   on_error=failed)
             else:
                 messagebox.showwarning("Warning", "Payment not made. Gear returned, but payment is pending.")
             
             self.refresh_rentals()
+            self.gear_catalog.invalidate()
             self.refresh_gear()
             self.refresh_penalties()
             self.return_rent_id.delete(0, tk.END)
             self.return_condition.set("")
-        except oracledb.Error as e:
-            error_code = e.args[0].code
+
+        def failed(e):
+            error_code = db_error_code(e)
             if error_code == 20024:
                 messagebox.showerror("Error", "Rental does not exist")
             elif error_code == 20056:
@@ -644,6 +844,8 @@ class RentalSystemApp:
                 messagebox.showerror("Error", "Invalid reference for payment")
             else:
                 messagebox.showerror("Database Error", f"Return gear failed: {e}")
+
+        self.worker.submit(do_return, on_success=returned, on_error=failed)
     
     def setup_subscription_tab(self):
         frame = ttk.LabelFrame(self.subscription_tab, text="Subscription Management")
@@ -674,10 +876,18 @@ class RentalSystemApp:
         hsb = ttk.Scrollbar(tree_frame, orient="horizontal", command=self.sub_tree.xview)
         self.sub_tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
         
-        self.sub_tree.grid(row=0, column=0, sticky="nsew")
-        vsb.grid(row=0, column=1, sticky="ns")
-        hsb.grid(row=1, column=0, sticky="ew")
-        tree_frame.grid_rowconfigure(0, weight=1)
+        # Sorted, filtered and paged in the database; customers only see their own rows
+        user_id = None if self.current_role == "ADMIN" else self.current_user_id
+        self.sub_grid = PagedGrid(self.sub_tree, ("sub_id", "user_name", "gear_name", "start_date", "end_date", "is_active"),
+                                     self.worker, "subscriptions", lambda *page: self.db.grid_page("subscriptions", *page, user_id=user_id),
+                                     on_error=lambda e: messagebox.showerror("Database Error", f"Failed to fetch subscriptions: {e}"))
+        
+        self.sub_grid.filter_bar.grid(row=0, column=0, sticky="ew")
+        self.sub_tree.grid(row=1, column=0, sticky="nsew")
+        vsb.grid(row=1, column=1, sticky="ns")
+        hsb.grid(row=2, column=0, sticky="ew")
+        self.sub_grid.page_bar.grid(row=3, column=0, sticky="w")
+        tree_frame.grid_rowconfigure(1, weight=1)
         tree_frame.grid_columnconfigure(0, weight=1)
         
         # Subscribe
@@ -711,21 +921,11 @@ class RentalSystemApp:
         ttk.Button(frame, text="Refresh", command=self.refresh_subscriptions).pack(pady=5)
         self.refresh_subscriptions()
     
+    @instrumented
     def refresh_subscriptions(self):
-        for item in self.sub_tree.get_children():
-            self.sub_tree.delete(item)
-        try:
-            query = "SELECT sub_id, user_name, gear_name, start_date, end_date, is_active FROM v_user_subscriptions"
-            params = {}
-            if self.current_role != "ADMIN":
-                query += " WHERE user_id = :id AND is_active = 'Y'"
-                params["id"] = self.current_user_id
-            self.cursor.execute(query, params)
-            for row in self.cursor:
-                self.sub_tree.insert("", tk.END, values=row)
-        except oracledb.Error as e:
-            messagebox.showerror("Database Error", f"Failed to fetch subscriptions: {e}")
+        self.sub_grid.refresh()
     
+    @instrumented
     def subscribe_gear(self):
         try:
             gear_id = int(self.sub_gear_id.get().strip())
@@ -742,26 +942,15 @@ class RentalSystemApp:
             messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format")
             return
         
-        try:
-            self.cursor.execute("""
-                BEGIN
-                    pkg_subscription_service.subscribe_gear(:user_id, :gear_id, 
-                        TO_DATE(:start, 'YYYY-MM-DD'), TO_DATE(:end, 'YYYY-MM-DD'));
-                    COMMIT;
-                END;
-            """, {
-                "user_id": self.current_user_id,
-                "gear_id": gear_id,
-                "start": start_date,
-                "end": end_date
-            })
+        def done(_):
             messagebox.showinfo("Success", "Subscribed successfully")
             self.refresh_subscriptions()
             self.sub_gear_id.delete(0, tk.END)
             self.sub_start.delete(0, tk.END)
             self.sub_end.delete(0, tk.END)
-        except oracledb.Error as e:
-            error_code = e.args[0].code
+
+        def failed(e):
+            error_code = db_error_code(e)
             if error_code == 20026:
                 messagebox.showerror("Error", "User does not exist")
             elif error_code == 20027:
@@ -770,11 +959,15 @@ class RentalSystemApp:
                 messagebox.showerror("Error", "End date cannot be before start date")
             elif error_code == 20029:
                 messagebox.showerror("Error", "User already has an active subscription for this gear")
-            elif "ORA-00001" in e.args[0].message:
+            elif error_code == UNIQUE_VIOLATION:
                 messagebox.showerror("Error", "Subscription already exists for this user, gear, and start date")
             else:
                 messagebox.showerror("Database Error", f"Subscription failed: {e}")
+
+        self.worker.submit(self.db.subscribe_gear, self.current_user_id, gear_id, start, end,
+                           on_success=done, on_error=failed)
     
+    @instrumented
     def cancel_subscription(self):
         try:
             sub_id = int(self.cancel_sub_id.get().strip())
@@ -782,63 +975,34 @@ class RentalSystemApp:
             messagebox.showerror("Error", "Subscription ID must be a number")
             return
         
-        try:
-            # Check if subscription exists
-            self.cursor.execute("""
-                SELECT COUNT(*) 
-                FROM Subscriptions 
-                WHERE sub_id = :sub_id
-            """, {"sub_id": sub_id})
-            exists = self.cursor.fetchone()[0]
-            if exists == 0:
-                messagebox.showerror("Error", "Subscription does not exist")
-                return
-            
+        def do_cancel():
             # Calculate subscription charge (days used * rent_price_per_day)
-            self.cursor.execute("""
-                SELECT s.start_date, NVL(s.end_date, SYSDATE), g.rent_price_per_day
-                FROM Subscriptions s
-                JOIN Gear g ON s.gear_id = g.gear_id
-                WHERE s.sub_id = :sub_id
-            """, {"sub_id": sub_id})
-            result = self.cursor.fetchone()
-            if result:
-                start_date, end_date, rent_price = result
-                days_used = (end_date - start_date).days + 1
-                charge = days_used * rent_price
-            else:
-                messagebox.showerror("Error", "Failed to fetch subscription details")
-                return
+            charge = self.db.calc_subscription_charge(sub_id)
+            if charge is None:
+                return None
             
             # Cancel subscription
-            self.cursor.execute("""
-                BEGIN
-                    pkg_subscription_service.cancel_subscription(:sub_id);
-                    COMMIT;
-                END;
-            """, {"sub_id": sub_id})
+            self.db.cancel_subscription(sub_id)
+            return charge
+
+        def cancelled(charge):
+            if charge is None:
+                messagebox.showerror("Error", "Subscription does not exist")
+                return
             
             # Prompt for payment
             if messagebox.askyesno("Payment Required", f"Subscription charge: ${charge:.2f}. Proceed with payment?"):
-                self.cursor.execute("""
-                    BEGIN
-                        pkg_payment_gateway.make_payment(:user_id, :type, :ref_id, :amount);
-                        COMMIT;
-                    END;
-                """, {
-                    "user_id": self.current_user_id,
-                    "type": "SUBSCRIPTION",
-                    "ref_id": sub_id,
-                    "amount": charge
-                })
-                messagebox.showinfo("Success", "Subscription cancelled and payment made successfully")
+                self.worker.submit(self.db.make_payment, self.current_user_id, "SUBSCRIPTION", sub_id, charge,
+                                   on_success=lambda _: messagebox.showinfo("Success", "Subscription cancelled and payment made successfully"),
+                                   on_error=failed)
             else:
                 messagebox.showwarning("Warning", "Payment not made. Subscription cancelled, but payment is pending.")
             
             self.refresh_subscriptions()
             self.cancel_sub_id.delete(0, tk.END)
-        except oracledb.Error as e:
-            error_code = e.args[0].code
+
+        def failed(e):
+            error_code = db_error_code(e)
             if error_code == 20030:
                 messagebox.showerror("Error", "Subscription does not exist")
             elif error_code == 20031:
@@ -853,7 +1017,18 @@ class RentalSystemApp:
                 messagebox.showerror("Error", "Subscription is already inactive")
             else:
                 messagebox.showerror("Database Error", f"Cancel subscription failed: {e}")
-    
+
+        self.worker.submit(do_cancel, on_success=cancelled, on_error=failed)
+
+    @instrumented
+    def expire_subscriptions(self):
+        def expired(count):
+            messagebox.showinfo("Subscriptions", f"{count} lapsed subscriptions deactivated")
+            self.refresh_subscriptions()
+
+        self.worker.submit(self.db.expire_subscriptions, on_success=expired,
+                           on_error=lambda e: messagebox.showerror("Database Error", f"Subscription expiry failed: {e}"))
+
     def setup_payment_tab(self):
         frame = ttk.LabelFrame(self.payment_tab, text="Payment Management")
         frame.pack(fill="both", expand=True, padx=5, pady=5)
@@ -883,10 +1058,18 @@ class RentalSystemApp:
         hsb = ttk.Scrollbar(tree_frame, orient="horizontal", command=self.payment_tree.xview)
         self.payment_tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
         
-        self.payment_tree.grid(row=0, column=0, sticky="nsew")
-        vsb.grid(row=0, column=1, sticky="ns")
-        hsb.grid(row=1, column=0, sticky="ew")
-        tree_frame.grid_rowconfigure(0, weight=1)
+        # Sorted, filtered and paged in the database; customers only see their own rows
+        user_id = None if self.current_role == "ADMIN" else self.current_user_id
+        self.payment_grid = PagedGrid(self.payment_tree, ("payment_id", "user_id", "amount", "payment_date", "type", "ref_id"),
+                                     self.worker, "payments", lambda *page: self.db.grid_page("payments", *page, user_id=user_id),
+                                     on_error=lambda e: messagebox.showerror("Database Error", f"Failed to fetch payments: {e}"))
+        
+        self.payment_grid.filter_bar.grid(row=0, column=0, sticky="ew")
+        self.payment_tree.grid(row=1, column=0, sticky="nsew")
+        vsb.grid(row=1, column=1, sticky="ns")
+        hsb.grid(row=2, column=0, sticky="ew")
+        self.payment_grid.page_bar.grid(row=3, column=0, sticky="w")
+        tree_frame.grid_rowconfigure(1, weight=1)
         tree_frame.grid_columnconfigure(0, weight=1)
         
         # Make payment (for manual payments)
@@ -910,21 +1093,11 @@ class RentalSystemApp:
         ttk.Button(frame, text="Refresh", command=self.refresh_payments).pack(pady=5)
         self.refresh_payments()
     
+    @instrumented
     def refresh_payments(self):
-        for item in self.payment_tree.get_children():
-            self.payment_tree.delete(item)
-        try:
-            query = "SELECT payment_id, user_id, amount, payment_date, type, ref_id FROM Payments"
-            params = {}
-            if self.current_role != "ADMIN":
-                query += " WHERE user_id = :id"
-                params["id"] = self.current_user_id
-            self.cursor.execute(query, params)
-            for row in self.cursor:
-                self.payment_tree.insert("", tk.END, values=row)
-        except oracledb.Error as e:
-            messagebox.showerror("Database Error", f"Failed to fetch payments: {e}")
+        self.payment_grid.refresh()
     
+    @instrumented
     def make_payment(self):
         pay_type = self.pay_type.get()
         try:
@@ -938,25 +1111,15 @@ class RentalSystemApp:
             messagebox.showerror("Error", "Payment type is required")
             return
         
-        try:
-            self.cursor.execute("""
-                BEGIN
-                    pkg_payment_gateway.make_payment(:user_id, :type, :ref_id, :amount);
-                    COMMIT;
-                END;
-            """, {
-                "user_id": self.current_user_id,
-                "type": pay_type,
-                "ref_id": ref_id,
-                "amount": amount
-            })
+        def done(_):
             messagebox.showinfo("Success", "Payment made successfully")
             self.refresh_payments()
             self.pay_type.set("")
             self.pay_ref_id.delete(0, tk.END)
             self.pay_amount.delete(0, tk.END)
-        except oracledb.Error as e:
-            error_code = e.args[0].code
+
+        def failed(e):
+            error_code = db_error_code(e)
             if error_code == 20031:
                 messagebox.showerror("Error", "User does not exist")
             elif error_code == 20032:
@@ -969,6 +1132,9 @@ class RentalSystemApp:
                 messagebox.showerror("Error", "Payment already made for this reference")
             else:
                 messagebox.showerror("Database Error", f"Payment failed: {e}")
+
+        self.worker.submit(self.db.make_payment, self.current_user_id, pay_type, ref_id, amount,
+                           on_success=done, on_error=failed)
     
     def setup_penalty_tab(self):
         frame = ttk.LabelFrame(self.penalty_tab, text="Penalty Management")
@@ -997,10 +1163,18 @@ class RentalSystemApp:
         hsb = ttk.Scrollbar(tree_frame, orient="horizontal", command=self.penalty_tree.xview)
         self.penalty_tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
         
-        self.penalty_tree.grid(row=0, column=0, sticky="nsew")
-        vsb.grid(row=0, column=1, sticky="ns")
-        hsb.grid(row=1, column=0, sticky="ew")
-        tree_frame.grid_rowconfigure(0, weight=1)
+        # Sorted, filtered and paged in the database; customers only see their own rows
+        user_id = None if self.current_role == "ADMIN" else self.current_user_id
+        self.penalty_grid = PagedGrid(self.penalty_tree, ("penalty_id", "rent_id", "amount", "reason", "status"),
+                                      self.worker, "penalties", lambda *page: self.db.grid_page("penalties", *page, user_id=user_id),
+                                      on_error=lambda e: messagebox.showerror("Database Error", f"Failed to fetch penalties: {e}"))
+        
+        self.penalty_grid.filter_bar.grid(row=0, column=0, sticky="ew")
+        self.penalty_tree.grid(row=1, column=0, sticky="nsew")
+        vsb.grid(row=1, column=1, sticky="ns")
+        hsb.grid(row=2, column=0, sticky="ew")
+        self.penalty_grid.page_bar.grid(row=3, column=0, sticky="w")
+        tree_frame.grid_rowconfigure(1, weight=1)
         tree_frame.grid_columnconfigure(0, weight=1)
         
         # Admin assign penalty
@@ -1031,26 +1205,11 @@ class RentalSystemApp:
         ttk.Button(frame, text="Refresh", command=self.refresh_penalties).pack(pady=5)
         self.refresh_penalties()
     
+    @instrumented
     def refresh_penalties(self):
-        for item in self.penalty_tree.get_children():
-            self.penalty_tree.delete(item)
-        try:
-            query = "SELECT penalty_id, rent_id, amount, reason, status FROM Penalties"
-            params = {}
-            if self.current_role != "ADMIN":
-                query = """
-                    SELECT p.penalty_id, p.rent_id, p.amount, p.reason, p.status
-                    FROM Penalties p
-                    JOIN Rentals r ON p.rent_id = r.rent_id
-                    WHERE r.user_id = :id
-                """
-                params["id"] = self.current_user_id
-            self.cursor.execute(query, params)
-            for row in self.cursor:
-                self.penalty_tree.insert("", tk.END, values=row)
-        except oracledb.Error as e:
-            messagebox.showerror("Database Error", f"Failed to fetch penalties: {e}")
+        self.penalty_grid.refresh()
     
+    @instrumented
     def assign_penalty(self):
         try:
             rent_id = int(self.penalty_rent_id.get().strip())
@@ -1063,19 +1222,14 @@ class RentalSystemApp:
             messagebox.showerror("Error", "Reason is required")
             return
         
-        try:
-            self.cursor.execute("""
-                BEGIN
-                    pkg_penalty_center.assign_penalty(:rent_id, :reason);
-                    COMMIT;
-                END;
-            """, {"rent_id": rent_id, "reason": reason})
+        def done(_):
             messagebox.showinfo("Success", "Penalty assigned successfully")
             self.refresh_penalties()
             self.penalty_rent_id.delete(0, tk.END)
             self.penalty_reason.delete(0, tk.END)
-        except oracledb.Error as e:
-            error_code = e.args[0].code
+
+        def failed(e):
+            error_code = db_error_code(e)
             if error_code == 20034:
                 messagebox.showerror("Error", "Rental does not exist")
             elif error_code == 20035:
@@ -1084,7 +1238,10 @@ class RentalSystemApp:
                 messagebox.showerror("Error", "Rental is not overdue or has already been returned")
             else:
                 messagebox.showerror("Database Error", f"Assign penalty failed: {e}")
+
+        self.worker.submit(self.db.assign_penalty, rent_id, reason, on_success=done, on_error=failed)
     
+    @instrumented
     def resolve_penalty(self):
         try:
             penalty_id = int(self.resolve_penalty_id.get().strip())
@@ -1092,38 +1249,30 @@ class RentalSystemApp:
             messagebox.showerror("Error", "Penalty ID must be a number")
             return
         
-        try:
+        def do_resolve():
             # Get penalty amount
-            self.cursor.execute("SELECT amount FROM Penalties WHERE penalty_id = :id", {"id": penalty_id})
-            result = self.cursor.fetchone()
-            if not result:
-                messagebox.showerror("Error", "Penalty does not exist")
-                return
-            amount = result[0]
+            amount = self.db.get_penalty_amount(penalty_id)
+            if amount is None:
+                return None
             
             # Resolve penalty
-            self.cursor.execute("""
-                BEGIN
-                    pkg_penalty_center.resolve_penalty(:penalty_id);
-                    COMMIT;
-                END;
-            """, {"penalty_id": penalty_id})
+            self.db.resolve_penalty(penalty_id)
+            return amount
+
+        def paid(_):
+            messagebox.showinfo("Success", "Penalty resolved and payment made successfully")
+            self.refresh_payments()
+
+        def resolved(amount):
+            if amount is None:
+                messagebox.showerror("Error", "Penalty does not exist")
+                return
             
             # For customers, enforce payment
             if self.current_role != "ADMIN":
                 if messagebox.askyesno("Payment Required", f"Penalty amount: ${amount:.2f}. Proceed with payment?"):
-                    self.cursor.execute("""
-                        BEGIN
-                            pkg_payment_gateway.make_payment(:user_id, :type, :ref_id, :amount);
-                            COMMIT;
-                        END;
-                    """, {
-                        "user_id": self.current_user_id,
-                        "type": "PENALTY",
-                        "ref_id": penalty_id,
-                        "amount": amount
-                    })
-                    messagebox.showinfo("Success", "Penalty resolved and payment made successfully")
+                    self.worker.submit(self.db.make_payment, self.current_user_id, "PENALTY", penalty_id, amount,
+                                       on_success=paid, on_error=failed)
                 else:
                     messagebox.showwarning("Warning", "Payment not made. Penalty resolved, but payment is pending.")
             else:
@@ -1132,8 +1281,9 @@ class RentalSystemApp:
             self.refresh_penalties()
             self.refresh_payments()
             self.resolve_penalty_id.delete(0, tk.END)
-        except oracledb.Error as e:
-            error_code = e.args[0].code
+
+        def failed(e):
+            error_code = db_error_code(e)
             if error_code == 20037:
                 messagebox.showerror("Error", "Penalty does not exist")
             elif error_code == 20031:
@@ -1148,6 +1298,19 @@ class RentalSystemApp:
                 messagebox.showerror("Error", "Penalty has already been resolved and paid")
             else:
                 messagebox.showerror("Database Error", f"Resolve penalty failed: {e}")
+
+        self.worker.submit(do_resolve, on_success=resolved, on_error=failed)
+    
+    @instrumented
+    def sweep_overdue(self):
+        def swept(result):
+            processed, elapsed = result
+            messagebox.showinfo("Overdue Rentals", f"{processed} overdue penalties assessed or updated in {elapsed:.2f}s")
+            self.refresh_penalties()
+            self.refresh_rentals()
+        
+        self.worker.submit(self.db.sweep_overdue, on_success=swept,
+                           on_error=lambda e: messagebox.showerror("Database Error", f"Overdue sweep failed: {e}"))
     
     def setup_audit_tab(self):
         frame = ttk.LabelFrame(self.audit_tab, text="Audit Log")
@@ -1178,80 +1341,188 @@ class RentalSystemApp:
         hsb = ttk.Scrollbar(tree_frame, orient="horizontal", command=self.audit_tree.xview)
         self.audit_tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
         
-        self.audit_tree.grid(row=0, column=0, sticky="nsew")
-        vsb.grid(row=0, column=1, sticky="ns")
-        hsb.grid(row=1, column=0, sticky="ew")
-        tree_frame.grid_rowconfigure(0, weight=1)
+        # Sorted, filtered (e.g. Table "Users", Timestamp "2026-01..2026-03") and paged in the database
+        self.audit_search = None
+        self.audit_grid = PagedGrid(self.audit_tree, ("log_id", "user_id", "table_name", "action", "timestamp", "details"),
+                                    self.worker, "audit", lambda *page: self.db.grid_page("audit", *page, search=self.audit_search),
+                                    on_error=lambda e: messagebox.showerror("Database Error", f"Failed to fetch audit log: {e}"))
+        
+        self.audit_grid.filter_bar.grid(row=0, column=0, sticky="ew")
+        self.audit_tree.grid(row=1, column=0, sticky="nsew")
+        vsb.grid(row=1, column=1, sticky="ns")
+        hsb.grid(row=2, column=0, sticky="ew")
+        self.audit_grid.page_bar.grid(row=3, column=0, sticky="w")
+        tree_frame.grid_rowconfigure(1, weight=1)
         tree_frame.grid_columnconfigure(0, weight=1)
         
-        # Filter
-        filter_frame = ttk.LabelFrame(frame, text="Filter Audit Log")
-        filter_frame.pack(fill="x", padx=5, pady=5)
-        
-        ttk.Label(filter_frame, text="Table Name:").grid(row=0, column=0, padx=5, pady=5)
-        self.audit_table = ttk.Entry(filter_frame)
-        self.audit_table.grid(row=0, column=1, padx=5, pady=5)
-        
-        ttk.Label(filter_frame, text="Start Date (YYYY-MM-DD):").grid(row=0, column=2, padx=5, pady=5)
-        self.audit_start = ttk.Entry(filter_frame)
-        self.audit_start.grid(row=0, column=3, padx=5, pady=5)
+        # Free text over the details, e.g. "canon cameras last week"; matches come best first
+        search_frame = ttk.LabelFrame(frame, text="Search Audit Log")
+        search_frame.pack(fill="x", padx=5, pady=5)
         
-        ttk.Label(filter_frame, text="End Date (YYYY-MM-DD):").grid(row=1, column=2, padx=5, pady=5)
-        self.audit_end = ttk.Entry(filter_frame)
-        self.audit_end.grid(row=1, column=3, padx=5, pady=5)
+        ttk.Label(search_frame, text="Details contain:").grid(row=0, column=0, padx=5, pady=5)
+        self.audit_text = ttk.Entry(search_frame, width=40)
+        self.audit_text.grid(row=0, column=1, padx=5, pady=5)
+        self.audit_text.bind("<Return>", lambda event: self.search_audit())
         
-        ttk.Button(filter_frame, text="Search", command=self.search_audit).grid(row=2, column=0, columnspan=4, pady=5)
+        ttk.Button(search_frame, text="Search", command=self.search_audit).grid(row=0, column=2, padx=5, pady=5)
         
         ttk.Button(frame, text="Refresh", command=self.refresh_audit).pack(pady=5)
+        
+        # Entries still waiting in Audit_Queue when async audit is on
+        self.audit_lag_var = tk.StringVar()
+        ttk.Label(frame, textvariable=self.audit_lag_var).pack(pady=(0, 5))
         self.refresh_audit()
     
+    @instrumented
     def refresh_audit(self):
-        for item in self.audit_tree.get_children():
-            self.audit_tree.delete(item)
-        try:
-            self.cursor.execute("""
-                SELECT log_id, user_id, table_name, action, timestamp, details
-                FROM Audit_Log
-                ORDER BY timestamp DESC
-            """)
-            for row in self.cursor:
-                self.audit_tree.insert("", tk.END, values=row)
-        except oracledb.Error as e:
-            messagebox.showerror("Database Error", f"Failed to fetch audit log: {e}")
+        self.audit_grid.refresh()
+        self.worker.submit(self.db.audit_lag, on_success=self.show_audit_lag, tag="audit")
     
+    def show_audit_lag(self, lag):
+        pending, lag_seconds = lag
+        if pending:
+            self.audit_lag_var.set(f"{pending} entries queued, oldest {lag_seconds or 0:.0f}s ago")
+        else:
+            self.audit_lag_var.set("")
+    
+    @instrumented
     def search_audit(self):
-        table_name = self.audit_table.get().strip() or None
-        start_date = self.audit_start.get().strip()
-        end_date = self.audit_end.get().strip()
+        self.audit_search = self.audit_text.get().strip() or None
+        self.audit_grid.reset()
+    
+    def setup_report_tab(self):
+        frame = ttk.LabelFrame(self.report_tab, text="Reports")
+        frame.pack(fill="both", expand=True, padx=5, pady=5)
         
-        try:
-            start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else datetime.now()
-            end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else datetime.now()
-        except ValueError:
-            messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format")
-            return
+        # Report picker
+        picker = ttk.Frame(frame)
+        picker.pack(fill="x", padx=5, pady=5)
+        ttk.Label(picker, text="Report:").pack(side="left", padx=5)
+        self.report_names = {title: name for name, (title, _) in REPORT_LAYOUTS.items()}
+        self.report_choice = ttk.Combobox(picker, values=list(self.report_names), state="readonly", width=30)
+        self.report_choice.current(0)
+        self.report_choice.pack(side="left", padx=5)
+        self.report_choice.bind("<<ComboboxSelected>>", lambda event: self.refresh_report())
+        
+        # Report rows with scrollbar
+        tree_frame = ttk.Frame(frame)
+        tree_frame.pack(fill="both", expand=True, padx=5, pady=5)
+        self.report_tree = ttk.Treeview(tree_frame, show="headings")
+        vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.report_tree.yview)
+        self.report_tree.configure(yscrollcommand=vsb.set)
+        self.report_tree.pack(side="left", fill="both", expand=True)
+        vsb.pack(side="right", fill="y")
+        
+        # Reports read only the summaries; "Update Summaries" folds in changes not yet applied
+        buttons = ttk.Frame(frame)
+        buttons.pack(pady=5)
+        ttk.Button(buttons, text="Refresh", command=self.refresh_report).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Update Summaries", command=self.update_report_summaries).pack(side="left", padx=5)
+        self.report_status_var = tk.StringVar()
+        ttk.Label(frame, textvariable=self.report_status_var).pack(pady=(0, 5))
+        self.refresh_report()
+    
+    @instrumented
+    def refresh_report(self):
+        name = self.report_names[self.report_choice.get()]
+        headings = REPORT_LAYOUTS[name][1]
+        started = datetime.now()
+        
+        def show(rows):
+            self.report_tree.delete(*self.report_tree.get_children())
+            self.report_tree.configure(columns=headings)
+            for heading in headings:
+                self.report_tree.heading(heading, text=heading)
+                self.report_tree.column(heading, width=200 if heading == "Name" else 110)
+            for row in rows:
+                self.report_tree.insert("", "end", values=["" if value is None else value for value in row])
+            elapsed = (datetime.now() - started).total_seconds() * 1000
+            self.report_status_var.set(f"{len(rows)} rows in {elapsed:.0f} ms")
+        
+        self.worker.submit(self.db.report, name, on_success=show,
+                           on_error=lambda e: messagebox.showerror("Database Error", f"Failed to load report: {e}"),
+                           tag="reports")
+    
+    @instrumented
+    def update_report_summaries(self):
+        def failed(e):
+            messagebox.showerror("Database Error", f"Failed to update summaries: {e}")
+        
+        self.worker.submit(self.db.refresh_reports, on_success=lambda _: self.refresh_report(), on_error=failed)
+    
+    def setup_diagnostics_tab(self):
+        frame = ttk.LabelFrame(self.diagnostics_tab, text="Database Calls")
+        frame.pack(fill="both", expand=True, padx=5, pady=5)
         
+        # One row per action and driver call, the most total time first; times in ms
+        tree_frame = ttk.Frame(frame)
+        tree_frame.pack(fill="both", expand=True, padx=5, pady=5)
+        columns = ("Action", "Call", "Calls", "Errors", "Total", "Avg", "p50", "p95", "p99", "Max", "Rows", "Round Trips")
+        self.diagnostics_tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        for column in columns:
+            self.diagnostics_tree.heading(column, text=column)
+            self.diagnostics_tree.column(column, width=130 if column in ("Action", "Call") else 65, anchor="w")
+        vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.diagnostics_tree.yview)
+        self.diagnostics_tree.configure(yscrollcommand=vsb.set)
+        self.diagnostics_tree.pack(side="left", fill="both", expand=True)
+        vsb.pack(side="right", fill="y")
+        
+        # Statements over the slow-query threshold, newest first
+        slow_frame = ttk.LabelFrame(self.diagnostics_tab, text=f"Slow Queries (over {self.metrics.slow_ms:g} ms)")
+        slow_frame.pack(fill="both", expand=True, padx=5, pady=5)
+        self.slow_tree = ttk.Treeview(slow_frame, columns=("Time", "ms", "Action", "Call", "Rows", "SQL"), show="headings", height=6)
+        for column, width in (("Time", 130), ("ms", 60), ("Action", 120), ("Call", 120), ("Rows", 50), ("SQL", 500)):
+            self.slow_tree.heading(column, text=column)
+            self.slow_tree.column(column, width=width)
+        vsb = ttk.Scrollbar(slow_frame, orient="vertical", command=self.slow_tree.yview)
+        self.slow_tree.configure(yscrollcommand=vsb.set)
+        self.slow_tree.pack(side="left", fill="both", expand=True, padx=5, pady=5)
+        vsb.pack(side="right", fill="y")
+        
+        buttons = ttk.Frame(self.diagnostics_tab)
+        buttons.pack(pady=5)
+        ttk.Button(buttons, text="Refresh", command=self.refresh_diagnostics).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Export Metrics...", command=self.export_metrics).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Reset", command=self.reset_metrics).pack(side="left", padx=5)
+        self.diagnostics_status_var = tk.StringVar()
+        ttk.Label(self.diagnostics_tab, textvariable=self.diagnostics_status_var).pack(pady=(0, 5))
+        self.refresh_diagnostics()
+    
+    def refresh_diagnostics(self):
+        def ms(value):
+            return "" if value is None else value
+        
+        operations = self.metrics.operations()
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+        for op in operations:
+            self.diagnostics_tree.insert("", "end", values=(
+                op["action"], op["call"], op["calls"], op["errors"], op["total_ms"], op["avg_ms"],
+                ms(op["p50_ms"]), ms(op["p95_ms"]), ms(op["p99_ms"]), op["max_ms"], op["rows"], op["round_trips"]))
+        self.slow_tree.delete(*self.slow_tree.get_children())
+        for entry in reversed(self.metrics.slow_queries()):
+            self.slow_tree.insert("", "end", values=(
+                entry["time"], entry["ms"], entry["action"], entry["call"], entry["rows"], entry["sql"]))
+        calls = sum(op["calls"] for op in operations)
+        total = sum(op["total_ms"] for op in operations)
+        self.diagnostics_status_var.set(
+            f"{calls} calls, {total / 1000:.1f} s in the database since {self.metrics.started:%Y-%m-%d %H:%M:%S}")
+    
+    def export_metrics(self):
+        path = filedialog.asksaveasfilename(title="Export Metrics", defaultextension=".json",
+                                            filetypes=[("JSON files", "*.json"), ("All files", "*.*")])
+        if not path:
+            return
         try:
-            self.cursor.callproc("pkg_audit_trail.get_audit_log", [
-                table_name,
-                start_date or datetime.now().strftime("%Y-%m-%d"),
-                end_date or datetime.now().strftime("%Y-%m-%d"),
-                self.cursor.var(oracledb.CURSOR)
-            ])
-            cursor = self.cursor.fetchall()[-1][3]
-            for item in self.audit_tree.get_children():
-                self.audit_tree.delete(item)
-            for row in cursor:
-                self.audit_tree.insert("", tk.END, values=row)
-        except oracledb.Error as e:
-            messagebox.showerror("Database Error", f"Audit search failed: {e}")
+            self.metrics.export(path)
+        except OSError as e:
+            messagebox.showerror("Export Error", f"Failed to export metrics: {e}")
+            return
+        messagebox.showinfo("Export Metrics", f"Metrics written to {path}")
+    
+    def reset_metrics(self):
+        self.metrics.reset()
+        self.refresh_diagnostics()
     
-    def __del__(self):
-        if hasattr(self, 'cursor'):
-            self.cursor.close()
-        if hasattr(self, 'conn'):
-            self.conn.close()
-
 if __name__ == "__main__":
     root = tk.Tk()
     app = RentalSystemApp(root)
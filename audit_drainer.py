@@ -0,0 +1,117 @@
+"""Background drain of the async audit queue.
+
+With async audit enabled (``Driver.set_audit_async(True)``) the audit triggers
+write to Audit_Queue instead of Audit_Log, so the user's transaction doesn't
+pay for the Audit_Log insert. Something has to move the queued entries over:
+on Oracle that can be the AUDIT_DRAIN_JOB scheduler job
+(``pkg_audit_trail.schedule_drain``), elsewhere it is this thread. The app
+starts one when RENTAL_AUDIT_FLUSH_INTERVAL (seconds) is set; it can also run
+on its own:
+
+    python audit_drainer.py --enable --interval 5
+    python audit_drainer.py --once
+"""
+import argparse
+import os
+import threading
+import time
+
+from dal import AUDIT_DRAIN_BATCH, DataError, open_driver
+
+DEFAULT_INTERVAL = 5.0
+
+
+def interval_from_env():
+    """Return RENTAL_AUDIT_FLUSH_INTERVAL as a float, or None when unset."""
+    value = os.environ.get("RENTAL_AUDIT_FLUSH_INTERVAL")
+    return float(value) if value else None
+
+
+class AuditDrainer:
+    """Moves Audit_Queue into Audit_Log every ``interval`` seconds on a daemon thread."""
+
+    def __init__(self, db, interval=DEFAULT_INTERVAL, batch_size=AUDIT_DRAIN_BATCH):
+        self.db = db
+        self.interval = interval
+        self.batch_size = batch_size
+        self.drained_total = 0
+        self.last_run = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-drainer", daemon=True)
+            self._thread.start()
+
+    def stop(self, drain=True):
+        """Stop the thread, by default moving whatever is still queued first."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if drain:
+            self.run_once()
+
+    def run_once(self):
+        """Drain batches until the queue is empty; return how many entries moved."""
+        moved = 0
+        try:
+            while True:
+                batch = self.db.drain_audit(self.batch_size)
+                moved += batch
+                if batch < self.batch_size:
+                    break
+            self.last_error = None
+        except DataError as e:
+            self.last_error = e
+        self.drained_total += moved
+        self.last_run = time.time()
+        return moved
+
+    def lag(self):
+        """(pending entries, age in seconds of the oldest one)."""
+        return self.db.audit_lag()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--enable", action="store_true", help="switch the audit triggers to the queue first")
+    parser.add_argument("--disable", action="store_true", help="switch them back to writing Audit_Log, drain and exit")
+    parser.add_argument("--interval", type=float, default=interval_from_env() or DEFAULT_INTERVAL,
+                        help="seconds between drains (default: RENTAL_AUDIT_FLUSH_INTERVAL or 5)")
+    parser.add_argument("--batch-size", type=int, default=AUDIT_DRAIN_BATCH, help="entries moved per transaction")
+    parser.add_argument("--once", action="store_true", help="drain what is queued and exit")
+    args = parser.parse_args()
+
+    db = open_driver()
+    drainer = AuditDrainer(db, args.interval, args.batch_size)
+    try:
+        if args.enable:
+            db.set_audit_async(True)
+        if args.disable:
+            db.set_audit_async(False)
+        if args.once or args.disable:
+            print(f"Moved {drainer.run_once()} entries")
+            return
+        drainer.start()
+        while True:
+            time.sleep(args.interval)
+            pending, lag_seconds = drainer.lag()
+            print(f"drained={drainer.drained_total} pending={pending} lag={lag_seconds or 0:.0f}s"
+                  + (f" error={drainer.last_error}" if drainer.last_error else ""))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        drainer.stop()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
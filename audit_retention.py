@@ -0,0 +1,43 @@
+"""Audit log retention: compress and archive old months of Audit_Log.
+
+Runs ``Driver.apply_audit_retention`` once. On Oracle, Audit_Log has one
+partition per month: months older than ``compress_after_months`` are
+compressed in place, and months older than ``archive_after_months`` are
+copied to Audit_Archive and their partitions dropped, so the live log only
+ever holds the recent months however long the system runs. The
+AUDIT_RETENTION_JOB scheduler job runs it nightly
+(``pkg_audit_trail.schedule_retention``). On SQLite the archived rows are
+moved and nothing is compressed. Archived months can be written to flat files
+with ``exporter.py audit_archive``.
+
+    python audit_retention.py --archive-after 12
+"""
+import argparse
+import sys
+
+from dal import DataError, open_driver
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--compress-after", type=int, metavar="MONTHS",
+                        help="set the months before a month is compressed (kept for later runs)")
+    parser.add_argument("--archive-after", type=int, metavar="MONTHS",
+                        help="set the months before a month is archived (kept for later runs)")
+    parser.add_argument("--backend", help="oracle or sqlite (default: RENTAL_DB_BACKEND)")
+    args = parser.parse_args()
+
+    db = open_driver(args.backend)
+    try:
+        if args.compress_after is not None or args.archive_after is not None:
+            db.set_audit_retention(args.compress_after, args.archive_after)
+        compressed, archived = db.apply_audit_retention()
+    except DataError as e:
+        sys.exit(f"Audit retention failed: {e}")
+    finally:
+        db.close()
+    print(f"{compressed} months compressed, {archived} months archived")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
 -- Drop existing objects to start fresh
 DROP INDEX idx_rentals_user_id;
 
+DROP MATERIALIZED VIEW mv_revenue_by_month;
+DROP MATERIALIZED VIEW mv_rental_revenue_by_gear;
+DROP MATERIALIZED VIEW mv_sub_revenue_by_gear;
+DROP MATERIALIZED VIEW mv_category_rentals;
+DROP MATERIALIZED VIEW mv_category_subs;
+DROP MATERIALIZED VIEW mv_category_stock;
+DROP MATERIALIZED VIEW mv_penalty_totals;
+
 DROP TABLE Users CASCADE CONSTRAINTS;
 DROP TABLE Gear CASCADE CONSTRAINTS;
 DROP TABLE Rentals CASCADE CONSTRAINTS;
@@ -8,6 +16,10 @@ DROP TABLE Subscriptions CASCADE CONSTRAINTS;
 DROP TABLE Payments CASCADE CONSTRAINTS;
 DROP TABLE Penalties CASCADE CONSTRAINTS;
 DROP TABLE Audit_Log CASCADE CONSTRAINTS;
+DROP TABLE Audit_Queue CASCADE CONSTRAINTS;
+DROP TABLE Audit_Archive CASCADE CONSTRAINTS;
+DROP TABLE Audit_Config CASCADE CONSTRAINTS;
+EXEC CTX_DDL.DROP_PREFERENCE('gear_text_store');
 
 DROP SEQUENCE users_seq;
 DROP SEQUENCE gear_seq;
@@ -16,6 +28,7 @@ DROP SEQUENCE subs_seq;
 DROP SEQUENCE payments_seq;
 DROP SEQUENCE penalties_seq;
 DROP SEQUENCE audit_seq;
+DROP SEQUENCE change_seq;
 
 -- TABLE SCHEMA
 
@@ -39,6 +52,7 @@ CREATE TABLE Gear (
     sub_price_per_month NUMBER(8,2) CHECK (sub_price_per_month >= 0),
     stock               NUMBER DEFAULT 0 CHECK (stock >= 0),
     status              VARCHAR2(20) DEFAULT 'AVAILABLE' CHECK (status IN ('AVAILABLE', 'UNAVAILABLE')),
+    last_change         NUMBER, -- change_seq value of the last insert/update, the gear cache's change token
     CONSTRAINT uniq_gear_name UNIQUE (name)
 );
 
@@ -82,17 +96,109 @@ CREATE TABLE Penalties (
     status      VARCHAR2(20) DEFAULT 'PENDING' CHECK (status IN ('PENDING', 'PAID'))
 );
 
+-- One partition per month, added automatically as entries arrive. Searches
+-- by date only touch the months they cover, and pkg_audit_trail.apply_retention
+-- compresses and then archives whole months without touching the rest.
 CREATE TABLE Audit_Log (
     log_id      NUMBER PRIMARY KEY,
     user_id     NUMBER REFERENCES Users(user_id),
     table_name  VARCHAR2(30),
     action      VARCHAR2(100),
+    timestamp   DATE DEFAULT SYSDATE NOT NULL,
+    details     VARCHAR2(4000)
+)
+PARTITION BY RANGE (timestamp) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+(PARTITION p_audit_start VALUES LESS THAN (DATE '2000-01-01'));
+
+-- Months past Audit_Config.archive_after_months, moved out of Audit_Log whole.
+-- Same shape, so they move across unchanged; compressed, without the foreign
+-- key (archived entries may outlive their user) and partitioned the same way,
+-- so the oldest months can be exported (exporter.py audit_archive) and dropped.
+CREATE TABLE Audit_Archive (
+    log_id      NUMBER NOT NULL,
+    user_id     NUMBER,
+    table_name  VARCHAR2(30),
+    action      VARCHAR2(100),
+    timestamp   DATE NOT NULL,
+    details     VARCHAR2(4000)
+)
+COMPRESS
+PARTITION BY RANGE (timestamp) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+(PARTITION p_archive_start VALUES LESS THAN (DATE '2000-01-01'));
+
+-- Staging area for async audit mode: same shape as Audit_Log (so entries move
+-- across unchanged) but without the foreign key, to keep trigger writes cheap
+CREATE TABLE Audit_Queue (
+    log_id      NUMBER PRIMARY KEY,
+    user_id     NUMBER,
+    table_name  VARCHAR2(30),
+    action      VARCHAR2(100),
     timestamp   DATE DEFAULT SYSDATE,
     details     VARCHAR2(4000)
 );
 
--- INDEX FOR PERFORMANCE
-CREATE INDEX idx_rentals_user_id ON Rentals(user_id);
+CREATE TABLE Audit_Config (
+    config_id       NUMBER DEFAULT 1 PRIMARY KEY CHECK (config_id = 1),
+    async_enabled   CHAR(1) DEFAULT 'N' CHECK (async_enabled IN ('Y', 'N')),
+    -- Retention tiers, in whole months before the current one
+    compress_after_months NUMBER DEFAULT 3 CHECK (compress_after_months >= 1),
+    archive_after_months  NUMBER DEFAULT 24 CHECK (archive_after_months >= 1)
+);
+INSERT INTO Audit_Config (config_id, async_enabled) VALUES (1, 'N');
+COMMIT;
+
+-- INDEXES FOR PERFORMANCE (one per filter the application, packages and triggers issue;
+-- benchmarks/query_plans.py checks that each statement actually uses its index)
+CREATE INDEX idx_rentals_user_status ON Rentals(user_id, status);
+CREATE INDEX idx_payments_type_ref ON Payments(type, ref_id);
+CREATE INDEX idx_payments_user_id ON Payments(user_id);
+CREATE INDEX idx_penalties_rent_id ON Penalties(rent_id);
+-- Local to each Audit_Log partition, so retention never has to maintain them
+-- across the whole log; they end in log_id to match get_audit_log's ORDER BY
+CREATE INDEX idx_audit_table_ts ON Audit_Log(table_name, timestamp, log_id) LOCAL;
+CREATE INDEX idx_audit_timestamp ON Audit_Log(timestamp, log_id) LOCAL;
+CREATE INDEX idx_audit_archive_ts ON Audit_Archive(timestamp, log_id) LOCAL;
+
+-- Active-only indexes: the CASE expressions are NULL for every other row, and
+-- entirely-NULL keys are not stored, so these only hold active rentals and
+-- subscriptions. Queries must repeat the same expressions to use them.
+CREATE INDEX idx_rentals_active ON Rentals(CASE WHEN status = 'RENTED' THEN user_id END);
+CREATE INDEX idx_rentals_overdue ON Rentals(CASE WHEN status = 'RENTED' THEN end_date END);
+-- pkg_subscription_service.expire_subscriptions keeps is_active = 'Y' to
+-- subscriptions that have not lapsed, so idx_subs_active needs no end_date.
+CREATE INDEX idx_subs_active ON Subscriptions(
+    CASE WHEN is_active = 'Y' THEN user_id END,
+    CASE WHEN is_active = 'Y' THEN gear_id END);
+CREATE INDEX idx_subs_expiry ON Subscriptions(CASE WHEN is_active = 'Y' THEN end_date END);
+
+-- INDEX FOR THE GEAR CACHE'S CHANGE TOKEN (MAX(last_change) is one index probe)
+CREATE INDEX idx_gear_last_change ON Gear(last_change);
+
+-- FULL-TEXT SEARCH (Oracle Text; the schema owner needs the CTXAPP role)
+-- idx_gear_text covers name, category and brand through one multi-column
+-- datastore and is kept in step on commit. idx_audit_text is local to the
+-- Audit_Log partitions, so retention moves and drops it a month at a time,
+-- and syncs every minute instead of on commit to keep audit writes cheap.
+BEGIN
+    CTX_DDL.CREATE_PREFERENCE('gear_text_store', 'MULTI_COLUMN_DATASTORE');
+    CTX_DDL.SET_ATTRIBUTE('gear_text_store', 'COLUMNS', 'name, category, brand');
+END;
+/
+
+CREATE INDEX idx_gear_text ON Gear(name) INDEXTYPE IS CTXSYS.CONTEXT
+    PARAMETERS ('DATASTORE gear_text_store SYNC (ON COMMIT)');
+CREATE INDEX idx_audit_text ON Audit_Log(details) INDEXTYPE IS CTXSYS.CONTEXT LOCAL
+    PARAMETERS ('SYNC (EVERY "SYSDATE + 1/1440")');
+
+-- idx_gear_text is on name alone, so Oracle Text only notices a row changed
+-- when name is set: setting it to itself makes category and brand edits count
+CREATE OR REPLACE TRIGGER trg_gear_text
+BEFORE UPDATE OF category, brand ON Gear
+FOR EACH ROW
+BEGIN
+    :NEW.name := :NEW.name;
+END;
+/
 
 -- SEQUENCES FOR AUTOINCREMENT
 CREATE SEQUENCE users_seq START WITH 1 INCREMENT BY 1;
@@ -102,6 +208,7 @@ CREATE SEQUENCE subs_seq START WITH 1 INCREMENT BY 1;
 CREATE SEQUENCE payments_seq START WITH 1 INCREMENT BY 1;
 CREATE SEQUENCE penalties_seq START WITH 1 INCREMENT BY 1;
 CREATE SEQUENCE audit_seq START WITH 1 INCREMENT BY 1;
+CREATE SEQUENCE change_seq START WITH 1 INCREMENT BY 1;
 
 -- TRIGGERS FOR AUTOINCREMENT
 
@@ -156,11 +263,64 @@ END;
 CREATE OR REPLACE TRIGGER trg_audit_bi
 BEFORE INSERT ON Audit_Log
 FOR EACH ROW
+WHEN (NEW.log_id IS NULL) -- pkg_audit_trail.queue_action assigns it up front
 BEGIN
     :NEW.log_id := audit_seq.NEXTVAL;
 END;
 /
 
+-- TRIGGER FOR CHANGE TRACKING (the gear cache drops its pages once MAX(last_change) moves)
+
+CREATE OR REPLACE TRIGGER trg_gear_change
+BEFORE INSERT OR UPDATE ON Gear
+FOR EACH ROW
+BEGIN
+    :NEW.last_change := change_seq.NEXTVAL;
+END;
+/
+
+-- BILLING VIEWS
+-- The one place the pricing rules live: calc_rental_charge, calc_penalty_amt,
+-- assign_penalty and the drivers' billing calls all read these, so charges and
+-- "amount due" for any number of rentals or subscriptions cost one query.
+-- dal/billing.py applies the same rules for the SQLite stand-in.
+CREATE OR REPLACE VIEW v_rental_billing AS
+SELECT b.rent_id, b.user_id, b.charge, b.penalty, NVL(p.amount, 0) AS paid, NVL(pen.pending, 0) AS penalties_due,
+       CASE WHEN p.payment_id IS NULL THEN b.charge ELSE 0 END + NVL(pen.pending, 0) AS amount_due,
+       b.status, b.condition_returned, b.rented_until
+FROM (
+    SELECT r.rent_id, r.user_id, r.status, r.condition_returned,
+           -- End date of rentals still out; matches idx_rentals_overdue
+           CASE WHEN r.status = 'RENTED' THEN r.end_date END AS rented_until,
+           -- Days rented (to the return, else the end, else now), rounded up, at the daily rate
+           CEIL(NVL(NVL(r.return_date, r.end_date), SYSDATE) - r.start_date) * g.rent_price_per_day AS charge,
+           -- 2x the daily rate per overdue day, plus a flat charge for damaged or broken gear
+           ROUND(CASE WHEN NVL(r.return_date, SYSDATE) > r.end_date
+                      THEN CEIL(NVL(r.return_date, SYSDATE) - r.end_date) * (g.rent_price_per_day * 2)
+                      ELSE 0 END
+                 + CASE r.condition_returned WHEN 'DAMAGED' THEN 100 WHEN 'BROKEN' THEN 200 ELSE 0 END, 2) AS penalty
+    FROM Rentals r
+    JOIN Gear g ON r.gear_id = g.gear_id
+) b
+LEFT JOIN Payments p ON p.type = 'RENTAL' AND p.ref_id = b.rent_id
+LEFT JOIN (
+    SELECT rent_id, SUM(amount) AS pending
+    FROM Penalties
+    WHERE NVL(status, 'PENDING') != 'PAID'
+    GROUP BY rent_id
+) pen ON pen.rent_id = b.rent_id;
+
+CREATE OR REPLACE VIEW v_subscription_billing AS
+SELECT b.sub_id, b.user_id, b.charge, NVL(p.amount, 0) AS paid,
+       CASE WHEN p.payment_id IS NULL THEN b.charge ELSE 0 END AS amount_due
+FROM (
+    -- Whole days used (to the end, else now) plus the first, at the daily rate
+    SELECT s.sub_id, s.user_id, (FLOOR(NVL(s.end_date, SYSDATE) - s.start_date) + 1) * g.rent_price_per_day AS charge
+    FROM Subscriptions s
+    JOIN Gear g ON s.gear_id = g.gear_id
+) b
+LEFT JOIN Payments p ON p.type = 'SUBSCRIPTION' AND p.ref_id = b.sub_id;
+
 -- PACKAGE FOR USER OPERATIONS
 CREATE OR REPLACE PACKAGE pkg_user_ops AS
     PROCEDURE register_user(p_name IN VARCHAR2, p_email IN VARCHAR2, p_phone IN VARCHAR2, 
@@ -189,23 +349,16 @@ CREATE OR REPLACE PACKAGE BODY pkg_user_ops AS
     END register_user;
 
     PROCEDURE deactivate_user(p_user_id IN NUMBER) IS
-        v_count NUMBER;
     BEGIN
-        SELECT COUNT(*) INTO v_count FROM Users WHERE user_id = p_user_id;
-        IF v_count = 0 THEN
+        UPDATE Users SET status = 'INACTIVE' WHERE user_id = p_user_id;
+        IF SQL%ROWCOUNT = 0 THEN
             RAISE_APPLICATION_ERROR(-20015, 'User does not exist');
         END IF;
-        UPDATE Users SET status = 'INACTIVE' WHERE user_id = p_user_id;
     END deactivate_user;
 
     FUNCTION get_user_info(p_user_id IN NUMBER) RETURN VARCHAR2 IS
         v_info VARCHAR2(500);
-        v_count NUMBER;
     BEGIN
-        SELECT COUNT(*) INTO v_count FROM Users WHERE user_id = p_user_id;
-        IF v_count = 0 THEN
-            RETURN 'User not found';
-        END IF;
         SELECT 'Name: ' || name || ', Email: ' || email || ', Phone: ' || NVL(phone, 'N/A') || 
                ', Status: ' || status || ', Role: ' || role || 
                ', Created: ' || TO_CHAR(created_at, 'YYYY-MM-DD')
@@ -270,110 +423,229 @@ CREATE OR REPLACE PACKAGE BODY pkg_gear_ops AS
     END add_gear;
     
     PROCEDURE update_stock(p_gear_id IN NUMBER, p_qty IN NUMBER) IS
-        v_count NUMBER;
     BEGIN
-        SELECT COUNT(*) INTO v_count FROM Gear WHERE gear_id = p_gear_id;
-        IF v_count = 0 THEN
-            RAISE_APPLICATION_ERROR(-20018, 'Gear does not exist');
-        END IF;
+        -- A missing gear row is the only way to update nothing
         UPDATE Gear
         SET stock = stock + p_qty
         WHERE gear_id = p_gear_id;
         IF SQL%ROWCOUNT = 0 THEN
-            RAISE_APPLICATION_ERROR(-20019, 'Stock update failed');
+            RAISE_APPLICATION_ERROR(-20018, 'Gear does not exist');
         END IF;
     END update_stock;
     
     FUNCTION is_gear_available(p_gear_id IN NUMBER) RETURN BOOLEAN IS
         v_stock NUMBER;
-        v_count NUMBER;
     BEGIN
-        SELECT COUNT(*) INTO v_count FROM Gear WHERE gear_id = p_gear_id;
-        IF v_count = 0 THEN
-            RAISE_APPLICATION_ERROR(-20020, 'Gear does not exist');
-        END IF;
         SELECT stock INTO v_stock
         FROM Gear
         WHERE gear_id = p_gear_id;        
         RETURN v_stock > 0;
+    EXCEPTION
+        WHEN NO_DATA_FOUND THEN
+            RAISE_APPLICATION_ERROR(-20020, 'Gear does not exist');
     END is_gear_available;  
 END pkg_gear_ops;
 /
 
 -- PACKAGE FOR RENTAL OPERATIONS
 CREATE OR REPLACE PACKAGE pkg_rental_ops AS
+    -- Arrays for rent_gear_batch, bound from the client as PL/SQL index-by tables
+    TYPE t_ids IS TABLE OF NUMBER INDEX BY PLS_INTEGER;
+    TYPE t_dates IS TABLE OF DATE INDEX BY PLS_INTEGER;
+    TYPE t_messages IS TABLE OF VARCHAR2(4000) INDEX BY PLS_INTEGER;
+
     PROCEDURE rent_gear(p_user_id IN NUMBER, p_gear_id IN NUMBER, p_start IN DATE, p_end IN DATE);
+    PROCEDURE rent_gear_batch(p_user_id IN NUMBER, p_gear_ids IN t_ids, p_starts IN t_dates, p_ends IN t_dates,
+                              p_error_codes OUT t_ids, p_error_messages OUT t_messages);
     PROCEDURE return_gear(p_rent_id IN NUMBER, p_return_date IN DATE, p_condition IN VARCHAR2);
     FUNCTION calc_rental_charge(p_rent_id IN NUMBER) RETURN NUMBER;
 END pkg_rental_ops;
 /
 
 CREATE OR REPLACE PACKAGE BODY pkg_rental_ops AS
+    -- The unit is taken last, by a guarded UPDATE just before the caller
+    -- commits, so renters of the same item only queue on its Gear row for that
+    -- UPDATE and not for the Rentals insert and its triggers. The plain read
+    -- first fails fast on missing or sold-out gear without locking anything;
+    -- the UPDATE is what decides, and undoes the insert if another session
+    -- took the last unit in between. The existence checks only run on failure,
+    -- to pick the error.
     PROCEDURE rent_gear(p_user_id IN NUMBER, p_gear_id IN NUMBER, p_start IN DATE, p_end IN DATE) IS
+        e_missing_parent EXCEPTION;
+        PRAGMA EXCEPTION_INIT(e_missing_parent, -2291);
+        v_stock NUMBER;
+
+        PROCEDURE raise_not_rentable IS
+            v_count NUMBER;
+        BEGIN
+            SELECT COUNT(*) INTO v_count FROM Users WHERE user_id = p_user_id;
+            IF v_count = 0 THEN
+                RAISE_APPLICATION_ERROR(-20021, 'User does not exist');
+            END IF;
+            SELECT COUNT(*) INTO v_count FROM Gear WHERE gear_id = p_gear_id;
+            IF v_count = 0 THEN
+                RAISE_APPLICATION_ERROR(-20022, 'Gear does not exist');
+            END IF;
+            RAISE_APPLICATION_ERROR(-20023, 'Gear not available for rent');
+        END raise_not_rentable;
+    BEGIN
+        SELECT MAX(stock) INTO v_stock FROM Gear WHERE gear_id = p_gear_id;
+        IF NVL(v_stock, 0) <= 0 THEN
+            raise_not_rentable;
+        END IF;
+        SAVEPOINT rent_gear;
+        BEGIN
+            INSERT INTO Rentals (user_id, gear_id, start_date, end_date)
+            VALUES (p_user_id, p_gear_id, p_start, p_end);
+        EXCEPTION
+            WHEN e_missing_parent THEN
+                raise_not_rentable;
+        END;
+        UPDATE Gear
+        SET stock = stock - 1
+        WHERE gear_id = p_gear_id
+          AND stock > 0;
+        IF SQL%ROWCOUNT = 0 THEN
+            ROLLBACK TO rent_gear;
+            raise_not_rentable;
+        END IF;
+    END rent_gear;
+
+    -- Rents items 1..n of the arrays to one user, all or nothing. Every item is
+    -- checked up front, without locks, against the same rules (and codes) as
+    -- rent_gear and the Rentals constraints; if any fails, p_error_codes/
+    -- p_error_messages say why for each item (0/NULL for the good ones) and
+    -- nothing is changed. Otherwise, as in rent_gear, the rentals are inserted
+    -- with FORALL and stock is taken last with one guarded UPDATE, so the Gear
+    -- rows stay locked only from there to the commit. Items whose stock ran out
+    -- since the check get 20023 and the inserts are rolled back.
+    PROCEDURE rent_gear_batch(p_user_id IN NUMBER, p_gear_ids IN t_ids, p_starts IN t_dates, p_ends IN t_dates,
+                              p_error_codes OUT t_ids, p_error_messages OUT t_messages) IS
+        TYPE t_counts IS TABLE OF NUMBER INDEX BY PLS_INTEGER;  -- keyed by gear_id
+        v_stock t_counts;
+        v_taken t_counts;
         v_user_count NUMBER;
-        v_gear_count NUMBER;
+        v_active NUMBER;
+        v_exists NUMBER;
+        v_rejected PLS_INTEGER := 0;
+        v_updated t_ids;
+        v_reserved t_counts;  -- keyed by gear_id
+
+        PROCEDURE reject(i IN PLS_INTEGER, p_code IN NUMBER, p_message IN VARCHAR2) IS
+        BEGIN
+            p_error_codes(i) := p_code;
+            p_error_messages(i) := p_message;
+            v_rejected := v_rejected + 1;
+        END reject;
     BEGIN
         SELECT COUNT(*) INTO v_user_count FROM Users WHERE user_id = p_user_id;
         IF v_user_count = 0 THEN
             RAISE_APPLICATION_ERROR(-20021, 'User does not exist');
         END IF;
-        SELECT COUNT(*) INTO v_gear_count FROM Gear WHERE gear_id = p_gear_id;
-        IF v_gear_count = 0 THEN
-            RAISE_APPLICATION_ERROR(-20022, 'Gear does not exist');
-        END IF;
-        IF NOT pkg_gear_ops.is_gear_available(p_gear_id) THEN
-            RAISE_APPLICATION_ERROR(-20023, 'Gear not available for rent');
+
+        -- Read without locking; the guarded UPDATE below re-checks the stock
+        FOR r IN (SELECT gear_id, stock FROM Gear
+                  WHERE gear_id IN (SELECT column_value FROM TABLE(p_gear_ids))) LOOP
+            v_stock(r.gear_id) := r.stock;
+            v_taken(r.gear_id) := 0;
+        END LOOP;
+        SELECT COUNT(*) INTO v_active
+        FROM Rentals
+        WHERE CASE WHEN status = 'RENTED' THEN user_id END = p_user_id;
+
+        FOR i IN 1 .. p_gear_ids.COUNT LOOP
+            p_error_codes(i) := 0;
+            p_error_messages(i) := NULL;
+            IF NOT v_stock.EXISTS(p_gear_ids(i)) THEN
+                reject(i, 20022, 'Gear does not exist');
+            ELSIF v_taken(p_gear_ids(i)) >= v_stock(p_gear_ids(i)) THEN
+                reject(i, 20023, 'Gear not available for rent');
+            ELSIF v_active >= 3 THEN
+                reject(i, 20053, 'User has reached rental limit of 3 active rentals');
+            ELSIF p_starts(i) IS NULL THEN
+                reject(i, 1400, 'cannot insert NULL into start_date');
+            ELSIF p_ends(i) < p_starts(i) THEN
+                reject(i, 2290, 'check constraint (CHK_DATES) violated');
+            ELSE
+                SELECT COUNT(*) INTO v_exists
+                FROM Rentals
+                WHERE user_id = p_user_id AND gear_id = p_gear_ids(i) AND start_date = p_starts(i);
+                FOR j IN 1 .. i - 1 LOOP
+                    IF p_error_codes(j) = 0 AND p_gear_ids(j) = p_gear_ids(i) AND p_starts(j) = p_starts(i) THEN
+                        v_exists := v_exists + 1;
+                    END IF;
+                END LOOP;
+                IF v_exists > 0 THEN
+                    reject(i, 1, 'unique constraint (UNIQ_RENTAL_ONCE) violated');
+                ELSE
+                    v_taken(p_gear_ids(i)) := v_taken(p_gear_ids(i)) + 1;
+                    v_active := v_active + 1;
+                END IF;
+            END IF;
+        END LOOP;
+        IF v_rejected > 0 THEN
+            RETURN;
         END IF;
-        INSERT INTO Rentals (user_id, gear_id, start_date, end_date)
-        VALUES (p_user_id, p_gear_id, p_start, p_end);
-        pkg_gear_ops.update_stock(p_gear_id, -1);
-    END rent_gear;
+
+        SAVEPOINT rent_gear_batch;
+        FORALL i IN 1 .. p_gear_ids.COUNT
+            INSERT INTO Rentals (user_id, gear_id, start_date, end_date)
+            VALUES (p_user_id, p_gear_ids(i), p_starts(i), p_ends(i));
+        UPDATE Gear g
+        SET stock = stock - (SELECT COUNT(*) FROM TABLE(p_gear_ids) t WHERE t.column_value = g.gear_id)
+        WHERE gear_id IN (SELECT column_value FROM TABLE(p_gear_ids))
+          AND stock >= (SELECT COUNT(*) FROM TABLE(p_gear_ids) t WHERE t.column_value = g.gear_id)
+        RETURNING gear_id BULK COLLECT INTO v_updated;
+        IF v_updated.COUNT < v_taken.COUNT THEN
+            -- Another session took the stock since the check
+            ROLLBACK TO rent_gear_batch;
+            FOR i IN 1 .. v_updated.COUNT LOOP
+                v_reserved(v_updated(i)) := 1;
+            END LOOP;
+            FOR i IN 1 .. p_gear_ids.COUNT LOOP
+                IF NOT v_reserved.EXISTS(p_gear_ids(i)) THEN
+                    reject(i, 20023, 'Gear not available for rent');
+                END IF;
+            END LOOP;
+        END IF;
+    END rent_gear_batch;
 
     PROCEDURE return_gear(p_rent_id IN NUMBER, p_return_date IN DATE, p_condition IN VARCHAR2) IS
         v_count NUMBER;
         v_gear_id NUMBER;
     BEGIN
-        SELECT COUNT(*) INTO v_count FROM Rentals WHERE rent_id = p_rent_id;
-        IF v_count = 0 THEN
-            RAISE_APPLICATION_ERROR(-20024, 'Rental does not exist');
-        END IF;
         IF p_condition NOT IN ('GOOD', 'DAMAGED', 'BROKEN') THEN
+            SELECT COUNT(*) INTO v_count FROM Rentals WHERE rent_id = p_rent_id;
+            IF v_count = 0 THEN
+                RAISE_APPLICATION_ERROR(-20024, 'Rental does not exist');
+            END IF;
             RAISE_APPLICATION_ERROR(-20056, 'Invalid condition; must be GOOD, DAMAGED, or BROKEN');
         END IF;
         UPDATE Rentals
         SET return_date = p_return_date, status = 'RETURNED', condition_returned = p_condition
-        WHERE rent_id = p_rent_id;
-        SELECT gear_id INTO v_gear_id
-        FROM Rentals
-        WHERE rent_id = p_rent_id;
-        pkg_gear_ops.update_stock(v_gear_id, 1);
+        WHERE rent_id = p_rent_id
+        RETURNING gear_id INTO v_gear_id;
+        IF SQL%ROWCOUNT = 0 THEN
+            RAISE_APPLICATION_ERROR(-20024, 'Rental does not exist');
+        END IF;
         IF p_condition IN ('DAMAGED', 'BROKEN') THEN
             pkg_penalty_center.assign_penalty(p_rent_id, 
                 'Gear returned in ' || LOWER(p_condition) || ' condition');
         END IF;
+        -- Last, like the reservation in rent_gear, to hold the Gear row lock briefly
+        UPDATE Gear
+        SET stock = stock + 1
+        WHERE gear_id = v_gear_id;
     END return_gear;
 
     FUNCTION calc_rental_charge(p_rent_id IN NUMBER) RETURN NUMBER IS
-        v_start_date DATE;
-        v_end_date DATE;
-        v_rent_price_per_day NUMBER;
         v_charge NUMBER;
-        v_count NUMBER;
     BEGIN
-        SELECT COUNT(*) INTO v_count FROM Rentals WHERE rent_id = p_rent_id;
-        IF v_count = 0 THEN
-            RAISE_APPLICATION_ERROR(-20025, 'Rental does not exist');
-        END IF;
-        SELECT start_date, NVL(return_date, end_date), rent_price_per_day
-        INTO v_start_date, v_end_date, v_rent_price_per_day
-        FROM Rentals r
-        JOIN Gear g ON r.gear_id = g.gear_id
-        WHERE r.rent_id = p_rent_id;
-        IF v_end_date IS NULL THEN
-            v_end_date := SYSDATE;
-        END IF;
-        v_charge := CEIL(v_end_date - v_start_date) * v_rent_price_per_day;
+        SELECT charge INTO v_charge FROM v_rental_billing WHERE rent_id = p_rent_id;
         RETURN v_charge;
+    EXCEPTION
+        WHEN NO_DATA_FOUND THEN
+            RAISE_APPLICATION_ERROR(-20025, 'Rental does not exist');
     END calc_rental_charge;
 END pkg_rental_ops;
 /
@@ -383,6 +655,10 @@ CREATE OR REPLACE PACKAGE pkg_subscription_service AS
     PROCEDURE subscribe_gear(p_user_id IN NUMBER, p_gear_id IN NUMBER, p_start IN DATE, p_end IN DATE);
     PROCEDURE cancel_subscription(p_sub_id IN NUMBER);   
     FUNCTION is_active_sub(p_user_id IN NUMBER, p_gear_id IN NUMBER) RETURN BOOLEAN;
+    -- Deactivate every active subscription past its end date, in one statement
+    PROCEDURE expire_subscriptions(p_expired OUT NUMBER);
+    PROCEDURE schedule_expiry(p_interval_minutes IN NUMBER DEFAULT 60);
+    PROCEDURE unschedule_expiry;
 END pkg_subscription_service;
 /
 
@@ -410,43 +686,97 @@ CREATE OR REPLACE PACKAGE BODY pkg_subscription_service AS
     END subscribe_gear;
 
     PROCEDURE cancel_subscription(p_sub_id IN NUMBER) IS
-        v_is_active CHAR(1);
+        v_count NUMBER;
     BEGIN
-        BEGIN
-            SELECT is_active INTO v_is_active 
-            FROM Subscriptions 
-            WHERE sub_id = p_sub_id;
-        EXCEPTION
-            WHEN NO_DATA_FOUND THEN
+        UPDATE Subscriptions
+        SET is_active = 'N'
+        WHERE sub_id = p_sub_id
+          AND NVL(is_active, 'Y') != 'N';
+        IF SQL%ROWCOUNT = 0 THEN
+            SELECT COUNT(*) INTO v_count FROM Subscriptions WHERE sub_id = p_sub_id;
+            IF v_count = 0 THEN
                 RAISE_APPLICATION_ERROR(-20030, 'Subscription does not exist');
-        END;  
-        IF v_is_active = 'N' THEN
+            END IF;
             RAISE_APPLICATION_ERROR(-20063, 'Subscription is already inactive');
         END IF;
-        UPDATE Subscriptions
-        SET is_active = 'N'
-        WHERE sub_id = p_sub_id;
     END cancel_subscription;
 
     FUNCTION is_active_sub(p_user_id IN NUMBER, p_gear_id IN NUMBER) RETURN BOOLEAN IS
         v_count NUMBER;
     BEGIN
+        -- Written against idx_subs_active's expressions (is_active = 'Y' is implied);
+        -- end_date only matters for a lapse the expiry job has not reached yet
         SELECT COUNT(*) INTO v_count
         FROM Subscriptions
-        WHERE user_id = p_user_id
-          AND gear_id = p_gear_id
-          AND is_active = 'Y'
-          AND end_date >= SYSDATE;          
+        WHERE CASE WHEN is_active = 'Y' THEN user_id END = p_user_id
+          AND CASE WHEN is_active = 'Y' THEN gear_id END = p_gear_id
+          AND end_date >= SYSDATE;
         RETURN v_count > 0;
     END is_active_sub;
+
+    PROCEDURE expire_subscriptions(p_expired OUT NUMBER) IS
+    BEGIN
+        -- Reads only the active rows, through idx_subs_expiry
+        UPDATE Subscriptions
+        SET is_active = 'N'
+        WHERE CASE WHEN is_active = 'Y' THEN end_date END < SYSDATE;
+        p_expired := SQL%ROWCOUNT;
+        IF p_expired > 0 THEN
+            pkg_audit_trail.log_action(NULL, 'Subscriptions', 'EXPIRY', p_expired || ' lapsed subscriptions deactivated');
+        END IF;
+    END expire_subscriptions;
+
+    PROCEDURE schedule_expiry(p_interval_minutes IN NUMBER DEFAULT 60) IS
+    BEGIN
+        unschedule_expiry;
+        -- The report summaries are refreshed straight after, so the active
+        -- subscription counts drop as soon as the subscriptions do
+        DBMS_SCHEDULER.CREATE_JOB(
+            job_name        => 'SUBSCRIPTION_EXPIRY_JOB',
+            job_type        => 'PLSQL_BLOCK',
+            job_action      => 'DECLARE n NUMBER; BEGIN pkg_subscription_service.expire_subscriptions(n); COMMIT; '
+                               || 'pkg_reports.refresh; END;',
+            repeat_interval => 'FREQ=MINUTELY;INTERVAL=' || p_interval_minutes,
+            enabled         => TRUE);
+    END schedule_expiry;
+
+    PROCEDURE unschedule_expiry IS
+        e_no_job EXCEPTION;
+        PRAGMA EXCEPTION_INIT(e_no_job, -27475);
+    BEGIN
+        DBMS_SCHEDULER.DROP_JOB('SUBSCRIPTION_EXPIRY_JOB', force => TRUE);
+    EXCEPTION
+        WHEN e_no_job THEN
+            NULL;
+    END unschedule_expiry;
 END pkg_subscription_service;
 /
 
+-- PACKAGE FOR PAYMENTS
+CREATE OR REPLACE PACKAGE pkg_payment_gateway AS
+    PROCEDURE make_payment(p_user_id IN NUMBER, p_type IN VARCHAR2, p_ref_id IN NUMBER, p_amt IN NUMBER);
+    FUNCTION validate_ref(p_type IN VARCHAR2, p_ref_id IN NUMBER) RETURN BOOLEAN;
+END pkg_payment_gateway;
+/
+
 CREATE OR REPLACE PACKAGE BODY pkg_payment_gateway AS
     PROCEDURE make_payment(p_user_id IN NUMBER, p_type IN VARCHAR2, p_ref_id IN NUMBER, p_amt IN NUMBER) IS
         v_count NUMBER;
         v_payment_exists NUMBER;
     BEGIN
+        -- One guarded INSERT; the checks below only run when it inserted nothing
+        INSERT INTO Payments (user_id, amount, type, ref_id)
+        SELECT p_user_id, p_amt, p_type, p_ref_id
+        FROM Users
+        WHERE user_id = p_user_id
+          AND NVL(p_amt, 0) >= 0
+          AND (   (p_type = 'RENTAL' AND EXISTS (SELECT 1 FROM Rentals WHERE rent_id = p_ref_id))
+               OR (p_type = 'SUBSCRIPTION' AND EXISTS (SELECT 1 FROM Subscriptions WHERE sub_id = p_ref_id))
+               OR (p_type = 'PENALTY' AND EXISTS (SELECT 1 FROM Penalties WHERE penalty_id = p_ref_id)))
+          AND NOT EXISTS (SELECT 1 FROM Payments WHERE type = p_type AND ref_id = p_ref_id);
+        IF SQL%ROWCOUNT > 0 THEN
+            RETURN;
+        END IF;
         SELECT COUNT(*) INTO v_count FROM Users WHERE user_id = p_user_id;
         IF v_count = 0 THEN
             RAISE_APPLICATION_ERROR(-20031, 'User does not exist');
@@ -460,14 +790,7 @@ CREATE OR REPLACE PACKAGE BODY pkg_payment_gateway AS
         IF NOT validate_ref(p_type, p_ref_id) THEN
             RAISE_APPLICATION_ERROR(-20034, 'Invalid reference for the given payment type');
         END IF;
-        SELECT COUNT(*) INTO v_payment_exists
-        FROM Payments
-        WHERE type = p_type AND ref_id = p_ref_id;
-        IF v_payment_exists > 0 THEN
-            RAISE_APPLICATION_ERROR(-20062, 'Payment already made for this reference');
-        END IF;
-        INSERT INTO Payments (user_id, amount, type, ref_id)
-        VALUES (p_user_id, p_amt, p_type, p_ref_id);
+        RAISE_APPLICATION_ERROR(-20062, 'Payment already made for this reference');
     END make_payment;
     
     FUNCTION validate_ref(p_type IN VARCHAR2, p_ref_id IN NUMBER) RETURN BOOLEAN IS
@@ -492,6 +815,12 @@ CREATE OR REPLACE PACKAGE pkg_penalty_center AS
     PROCEDURE assign_penalty(p_rent_id IN NUMBER, p_reason IN VARCHAR2);
     PROCEDURE resolve_penalty(p_penalty_id IN NUMBER);
     FUNCTION calc_penalty_amt(p_rent_id IN NUMBER) RETURN NUMBER;
+    -- Overdue sweep: every overdue rental gets one penalty with this reason, and
+    -- while it is PENDING its amount follows the days overdue
+    c_overdue_reason CONSTANT VARCHAR2(30) := 'Overdue rental';
+    PROCEDURE sweep_overdue(p_processed OUT NUMBER, p_elapsed OUT NUMBER);
+    PROCEDURE schedule_sweep(p_hour IN NUMBER DEFAULT 2);
+    PROCEDURE unschedule_sweep;
 END pkg_penalty_center;
 /
 
@@ -499,18 +828,19 @@ CREATE OR REPLACE PACKAGE BODY pkg_penalty_center AS
     PROCEDURE assign_penalty(p_rent_id IN NUMBER, p_reason IN VARCHAR2) IS
         v_rent_status VARCHAR2(20);
         v_penalty_amt NUMBER(10, 2);
-        v_count NUMBER;
         v_condition VARCHAR2(50);
     BEGIN
-        SELECT COUNT(*) INTO v_count FROM Rentals WHERE rent_id = p_rent_id;
-        IF v_count = 0 THEN
-            RAISE_APPLICATION_ERROR(-20034, 'Rental does not exist');
-        END IF;
-        SELECT status, condition_returned INTO v_rent_status, v_condition
-        FROM Rentals
-        WHERE rent_id = p_rent_id;
+        -- Status and amount come from the same row read
+        BEGIN
+            SELECT status, condition_returned, penalty
+            INTO v_rent_status, v_condition, v_penalty_amt
+            FROM v_rental_billing
+            WHERE rent_id = p_rent_id;
+        EXCEPTION
+            WHEN NO_DATA_FOUND THEN
+                RAISE_APPLICATION_ERROR(-20034, 'Rental does not exist');
+        END;
         IF v_rent_status = 'RENTED' OR v_condition IN ('DAMAGED', 'BROKEN') THEN
-            v_penalty_amt := calc_penalty_amt(p_rent_id);
             IF v_penalty_amt > 0 OR v_condition IN ('DAMAGED', 'BROKEN') THEN
                 INSERT INTO Penalties (rent_id, amount, reason)
                 VALUES (p_rent_id, v_penalty_amt, p_reason);
@@ -523,383 +853,702 @@ CREATE OR REPLACE PACKAGE BODY pkg_penalty_center AS
     END assign_penalty;
 
     PROCEDURE resolve_penalty(p_penalty_id IN NUMBER) IS
-        v_status VARCHAR2(20);
+        v_count NUMBER;
     BEGIN
-        BEGIN
-            SELECT status INTO v_status 
-            FROM Penalties 
-            WHERE penalty_id = p_penalty_id;
-        EXCEPTION
-            WHEN NO_DATA_FOUND THEN
+        UPDATE Penalties
+        SET status = 'PAID'
+        WHERE penalty_id = p_penalty_id
+          AND NVL(status, 'PENDING') != 'PAID';
+        IF SQL%ROWCOUNT = 0 THEN
+            SELECT COUNT(*) INTO v_count FROM Penalties WHERE penalty_id = p_penalty_id;
+            IF v_count = 0 THEN
                 RAISE_APPLICATION_ERROR(-20037, 'Penalty does not exist');
-        END;
-        IF v_status = 'PAID' THEN
+            END IF;
             RAISE_APPLICATION_ERROR(-20061, 'Penalty has already been resolved and paid');
         END IF;
-        UPDATE Penalties
-        SET status = 'PAID'
-        WHERE penalty_id = p_penalty_id;
     END resolve_penalty;
 
     FUNCTION calc_penalty_amt(p_rent_id IN NUMBER) RETURN NUMBER IS
-        v_rent_end_date DATE;
-        v_return_date DATE;
-        v_days_overdue NUMBER;
-        v_rent_price_per_day NUMBER;
-        v_penalty_amt NUMBER(10, 2) := 0;
-        v_count NUMBER;
-        v_condition VARCHAR2(50);
+        v_penalty_amt NUMBER(10, 2);
     BEGIN
-        SELECT COUNT(*) INTO v_count FROM Rentals WHERE rent_id = p_rent_id;
-        IF v_count = 0 THEN
-            RAISE_APPLICATION_ERROR(-20038, 'Rental does not exist');
-        END IF;
-        SELECT r.end_date, NVL(r.return_date, SYSDATE), g.rent_price_per_day, r.condition_returned
-        INTO v_rent_end_date, v_return_date, v_rent_price_per_day, v_condition
-        FROM Rentals r
-        JOIN Gear g ON r.gear_id = g.gear_id
-        WHERE r.rent_id = p_rent_id;
-        
-        IF v_return_date > v_rent_end_date THEN
-            v_days_overdue := CEIL(v_return_date - v_rent_end_date);          
-            v_penalty_amt := v_days_overdue * (v_rent_price_per_day * 2); -- 2x daily rate per overdue day
-        END IF;
-        IF v_condition = 'DAMAGED' THEN
-            v_penalty_amt := v_penalty_amt + 100; -- Additional $100 for damaged gear
-        ELSIF v_condition = 'BROKEN' THEN
-            v_penalty_amt := v_penalty_amt + 200; -- Additional $200 for broken gear
-        END IF;
+        SELECT penalty INTO v_penalty_amt FROM v_rental_billing WHERE rent_id = p_rent_id;
         RETURN v_penalty_amt;
+    EXCEPTION
+        WHEN NO_DATA_FOUND THEN
+            RAISE_APPLICATION_ERROR(-20038, 'Rental does not exist');
     END calc_penalty_amt;
+
+    PROCEDURE sweep_overdue(p_processed OUT NUMBER, p_elapsed OUT NUMBER) IS
+        v_started NUMBER := DBMS_UTILITY.GET_TIME;
+    BEGIN
+        -- One pass over idx_rentals_overdue; re-running only moves amounts on by
+        -- the days that passed since, so a missed or repeated run does no harm
+        MERGE INTO Penalties p
+        USING (
+            SELECT rent_id, penalty
+            FROM v_rental_billing
+            WHERE rented_until < SYSDATE AND penalty > 0
+        ) o
+        ON (p.rent_id = o.rent_id AND p.reason = c_overdue_reason)
+        WHEN MATCHED THEN
+            UPDATE SET p.amount = o.penalty
+            WHERE p.status = 'PENDING' AND p.amount != o.penalty
+        WHEN NOT MATCHED THEN
+            INSERT (rent_id, amount, reason) VALUES (o.rent_id, o.penalty, c_overdue_reason);
+        p_processed := SQL%ROWCOUNT;
+        p_elapsed := (DBMS_UTILITY.GET_TIME - v_started) / 100;
+        pkg_audit_trail.log_action(NULL, 'Penalties', 'OVERDUE SWEEP',
+            p_processed || ' overdue penalties assessed or updated in ' || TO_CHAR(p_elapsed, 'FM99990.00') || 's');
+    END sweep_overdue;
+
+    PROCEDURE schedule_sweep(p_hour IN NUMBER DEFAULT 2) IS
+    BEGIN
+        unschedule_sweep;
+        DBMS_SCHEDULER.CREATE_JOB(
+            job_name        => 'OVERDUE_SWEEP_JOB',
+            job_type        => 'PLSQL_BLOCK',
+            job_action      => 'DECLARE n NUMBER; s NUMBER; BEGIN pkg_penalty_center.sweep_overdue(n, s); COMMIT; END;',
+            repeat_interval => 'FREQ=DAILY;BYHOUR=' || p_hour || ';BYMINUTE=0;BYSECOND=0',
+            enabled         => TRUE);
+    END schedule_sweep;
+
+    PROCEDURE unschedule_sweep IS
+        e_no_job EXCEPTION;
+        PRAGMA EXCEPTION_INIT(e_no_job, -27475);
+    BEGIN
+        DBMS_SCHEDULER.DROP_JOB('OVERDUE_SWEEP_JOB', force => TRUE);
+    EXCEPTION
+        WHEN e_no_job THEN
+            NULL;
+    END unschedule_sweep;
 END pkg_penalty_center;
 /
 
 -- PACKAGE FOR AUDITS
 CREATE OR REPLACE PACKAGE pkg_audit_trail AS
+    -- Entries buffered by the audit triggers until their statement completes
+    TYPE t_entries IS TABLE OF Audit_Log%ROWTYPE INDEX BY PLS_INTEGER;
+    -- Buffered entries are flushed early once this many pile up, bounding trigger memory
+    c_flush_size CONSTANT PLS_INTEGER := 1000;
+
     PROCEDURE log_action(p_user_id IN NUMBER, p_table_name IN VARCHAR2, p_action IN VARCHAR2, p_details IN VARCHAR2);
-    PROCEDURE get_audit_log(p_table_name IN VARCHAR2, p_start_date IN DATE, p_end_date IN DATE, p_cursor OUT SYS_REFCURSOR);
+    PROCEDURE queue_action(p_entries IN OUT NOCOPY t_entries, p_user_id IN NUMBER, p_table_name IN VARCHAR2,
+                           p_action IN VARCHAR2, p_details IN VARCHAR2);
+    PROCEDURE flush(p_entries IN OUT NOCOPY t_entries);
+    -- Async mode: triggers write to Audit_Queue and drain moves entries into Audit_Log
+    PROCEDURE set_async(p_enabled IN CHAR);
+    PROCEDURE drain(p_batch_size IN NUMBER, p_moved OUT NUMBER);
+    PROCEDURE drain_all(p_batch_size IN NUMBER DEFAULT 500);
+    PROCEDURE schedule_drain(p_interval_seconds IN NUMBER DEFAULT 5);
+    PROCEDURE unschedule_drain;
+    -- Keyset-paginated: newest first, at most p_limit rows older than entry p_before_id
+    PROCEDURE get_audit_log(p_table_name IN VARCHAR2, p_start_date IN DATE, p_end_date IN DATE, p_cursor OUT SYS_REFCURSOR,
+                            p_before_id IN NUMBER DEFAULT NULL, p_limit IN NUMBER DEFAULT 200);
+    -- Retention: compress months older than compress_after_months, move months
+    -- older than archive_after_months to Audit_Archive
+    PROCEDURE set_retention(p_compress_after_months IN NUMBER, p_archive_after_months IN NUMBER);
+    PROCEDURE apply_retention(p_compressed OUT NUMBER, p_archived OUT NUMBER);
+    PROCEDURE schedule_retention(p_hour IN NUMBER DEFAULT 3);
+    PROCEDURE unschedule_retention;
 END pkg_audit_trail;
 /
 
 CREATE OR REPLACE PACKAGE BODY pkg_audit_trail AS
     PROCEDURE log_action(p_user_id IN NUMBER, p_table_name IN VARCHAR2, p_action IN VARCHAR2, p_details IN VARCHAR2) IS
+        v_entries t_entries;
+    BEGIN
+        queue_action(v_entries, p_user_id, p_table_name, p_action, p_details);
+        flush(v_entries);
+    END log_action;
+
+    PROCEDURE queue_action(p_entries IN OUT NOCOPY t_entries, p_user_id IN NUMBER, p_table_name IN VARCHAR2,
+                           p_action IN VARCHAR2, p_details IN VARCHAR2) IS
+        v_entry Audit_Log%ROWTYPE;
+    BEGIN
+        -- log_id is taken now so entries keep the order they were raised in
+        v_entry.log_id := audit_seq.NEXTVAL;
+        v_entry.user_id := p_user_id;
+        v_entry.table_name := p_table_name;
+        v_entry.action := p_action;
+        v_entry.timestamp := SYSDATE;
+        v_entry.details := p_details;
+        p_entries(p_entries.COUNT + 1) := v_entry;
+        IF p_entries.COUNT >= c_flush_size THEN
+            flush(p_entries);
+        END IF;
+    END queue_action;
+
+    PROCEDURE flush(p_entries IN OUT NOCOPY t_entries) IS
+        v_async CHAR(1);
     BEGIN
-        INSERT INTO Audit_Log (user_id, table_name, action, details)
-        VALUES (p_user_id, p_table_name, p_action, p_details);
+        IF p_entries.COUNT > 0 THEN
+            -- Read per flush (once per statement, not per row) so a mode switch applies to every session
+            SELECT async_enabled INTO v_async FROM Audit_Config WHERE config_id = 1;
+            IF v_async = 'Y' THEN
+                FORALL i IN 1 .. p_entries.COUNT
+                    INSERT INTO Audit_Queue VALUES p_entries(i);
+            ELSE
+                FORALL i IN 1 .. p_entries.COUNT
+                    INSERT INTO Audit_Log VALUES p_entries(i);
+            END IF;
+            p_entries.DELETE;
+        END IF;
     EXCEPTION
         WHEN OTHERS THEN
             RAISE_APPLICATION_ERROR(-20050, 'Audit log insertion failed: ' || SQLERRM);
-    END log_action;
+    END flush;
+
+    PROCEDURE set_async(p_enabled IN CHAR) IS
+    BEGIN
+        UPDATE Audit_Config SET async_enabled = p_enabled WHERE config_id = 1;
+    END set_async;
+
+    PROCEDURE drain(p_batch_size IN NUMBER, p_moved OUT NUMBER) IS
+        -- SKIP LOCKED lets a scheduler job and a Python drainer run side by side
+        CURSOR c_queue IS
+            SELECT * FROM Audit_Queue ORDER BY log_id FOR UPDATE SKIP LOCKED;
+        v_entries t_entries;
+    BEGIN
+        OPEN c_queue;
+        FETCH c_queue BULK COLLECT INTO v_entries LIMIT p_batch_size;
+        CLOSE c_queue;
+        FORALL i IN 1 .. v_entries.COUNT
+            INSERT INTO Audit_Log VALUES v_entries(i);
+        FORALL i IN 1 .. v_entries.COUNT
+            DELETE FROM Audit_Queue WHERE log_id = v_entries(i).log_id;
+        p_moved := v_entries.COUNT;
+    END drain;
+
+    PROCEDURE drain_all(p_batch_size IN NUMBER DEFAULT 500) IS
+        v_moved NUMBER;
+    BEGIN
+        LOOP
+            drain(p_batch_size, v_moved);
+            COMMIT;
+            EXIT WHEN v_moved < p_batch_size;
+        END LOOP;
+    END drain_all;
+
+    PROCEDURE schedule_drain(p_interval_seconds IN NUMBER DEFAULT 5) IS
+    BEGIN
+        unschedule_drain;
+        DBMS_SCHEDULER.CREATE_JOB(
+            job_name        => 'AUDIT_DRAIN_JOB',
+            job_type        => 'PLSQL_BLOCK',
+            job_action      => 'BEGIN pkg_audit_trail.drain_all; END;',
+            repeat_interval => 'FREQ=SECONDLY;INTERVAL=' || p_interval_seconds,
+            enabled         => TRUE);
+    END schedule_drain;
+
+    PROCEDURE unschedule_drain IS
+        e_no_job EXCEPTION;
+        PRAGMA EXCEPTION_INIT(e_no_job, -27475);
+    BEGIN
+        DBMS_SCHEDULER.DROP_JOB('AUDIT_DRAIN_JOB', force => TRUE);
+    EXCEPTION
+        WHEN e_no_job THEN
+            NULL;
+    END unschedule_drain;
 
-    PROCEDURE get_audit_log(p_table_name IN VARCHAR2, p_start_date IN DATE, p_end_date IN DATE, p_cursor OUT SYS_REFCURSOR) IS
+    PROCEDURE get_audit_log(p_table_name IN VARCHAR2, p_start_date IN DATE, p_end_date IN DATE, p_cursor OUT SYS_REFCURSOR,
+                            p_before_id IN NUMBER DEFAULT NULL, p_limit IN NUMBER DEFAULT 200) IS
+        v_sql VARCHAR2(1000) := 'SELECT log_id, user_id, table_name, action, timestamp, details FROM Audit_Log WHERE 1 = 1';
+        v_before_ts DATE;
     BEGIN
-        OPEN p_cursor FOR
-        SELECT log_id, user_id, table_name, action, timestamp, details
-        FROM Audit_Log
-        WHERE table_name = NVL(p_table_name, table_name)
-          AND timestamp BETWEEN p_start_date AND p_end_date
-        ORDER BY timestamp DESC;
+        -- Only the filters actually given become predicates, so each can use its
+        -- index; a missing one becomes an always-true "(1 = 1 OR :x IS NULL)"
+        -- to keep the bind list fixed. Rows come in (timestamp, log_id) order,
+        -- the order of the local indexes, and each page starts where the
+        -- previous one ended. Every bound on timestamp, the page key's
+        -- included, prunes the partitions outside it.
+        IF p_before_id IS NOT NULL THEN
+            BEGIN
+                SELECT timestamp INTO v_before_ts FROM Audit_Log WHERE log_id = p_before_id;
+            EXCEPTION
+                WHEN NO_DATA_FOUND THEN
+                    v_before_ts := NULL;  -- archived since the previous page: page by log_id alone
+            END;
+        END IF;
+        v_sql := v_sql || CASE WHEN p_table_name IS NULL THEN ' AND (1 = 1 OR :t IS NULL)' ELSE ' AND table_name = :t' END
+                       || CASE WHEN p_start_date IS NULL THEN ' AND (1 = 1 OR :s IS NULL)' ELSE ' AND timestamp >= :s' END
+                       || CASE WHEN p_end_date IS NULL THEN ' AND (1 = 1 OR :e IS NULL)' ELSE ' AND timestamp <= :e' END
+                       || CASE WHEN p_before_id IS NULL THEN ' AND (1 = 1 OR :bt IS NULL OR :bt IS NULL OR :b IS NULL)'
+                               WHEN v_before_ts IS NULL THEN ' AND (1 = 1 OR :bt IS NULL OR :bt IS NULL) AND log_id < :b'
+                               ELSE ' AND timestamp <= :bt AND (timestamp < :bt OR log_id < :b)' END
+                       || ' ORDER BY timestamp DESC, log_id DESC FETCH FIRST :n ROWS ONLY';
+        OPEN p_cursor FOR v_sql USING p_table_name, p_start_date, p_end_date, v_before_ts, v_before_ts, p_before_id, p_limit;
     END get_audit_log;
+
+    PROCEDURE set_retention(p_compress_after_months IN NUMBER, p_archive_after_months IN NUMBER) IS
+    BEGIN
+        UPDATE Audit_Config
+        SET compress_after_months = NVL(p_compress_after_months, compress_after_months),
+            archive_after_months = NVL(p_archive_after_months, archive_after_months)
+        WHERE config_id = 1;
+    END set_retention;
+
+    PROCEDURE apply_retention(p_compressed OUT NUMBER, p_archived OUT NUMBER) IS
+        v_compress_before DATE;
+        v_archive_before DATE;
+        v_high_value VARCHAR2(200);
+        v_month_end DATE;
+    BEGIN
+        SELECT ADD_MONTHS(TRUNC(SYSDATE, 'MM'), -compress_after_months),
+               ADD_MONTHS(TRUNC(SYSDATE, 'MM'), -archive_after_months)
+        INTO v_compress_before, v_archive_before
+        FROM Audit_Config
+        WHERE config_id = 1;
+        p_compressed := 0;
+        p_archived := 0;
+        -- Interval partitions only: the first one is the fixed starting point and stays
+        FOR p IN (SELECT partition_name, high_value, compression
+                  FROM user_tab_partitions
+                  WHERE table_name = 'AUDIT_LOG' AND interval = 'YES'
+                  ORDER BY partition_position) LOOP
+            v_high_value := p.high_value;
+            EXECUTE IMMEDIATE 'SELECT ' || v_high_value || ' FROM dual' INTO v_month_end;
+            IF v_month_end <= v_archive_before THEN
+                -- Clear whatever an earlier run copied before its DROP failed, since
+                -- Audit_Archive has no key to reject the month a second time
+                DELETE FROM Audit_Archive
+                WHERE timestamp >= ADD_MONTHS(v_month_end, -1) AND timestamp < v_month_end;
+                COMMIT;
+                -- Direct-path copy, then drop the month; the DDL commits both
+                EXECUTE IMMEDIATE 'INSERT /*+ APPEND */ INTO Audit_Archive SELECT * FROM Audit_Log PARTITION ('
+                                  || p.partition_name || ')';
+                EXECUTE IMMEDIATE 'ALTER TABLE Audit_Log DROP PARTITION ' || p.partition_name || ' UPDATE GLOBAL INDEXES';
+                p_archived := p_archived + 1;
+            ELSIF v_month_end <= v_compress_before AND p.compression = 'DISABLED' THEN
+                EXECUTE IMMEDIATE 'ALTER TABLE Audit_Log MOVE PARTITION ' || p.partition_name || ' COMPRESS UPDATE INDEXES';
+                p_compressed := p_compressed + 1;
+            END IF;
+        END LOOP;
+        -- UPDATE INDEXES leaves the moved partitions of idx_audit_text (a domain index) unusable
+        FOR i IN (SELECT ip.index_name, ip.partition_name
+                  FROM user_ind_partitions ip
+                  JOIN user_indexes ix ON ix.index_name = ip.index_name
+                  WHERE ix.table_name = 'AUDIT_LOG' AND ip.status = 'UNUSABLE') LOOP
+            EXECUTE IMMEDIATE 'ALTER INDEX ' || i.index_name || ' REBUILD PARTITION ' || i.partition_name;
+        END LOOP;
+        IF p_compressed + p_archived > 0 THEN
+            log_action(NULL, 'Audit_Log', 'RETENTION',
+                p_compressed || ' months compressed, ' || p_archived || ' months archived');
+            COMMIT;
+        END IF;
+    END apply_retention;
+
+    PROCEDURE schedule_retention(p_hour IN NUMBER DEFAULT 3) IS
+    BEGIN
+        unschedule_retention;
+        DBMS_SCHEDULER.CREATE_JOB(
+            job_name        => 'AUDIT_RETENTION_JOB',
+            job_type        => 'PLSQL_BLOCK',
+            job_action      => 'DECLARE c NUMBER; a NUMBER; BEGIN pkg_audit_trail.apply_retention(c, a); END;',
+            repeat_interval => 'FREQ=DAILY;BYHOUR=' || p_hour || ';BYMINUTE=0;BYSECOND=0',
+            enabled         => TRUE);
+    END schedule_retention;
+
+    PROCEDURE unschedule_retention IS
+        e_no_job EXCEPTION;
+        PRAGMA EXCEPTION_INIT(e_no_job, -27475);
+    BEGIN
+        DBMS_SCHEDULER.DROP_JOB('AUDIT_RETENTION_JOB', force => TRUE);
+    EXCEPTION
+        WHEN e_no_job THEN
+            NULL;
+    END unschedule_retention;
 END pkg_audit_trail;
 /
 
 -- RENTAL LIMIT TRIGGER
+-- Checked once per statement for each user that got a new rental, after the
+-- rows are in: a multi-row insert (rent_gear_batch's FORALL) may not query
+-- Rentals from a row trigger, and a kit of items needs one count, not one each
 CREATE OR REPLACE TRIGGER trg_rental_limit
-BEFORE INSERT ON Rentals
-FOR EACH ROW
-DECLARE
-    v_count NUMBER;
-BEGIN
-    SELECT COUNT(*) INTO v_count
-    FROM Rentals
-    WHERE user_id = :NEW.user_id AND status = 'RENTED';
-    IF v_count >= 3 THEN
-        RAISE_APPLICATION_ERROR(-20053, 'User has reached rental limit of 3 active rentals');
-    END IF;
-END;
+FOR INSERT ON Rentals
+COMPOUND TRIGGER
+    TYPE t_users IS TABLE OF BOOLEAN INDEX BY PLS_INTEGER;  -- keyed by user_id
+    g_users t_users;
+
+    AFTER EACH ROW IS
+    BEGIN
+        g_users(:NEW.user_id) := TRUE;
+    END AFTER EACH ROW;
+
+    AFTER STATEMENT IS
+        v_user_id PLS_INTEGER := g_users.FIRST;
+        v_count NUMBER;
+    BEGIN
+        WHILE v_user_id IS NOT NULL LOOP
+            -- Same as user_id = v_user_id AND status = 'RENTED', via idx_rentals_active
+            SELECT COUNT(*) INTO v_count
+            FROM Rentals
+            WHERE CASE WHEN status = 'RENTED' THEN user_id END = v_user_id;
+            IF v_count > 3 THEN
+                RAISE_APPLICATION_ERROR(-20053, 'User has reached rental limit of 3 active rentals');
+            END IF;
+            v_user_id := g_users.NEXT(v_user_id);
+        END LOOP;
+    END AFTER STATEMENT;
+END trg_rental_limit;
 /
 
 -- AUDIT TRIGGERS FOR ALL CHANGES
+-- Compound triggers: entries are collected per row and written with one FORALL
+-- insert when the statement ends, so a bulk UPDATE does not insert row by row
 
 CREATE OR REPLACE TRIGGER trg_users_audit
-AFTER INSERT OR UPDATE OR DELETE ON Users
-FOR EACH ROW
-BEGIN
-    IF INSERTING THEN
-        pkg_audit_trail.log_action(:NEW.user_id, 'Users', 'INSERT', 
-            'User added: ID=' || :NEW.user_id || ', Name=' || :NEW.name || 
-            ', Email=' || :NEW.email || ', Phone=' || NVL(:NEW.phone, 'NULL') || 
-            ', Status=' || :NEW.status || ', Role=' || :NEW.role || 
-            ', Created_at=' || TO_CHAR(:NEW.created_at, 'YYYY-MM-DD'));
-    ELSIF UPDATING THEN
-        IF :OLD.name != :NEW.name THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Users', 'UPDATE', 
-                'User name changed from ' || :OLD.name || ' to ' || :NEW.name);
-        END IF;
-        IF :OLD.email != :NEW.email THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Users', 'UPDATE', 
-                'User email changed from ' || :OLD.email || ' to ' || :NEW.email);
-        END IF;
-        IF NVL(:OLD.phone, 'NULL') != NVL(:NEW.phone, 'NULL') THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Users', 'UPDATE', 
-                'User phone changed from ' || NVL(:OLD.phone, 'NULL') || ' to ' || NVL(:NEW.phone, 'NULL'));
-        END IF;
-        IF :OLD.status != :NEW.status THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Users', 'UPDATE', 
-                'User status changed from ' || :OLD.status || ' to ' || :NEW.status);
-        END IF;
-        IF :OLD.role != :NEW.role THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Users', 'UPDATE', 
-                'User role changed from ' || :OLD.role || ' to ' || :NEW.role);
-        END IF;
-        IF NVL(:OLD.password_hash, 'NULL') != NVL(:NEW.password_hash, 'NULL') THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Users', 'UPDATE', 
-                'User password_hash changed');
-        END IF;
-        IF :OLD.created_at != :NEW.created_at THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Users', 'UPDATE', 
-                'User created_at changed from ' || TO_CHAR(:OLD.created_at, 'YYYY-MM-DD') || 
-                ' to ' || TO_CHAR(:NEW.created_at, 'YYYY-MM-DD'));
-        END IF;
-    ELSIF DELETING THEN
-        pkg_audit_trail.log_action(:OLD.user_id, 'Users', 'DELETE', 
-            'User deleted: ID=' || :OLD.user_id || ', Name=' || :OLD.name || 
-            ', Email=' || :OLD.email || ', Phone=' || NVL(:OLD.phone, 'NULL') || 
-            ', Status=' || :OLD.status || ', Role=' || :OLD.role || 
-            ', Created_at=' || TO_CHAR(:OLD.created_at, 'YYYY-MM-DD'));
-    END IF;
-END;
+FOR INSERT OR UPDATE OR DELETE ON Users
+COMPOUND TRIGGER
+    g_entries pkg_audit_trail.t_entries;
+
+    PROCEDURE log_action(p_user_id IN NUMBER, p_action IN VARCHAR2, p_details IN VARCHAR2) IS
+    BEGIN
+        pkg_audit_trail.queue_action(g_entries, p_user_id, 'Users', p_action, p_details);
+    END log_action;
+
+    AFTER EACH ROW IS
+    BEGIN
+        IF INSERTING THEN
+            log_action(:NEW.user_id, 'INSERT', 
+                'User added: ID=' || :NEW.user_id || ', Name=' || :NEW.name || 
+                ', Email=' || :NEW.email || ', Phone=' || NVL(:NEW.phone, 'NULL') || 
+                ', Status=' || :NEW.status || ', Role=' || :NEW.role || 
+                ', Created_at=' || TO_CHAR(:NEW.created_at, 'YYYY-MM-DD'));
+        ELSIF UPDATING THEN
+            IF :OLD.name != :NEW.name THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'User name changed from ' || :OLD.name || ' to ' || :NEW.name);
+            END IF;
+            IF :OLD.email != :NEW.email THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'User email changed from ' || :OLD.email || ' to ' || :NEW.email);
+            END IF;
+            IF NVL(:OLD.phone, 'NULL') != NVL(:NEW.phone, 'NULL') THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'User phone changed from ' || NVL(:OLD.phone, 'NULL') || ' to ' || NVL(:NEW.phone, 'NULL'));
+            END IF;
+            IF :OLD.status != :NEW.status THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'User status changed from ' || :OLD.status || ' to ' || :NEW.status);
+            END IF;
+            IF :OLD.role != :NEW.role THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'User role changed from ' || :OLD.role || ' to ' || :NEW.role);
+            END IF;
+            IF NVL(:OLD.password_hash, 'NULL') != NVL(:NEW.password_hash, 'NULL') THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'User password_hash changed');
+            END IF;
+            IF :OLD.created_at != :NEW.created_at THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'User created_at changed from ' || TO_CHAR(:OLD.created_at, 'YYYY-MM-DD') || 
+                    ' to ' || TO_CHAR(:NEW.created_at, 'YYYY-MM-DD'));
+            END IF;
+        ELSIF DELETING THEN
+            log_action(:OLD.user_id, 'DELETE', 
+                'User deleted: ID=' || :OLD.user_id || ', Name=' || :OLD.name || 
+                ', Email=' || :OLD.email || ', Phone=' || NVL(:OLD.phone, 'NULL') || 
+                ', Status=' || :OLD.status || ', Role=' || :OLD.role || 
+                ', Created_at=' || TO_CHAR(:OLD.created_at, 'YYYY-MM-DD'));
+        END IF;
+    END AFTER EACH ROW;
+
+    AFTER STATEMENT IS
+    BEGIN
+        pkg_audit_trail.flush(g_entries);
+    END AFTER STATEMENT;
+END trg_users_audit;
 /
 
 CREATE OR REPLACE TRIGGER trg_gear_audit
-AFTER INSERT OR UPDATE OR DELETE ON Gear
-FOR EACH ROW
-BEGIN
-    IF INSERTING THEN
-        pkg_audit_trail.log_action(NULL, 'Gear', 'INSERT', 
-            'Gear added: ID=' || :NEW.gear_id || ', Name=' || :NEW.name || 
-            ', Category=' || NVL(:NEW.category, 'NULL') || ', Brand=' || NVL(:NEW.brand, 'NULL') || 
-            ', Rent_price=' || :NEW.rent_price_per_day || ', Sub_price=' || :NEW.sub_price_per_month || 
-            ', Stock=' || :NEW.stock || ', Status=' || :NEW.status);
-    ELSIF UPDATING THEN
-        IF :OLD.name != :NEW.name THEN
-            pkg_audit_trail.log_action(NULL, 'Gear', 'UPDATE', 
-                'Gear name changed from ' || :OLD.name || ' to ' || :NEW.name);
-        END IF;
-        IF NVL(:OLD.category, 'NULL') != NVL(:NEW.category, 'NULL') THEN
-            pkg_audit_trail.log_action(NULL, 'Gear', 'UPDATE', 
-                'Gear category changed from ' || NVL(:OLD.category, 'NULL') || ' to ' || NVL(:NEW.category, 'NULL'));
-        END IF;
-        IF NVL(:OLD.brand, 'NULL') != NVL(:NEW.brand, 'NULL') THEN
-            pkg_audit_trail.log_action(NULL, 'Gear', 'UPDATE', 
-                'Gear brand changed from ' || NVL(:OLD.brand, 'NULL') || ' to ' || NVL(:NEW.brand, 'NULL'));
-        END IF;
-        IF :OLD.rent_price_per_day != :NEW.rent_price_per_day THEN
-            pkg_audit_trail.log_action(NULL, 'Gear', 'UPDATE', 
-                'Gear rent_price_per_day changed from ' || :OLD.rent_price_per_day || ' to ' || :NEW.rent_price_per_day);
-        END IF;
-        IF :OLD.sub_price_per_month != :NEW.sub_price_per_month THEN
-            pkg_audit_trail.log_action(NULL, 'Gear', 'UPDATE', 
-                'Gear sub_price_per_month changed from ' || :OLD.sub_price_per_month || ' to ' || :NEW.sub_price_per_month);
-        END IF;
-        IF :OLD.stock != :NEW.stock THEN
-            pkg_audit_trail.log_action(NULL, 'Gear', 'UPDATE', 
-                'Gear stock changed from ' || :OLD.stock || ' to ' || :NEW.stock);
-        END IF;
-        IF :OLD.status != :NEW.status THEN
-            pkg_audit_trail.log_action(NULL, 'Gear', 'UPDATE', 
-                'Gear status changed from ' || :OLD.status || ' to ' || :NEW.status);
-        END IF;
-    ELSIF DELETING THEN
-        pkg_audit_trail.log_action(NULL, 'Gear', 'DELETE', 
-            'Gear deleted: ID=' || :OLD.gear_id || ', Name=' || :OLD.name || 
-            ', Category=' || NVL(:OLD.category, 'NULL') || ', Brand=' || NVL(:OLD.brand, 'NULL') || 
-            ', Rent_price=' || :OLD.rent_price_per_day || ', Sub_price=' || :OLD.sub_price_per_month || 
-            ', Stock=' || :OLD.stock || ', Status=' || :OLD.status);
-    END IF;
-END;
+FOR INSERT OR UPDATE OR DELETE ON Gear
+COMPOUND TRIGGER
+    g_entries pkg_audit_trail.t_entries;
+
+    PROCEDURE log_action(p_user_id IN NUMBER, p_action IN VARCHAR2, p_details IN VARCHAR2) IS
+    BEGIN
+        pkg_audit_trail.queue_action(g_entries, p_user_id, 'Gear', p_action, p_details);
+    END log_action;
+
+    AFTER EACH ROW IS
+    BEGIN
+        IF INSERTING THEN
+            log_action(NULL, 'INSERT', 
+                'Gear added: ID=' || :NEW.gear_id || ', Name=' || :NEW.name || 
+                ', Category=' || NVL(:NEW.category, 'NULL') || ', Brand=' || NVL(:NEW.brand, 'NULL') || 
+                ', Rent_price=' || :NEW.rent_price_per_day || ', Sub_price=' || :NEW.sub_price_per_month || 
+                ', Stock=' || :NEW.stock || ', Status=' || :NEW.status);
+        ELSIF UPDATING THEN
+            IF :OLD.name != :NEW.name THEN
+                log_action(NULL, 'UPDATE', 
+                    'Gear name changed from ' || :OLD.name || ' to ' || :NEW.name);
+            END IF;
+            IF NVL(:OLD.category, 'NULL') != NVL(:NEW.category, 'NULL') THEN
+                log_action(NULL, 'UPDATE', 
+                    'Gear category changed from ' || NVL(:OLD.category, 'NULL') || ' to ' || NVL(:NEW.category, 'NULL'));
+            END IF;
+            IF NVL(:OLD.brand, 'NULL') != NVL(:NEW.brand, 'NULL') THEN
+                log_action(NULL, 'UPDATE', 
+                    'Gear brand changed from ' || NVL(:OLD.brand, 'NULL') || ' to ' || NVL(:NEW.brand, 'NULL'));
+            END IF;
+            IF :OLD.rent_price_per_day != :NEW.rent_price_per_day THEN
+                log_action(NULL, 'UPDATE', 
+                    'Gear rent_price_per_day changed from ' || :OLD.rent_price_per_day || ' to ' || :NEW.rent_price_per_day);
+            END IF;
+            IF :OLD.sub_price_per_month != :NEW.sub_price_per_month THEN
+                log_action(NULL, 'UPDATE', 
+                    'Gear sub_price_per_month changed from ' || :OLD.sub_price_per_month || ' to ' || :NEW.sub_price_per_month);
+            END IF;
+            IF :OLD.stock != :NEW.stock THEN
+                log_action(NULL, 'UPDATE', 
+                    'Gear stock changed from ' || :OLD.stock || ' to ' || :NEW.stock);
+            END IF;
+            IF :OLD.status != :NEW.status THEN
+                log_action(NULL, 'UPDATE', 
+                    'Gear status changed from ' || :OLD.status || ' to ' || :NEW.status);
+            END IF;
+        ELSIF DELETING THEN
+            log_action(NULL, 'DELETE', 
+                'Gear deleted: ID=' || :OLD.gear_id || ', Name=' || :OLD.name || 
+                ', Category=' || NVL(:OLD.category, 'NULL') || ', Brand=' || NVL(:OLD.brand, 'NULL') || 
+                ', Rent_price=' || :OLD.rent_price_per_day || ', Sub_price=' || :OLD.sub_price_per_month || 
+                ', Stock=' || :OLD.stock || ', Status=' || :OLD.status);
+        END IF;
+    END AFTER EACH ROW;
+
+    AFTER STATEMENT IS
+    BEGIN
+        pkg_audit_trail.flush(g_entries);
+    END AFTER STATEMENT;
+END trg_gear_audit;
 /
 
 CREATE OR REPLACE TRIGGER trg_rentals_audit
-AFTER INSERT OR UPDATE OR DELETE ON Rentals
-FOR EACH ROW
-BEGIN
-    IF INSERTING THEN
-        pkg_audit_trail.log_action(:NEW.user_id, 'Rentals', 'INSERT', 
-            'Rental added: ID=' || :NEW.rent_id || ', User=' || :NEW.user_id || 
-            ', Gear=' || :NEW.gear_id || ', Start_date=' || TO_CHAR(:NEW.start_date, 'YYYY-MM-DD') || 
-            ', End_date=' || NVL(TO_CHAR(:NEW.end_date, 'YYYY-MM-DD'), 'NULL') || 
-            ', Return_date=' || NVL(TO_CHAR(:NEW.return_date, 'YYYY-MM-DD'), 'NULL') || 
-            ', Status=' || :NEW.status || ', Condition=' || NVL(:NEW.condition_returned, 'NULL'));
-    ELSIF UPDATING THEN
-        IF :OLD.user_id != :NEW.user_id THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Rentals', 'UPDATE', 
-                'Rental user_id changed from ' || :OLD.user_id || ' to ' || :NEW.user_id);
-        END IF;
-        IF :OLD.gear_id != :NEW.gear_id THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Rentals', 'UPDATE', 
-                'Rental gear_id changed from ' || :OLD.gear_id || ' to ' || :NEW.gear_id);
-        END IF;
-        IF :OLD.start_date != :NEW.start_date THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Rentals', 'UPDATE', 
-                'Rental start_date changed from ' || TO_CHAR(:OLD.start_date, 'YYYY-MM-DD') || 
-                ' to ' || TO_CHAR(:NEW.start_date, 'YYYY-MM-DD'));
-        END IF;
-        IF NVL(TO_CHAR(:OLD.end_date, 'YYYY-MM-DD'), 'NULL') != NVL(TO_CHAR(:NEW.end_date, 'YYYY-MM-DD'), 'NULL') THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Rentals', 'UPDATE', 
-                'Rental end_date changed from ' || NVL(TO_CHAR(:OLD.end_date, 'YYYY-MM-DD'), 'NULL') || 
-                ' to ' || NVL(TO_CHAR(:NEW.end_date, 'YYYY-MM-DD'), 'NULL'));
-        END IF;
-        IF NVL(TO_CHAR(:OLD.return_date, 'YYYY-MM-DD'), 'NULL') != NVL(TO_CHAR(:NEW.return_date, 'YYYY-MM-DD'), 'NULL') THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Rentals', 'UPDATE', 
-                'Rental return_date changed from ' || NVL(TO_CHAR(:OLD.return_date, 'YYYY-MM-DD'), 'NULL') || 
-                ' to ' || NVL(TO_CHAR(:NEW.return_date, 'YYYY-MM-DD'), 'NULL'));
-        END IF;
-        IF :OLD.status != :NEW.status THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Rentals', 'UPDATE', 
-                'Rental status changed from ' || :OLD.status || ' to ' || :NEW.status);
-        END IF;
-        IF NVL(:OLD.condition_returned, 'NULL') != NVL(:NEW.condition_returned, 'NULL') THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Rentals', 'UPDATE', 
-                'Rental condition_returned changed from ' || NVL(:OLD.condition_returned, 'NULL') || 
-                ' to ' || NVL(:NEW.condition_returned, 'NULL'));
-        END IF;
-    ELSIF DELETING THEN
-        pkg_audit_trail.log_action(:OLD.user_id, 'Rentals', 'DELETE', 
-            'Rental deleted: ID=' || :OLD.rent_id || ', User=' || :OLD.user_id || 
-            ', Gear=' || :OLD.gear_id || ', Start_date=' || TO_CHAR(:OLD.start_date, 'YYYY-MM-DD') || 
-            ', End_date=' || NVL(TO_CHAR(:OLD.end_date, 'YYYY-MM-DD'), 'NULL') || 
-            ', Return_date=' || NVL(TO_CHAR(:OLD.return_date, 'YYYY-MM-DD'), 'NULL') || 
-            ', Status=' || :OLD.status || ', Condition=' || NVL(:OLD.condition_returned, 'NULL'));
-    END IF;
-END;
+FOR INSERT OR UPDATE OR DELETE ON Rentals
+COMPOUND TRIGGER
+    g_entries pkg_audit_trail.t_entries;
+
+    PROCEDURE log_action(p_user_id IN NUMBER, p_action IN VARCHAR2, p_details IN VARCHAR2) IS
+    BEGIN
+        pkg_audit_trail.queue_action(g_entries, p_user_id, 'Rentals', p_action, p_details);
+    END log_action;
+
+    AFTER EACH ROW IS
+    BEGIN
+        IF INSERTING THEN
+            log_action(:NEW.user_id, 'INSERT', 
+                'Rental added: ID=' || :NEW.rent_id || ', User=' || :NEW.user_id || 
+                ', Gear=' || :NEW.gear_id || ', Start_date=' || TO_CHAR(:NEW.start_date, 'YYYY-MM-DD') || 
+                ', End_date=' || NVL(TO_CHAR(:NEW.end_date, 'YYYY-MM-DD'), 'NULL') || 
+                ', Return_date=' || NVL(TO_CHAR(:NEW.return_date, 'YYYY-MM-DD'), 'NULL') || 
+                ', Status=' || :NEW.status || ', Condition=' || NVL(:NEW.condition_returned, 'NULL'));
+        ELSIF UPDATING THEN
+            IF :OLD.user_id != :NEW.user_id THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Rental user_id changed from ' || :OLD.user_id || ' to ' || :NEW.user_id);
+            END IF;
+            IF :OLD.gear_id != :NEW.gear_id THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Rental gear_id changed from ' || :OLD.gear_id || ' to ' || :NEW.gear_id);
+            END IF;
+            IF :OLD.start_date != :NEW.start_date THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Rental start_date changed from ' || TO_CHAR(:OLD.start_date, 'YYYY-MM-DD') || 
+                    ' to ' || TO_CHAR(:NEW.start_date, 'YYYY-MM-DD'));
+            END IF;
+            IF NVL(TO_CHAR(:OLD.end_date, 'YYYY-MM-DD'), 'NULL') != NVL(TO_CHAR(:NEW.end_date, 'YYYY-MM-DD'), 'NULL') THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Rental end_date changed from ' || NVL(TO_CHAR(:OLD.end_date, 'YYYY-MM-DD'), 'NULL') || 
+                    ' to ' || NVL(TO_CHAR(:NEW.end_date, 'YYYY-MM-DD'), 'NULL'));
+            END IF;
+            IF NVL(TO_CHAR(:OLD.return_date, 'YYYY-MM-DD'), 'NULL') != NVL(TO_CHAR(:NEW.return_date, 'YYYY-MM-DD'), 'NULL') THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Rental return_date changed from ' || NVL(TO_CHAR(:OLD.return_date, 'YYYY-MM-DD'), 'NULL') || 
+                    ' to ' || NVL(TO_CHAR(:NEW.return_date, 'YYYY-MM-DD'), 'NULL'));
+            END IF;
+            IF :OLD.status != :NEW.status THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Rental status changed from ' || :OLD.status || ' to ' || :NEW.status);
+            END IF;
+            IF NVL(:OLD.condition_returned, 'NULL') != NVL(:NEW.condition_returned, 'NULL') THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Rental condition_returned changed from ' || NVL(:OLD.condition_returned, 'NULL') || 
+                    ' to ' || NVL(:NEW.condition_returned, 'NULL'));
+            END IF;
+        ELSIF DELETING THEN
+            log_action(:OLD.user_id, 'DELETE', 
+                'Rental deleted: ID=' || :OLD.rent_id || ', User=' || :OLD.user_id || 
+                ', Gear=' || :OLD.gear_id || ', Start_date=' || TO_CHAR(:OLD.start_date, 'YYYY-MM-DD') || 
+                ', End_date=' || NVL(TO_CHAR(:OLD.end_date, 'YYYY-MM-DD'), 'NULL') || 
+                ', Return_date=' || NVL(TO_CHAR(:OLD.return_date, 'YYYY-MM-DD'), 'NULL') || 
+                ', Status=' || :OLD.status || ', Condition=' || NVL(:OLD.condition_returned, 'NULL'));
+        END IF;
+    END AFTER EACH ROW;
+
+    AFTER STATEMENT IS
+    BEGIN
+        pkg_audit_trail.flush(g_entries);
+    END AFTER STATEMENT;
+END trg_rentals_audit;
 /
 
 CREATE OR REPLACE TRIGGER trg_subscriptions_audit
-AFTER INSERT OR UPDATE OR DELETE ON Subscriptions
-FOR EACH ROW
-BEGIN
-    IF INSERTING THEN
-        pkg_audit_trail.log_action(:NEW.user_id, 'Subscriptions', 'INSERT', 
-            'Subscription added: ID=' || :NEW.sub_id || ', User=' || :NEW.user_id || 
-            ', Gear=' || :NEW.gear_id || ', Start_date=' || TO_CHAR(:NEW.start_date, 'YYYY-MM-DD') || 
-            ', End_date=' || TO_CHAR(:NEW.end_date, 'YYYY-MM-DD') || ', Is_active=' || :NEW.is_active);
-    ELSIF UPDATING THEN
-        IF :OLD.user_id != :NEW.user_id THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Subscriptions', 'UPDATE', 
-                'Subscription user_id changed from ' || :OLD.user_id || ' to ' || :NEW.user_id);
-        END IF;
-        IF :OLD.gear_id != :NEW.gear_id THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Subscriptions', 'UPDATE', 
-                'Subscription gear_id changed from ' || :OLD.gear_id || ' to ' || :NEW.gear_id);
-        END IF;
-        IF :OLD.start_date != :NEW.start_date THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Subscriptions', 'UPDATE', 
-                'Subscription start_date changed from ' || TO_CHAR(:OLD.start_date, 'YYYY-MM-DD') || 
-                ' to ' || TO_CHAR(:NEW.start_date, 'YYYY-MM-DD'));
-        END IF;
-        IF :OLD.end_date != :NEW.end_date THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Subscriptions', 'UPDATE', 
-                'Subscription end_date changed from ' || TO_CHAR(:OLD.end_date, 'YYYY-MM-DD') || 
-                ' to ' || TO_CHAR(:NEW.end_date, 'YYYY-MM-DD'));
-        END IF;
-        IF :OLD.is_active != :NEW.is_active THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Subscriptions', 'UPDATE', 
-                'Subscription is_active changed from ' || :OLD.is_active || ' to ' || :NEW.is_active);
-        END IF;
-    ELSIF DELETING THEN
-        pkg_audit_trail.log_action(:OLD.user_id, 'Subscriptions', 'DELETE', 
-            'Subscription deleted: ID=' || :OLD.sub_id || ', User=' || :OLD.user_id || 
-            ', Gear=' || :OLD.gear_id || ', Start_date=' || TO_CHAR(:OLD.start_date, 'YYYY-MM-DD') || 
-            ', End_date=' || TO_CHAR(:OLD.end_date, 'YYYY-MM-DD') || ', Is_active=' || :OLD.is_active);
-    END IF;
-END;
+FOR INSERT OR UPDATE OR DELETE ON Subscriptions
+COMPOUND TRIGGER
+    g_entries pkg_audit_trail.t_entries;
+
+    PROCEDURE log_action(p_user_id IN NUMBER, p_action IN VARCHAR2, p_details IN VARCHAR2) IS
+    BEGIN
+        pkg_audit_trail.queue_action(g_entries, p_user_id, 'Subscriptions', p_action, p_details);
+    END log_action;
+
+    AFTER EACH ROW IS
+    BEGIN
+        IF INSERTING THEN
+            log_action(:NEW.user_id, 'INSERT', 
+                'Subscription added: ID=' || :NEW.sub_id || ', User=' || :NEW.user_id || 
+                ', Gear=' || :NEW.gear_id || ', Start_date=' || TO_CHAR(:NEW.start_date, 'YYYY-MM-DD') || 
+                ', End_date=' || TO_CHAR(:NEW.end_date, 'YYYY-MM-DD') || ', Is_active=' || :NEW.is_active);
+        ELSIF UPDATING THEN
+            IF :OLD.user_id != :NEW.user_id THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Subscription user_id changed from ' || :OLD.user_id || ' to ' || :NEW.user_id);
+            END IF;
+            IF :OLD.gear_id != :NEW.gear_id THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Subscription gear_id changed from ' || :OLD.gear_id || ' to ' || :NEW.gear_id);
+            END IF;
+            IF :OLD.start_date != :NEW.start_date THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Subscription start_date changed from ' || TO_CHAR(:OLD.start_date, 'YYYY-MM-DD') || 
+                    ' to ' || TO_CHAR(:NEW.start_date, 'YYYY-MM-DD'));
+            END IF;
+            IF :OLD.end_date != :NEW.end_date THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Subscription end_date changed from ' || TO_CHAR(:OLD.end_date, 'YYYY-MM-DD') || 
+                    ' to ' || TO_CHAR(:NEW.end_date, 'YYYY-MM-DD'));
+            END IF;
+            IF :OLD.is_active != :NEW.is_active THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Subscription is_active changed from ' || :OLD.is_active || ' to ' || :NEW.is_active);
+            END IF;
+        ELSIF DELETING THEN
+            log_action(:OLD.user_id, 'DELETE', 
+                'Subscription deleted: ID=' || :OLD.sub_id || ', User=' || :OLD.user_id || 
+                ', Gear=' || :OLD.gear_id || ', Start_date=' || TO_CHAR(:OLD.start_date, 'YYYY-MM-DD') || 
+                ', End_date=' || TO_CHAR(:OLD.end_date, 'YYYY-MM-DD') || ', Is_active=' || :OLD.is_active);
+        END IF;
+    END AFTER EACH ROW;
+
+    AFTER STATEMENT IS
+    BEGIN
+        pkg_audit_trail.flush(g_entries);
+    END AFTER STATEMENT;
+END trg_subscriptions_audit;
 /
 
 CREATE OR REPLACE TRIGGER trg_payments_audit
-AFTER INSERT OR UPDATE OR DELETE ON Payments
-FOR EACH ROW
-BEGIN
-    IF INSERTING THEN
-        pkg_audit_trail.log_action(:NEW.user_id, 'Payments', 'INSERT', 
-            'Payment added: ID=' || :NEW.payment_id || ', User=' || :NEW.user_id || 
-            ', Amount=' || :NEW.amount || ', Payment_date=' || TO_CHAR(:NEW.payment_date, 'YYYY-MM-DD') || 
-            ', Type=' || :NEW.type || ', Ref_id=' || :NEW.ref_id);
-    ELSIF UPDATING THEN
-        IF :OLD.user_id != :NEW.user_id THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Payments', 'UPDATE', 
-                'Payment user_id changed from ' || :OLD.user_id || ' to ' || :NEW.user_id);
-        END IF;
-        IF :OLD.amount != :NEW.amount THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Payments', 'UPDATE', 
-                'Payment amount changed from ' || :OLD.amount || ' to ' || :NEW.amount);
-        END IF;
-        IF :OLD.payment_date != :NEW.payment_date THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Payments', 'UPDATE', 
-                'Payment payment_date changed from ' || TO_CHAR(:OLD.payment_date, 'YYYY-MM-DD') || 
-                ' to ' || TO_CHAR(:NEW.payment_date, 'YYYY-MM-DD'));
-        END IF;
-        IF :OLD.type != :NEW.type THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Payments', 'UPDATE', 
-                'Payment type changed from ' || :OLD.type || ' to ' || :NEW.type);
-        END IF;
-        IF :OLD.ref_id != :NEW.ref_id THEN
-            pkg_audit_trail.log_action(:NEW.user_id, 'Payments', 'UPDATE', 
-                'Payment ref_id changed from ' || :OLD.ref_id || ' to ' || :NEW.ref_id);
-        END IF;
-    ELSIF DELETING THEN
-        pkg_audit_trail.log_action(:OLD.user_id, 'Payments', 'DELETE', 
-            'Payment deleted: ID=' || :OLD.payment_id || ', User=' || :OLD.user_id || 
-            ', Amount=' || :OLD.amount || ', Payment_date=' || TO_CHAR(:OLD.payment_date, 'YYYY-MM-DD') || 
-            ', Type=' || :OLD.type || ', Ref_id=' || :OLD.ref_id);
-    END IF;
-END;
+FOR INSERT OR UPDATE OR DELETE ON Payments
+COMPOUND TRIGGER
+    g_entries pkg_audit_trail.t_entries;
+
+    PROCEDURE log_action(p_user_id IN NUMBER, p_action IN VARCHAR2, p_details IN VARCHAR2) IS
+    BEGIN
+        pkg_audit_trail.queue_action(g_entries, p_user_id, 'Payments', p_action, p_details);
+    END log_action;
+
+    AFTER EACH ROW IS
+    BEGIN
+        IF INSERTING THEN
+            log_action(:NEW.user_id, 'INSERT', 
+                'Payment added: ID=' || :NEW.payment_id || ', User=' || :NEW.user_id || 
+                ', Amount=' || :NEW.amount || ', Payment_date=' || TO_CHAR(:NEW.payment_date, 'YYYY-MM-DD') || 
+                ', Type=' || :NEW.type || ', Ref_id=' || :NEW.ref_id);
+        ELSIF UPDATING THEN
+            IF :OLD.user_id != :NEW.user_id THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Payment user_id changed from ' || :OLD.user_id || ' to ' || :NEW.user_id);
+            END IF;
+            IF :OLD.amount != :NEW.amount THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Payment amount changed from ' || :OLD.amount || ' to ' || :NEW.amount);
+            END IF;
+            IF :OLD.payment_date != :NEW.payment_date THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Payment payment_date changed from ' || TO_CHAR(:OLD.payment_date, 'YYYY-MM-DD') || 
+                    ' to ' || TO_CHAR(:NEW.payment_date, 'YYYY-MM-DD'));
+            END IF;
+            IF :OLD.type != :NEW.type THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Payment type changed from ' || :OLD.type || ' to ' || :NEW.type);
+            END IF;
+            IF :OLD.ref_id != :NEW.ref_id THEN
+                log_action(:NEW.user_id, 'UPDATE', 
+                    'Payment ref_id changed from ' || :OLD.ref_id || ' to ' || :NEW.ref_id);
+            END IF;
+        ELSIF DELETING THEN
+            log_action(:OLD.user_id, 'DELETE', 
+                'Payment deleted: ID=' || :OLD.payment_id || ', User=' || :OLD.user_id || 
+                ', Amount=' || :OLD.amount || ', Payment_date=' || TO_CHAR(:OLD.payment_date, 'YYYY-MM-DD') || 
+                ', Type=' || :OLD.type || ', Ref_id=' || :OLD.ref_id);
+        END IF;
+    END AFTER EACH ROW;
+
+    AFTER STATEMENT IS
+    BEGIN
+        pkg_audit_trail.flush(g_entries);
+    END AFTER STATEMENT;
+END trg_payments_audit;
 /
 
 CREATE OR REPLACE TRIGGER trg_penalties_audit
-AFTER INSERT OR UPDATE OR DELETE ON Penalties
-FOR EACH ROW
-BEGIN
-    IF INSERTING THEN
-        pkg_audit_trail.log_action(NULL, 'Penalties', 'INSERT', 
-            'Penalty added: ID=' || :NEW.penalty_id || ', Rent_id=' || :NEW.rent_id || 
-            ', Amount=' || :NEW.amount || ', Reason=' || NVL(:NEW.reason, 'NULL') || 
-            ', Status=' || :NEW.status);
-    ELSIF UPDATING THEN
-        IF :OLD.rent_id != :NEW.rent_id THEN
-            pkg_audit_trail.log_action(NULL, 'Penalties', 'UPDATE', 
-                'Penalty rent_id changed from ' || :OLD.rent_id || ' to ' || :NEW.rent_id);
-        END IF;
-        IF :OLD.amount != :NEW.amount THEN
-            pkg_audit_trail.log_action(NULL, 'Penalties', 'UPDATE', 
-                'Penalty amount changed from ' || :OLD.amount || ' to ' || :NEW.amount);
-        END IF;
-        IF NVL(:OLD.reason, 'NULL') != NVL(:NEW.reason, 'NULL') THEN
-            pkg_audit_trail.log_action(NULL, 'Penalties', 'UPDATE', 
-                'Penalty reason changed from ' || NVL(:OLD.reason, 'NULL') || ' to ' || NVL(:NEW.reason, 'NULL'));
-        END IF;
-        IF :OLD.status != :NEW.status THEN
-            pkg_audit_trail.log_action(NULL, 'Penalties', 'UPDATE', 
-                'Penalty status changed from ' || :OLD.status || ' to ' || :NEW.status);
-        END IF;
-    ELSIF DELETING THEN
-        pkg_audit_trail.log_action(NULL, 'Penalties', 'DELETE', 
-            'Penalty deleted: ID=' || :OLD.penalty_id || ', Rent_id=' || :OLD.rent_id || 
-            ', Amount=' || :OLD.amount || ', Reason=' || NVL(:OLD.reason, 'NULL') || 
-            ', Status=' || :OLD.status);
-    END IF;
-END;
-/
+FOR INSERT OR UPDATE OR DELETE ON Penalties
+COMPOUND TRIGGER
+    g_entries pkg_audit_trail.t_entries;
 
--- SUBSCRIPTION EXPIRY TRIGGER
-CREATE OR REPLACE TRIGGER trg_subscriptions_expiry
-BEFORE UPDATE ON Subscriptions
-FOR EACH ROW
-BEGIN
-    IF :NEW.end_date < SYSDATE AND :NEW.is_active = 'Y' THEN
-        :NEW.is_active := 'N';
-    END IF;
-END;
+    PROCEDURE log_action(p_user_id IN NUMBER, p_action IN VARCHAR2, p_details IN VARCHAR2) IS
+    BEGIN
+        pkg_audit_trail.queue_action(g_entries, p_user_id, 'Penalties', p_action, p_details);
+    END log_action;
+
+    AFTER EACH ROW IS
+    BEGIN
+        IF INSERTING THEN
+            log_action(NULL, 'INSERT', 
+                'Penalty added: ID=' || :NEW.penalty_id || ', Rent_id=' || :NEW.rent_id || 
+                ', Amount=' || :NEW.amount || ', Reason=' || NVL(:NEW.reason, 'NULL') || 
+                ', Status=' || :NEW.status);
+        ELSIF UPDATING THEN
+            IF :OLD.rent_id != :NEW.rent_id THEN
+                log_action(NULL, 'UPDATE', 
+                    'Penalty rent_id changed from ' || :OLD.rent_id || ' to ' || :NEW.rent_id);
+            END IF;
+            IF :OLD.amount != :NEW.amount THEN
+                log_action(NULL, 'UPDATE', 
+                    'Penalty amount changed from ' || :OLD.amount || ' to ' || :NEW.amount);
+            END IF;
+            IF NVL(:OLD.reason, 'NULL') != NVL(:NEW.reason, 'NULL') THEN
+                log_action(NULL, 'UPDATE', 
+                    'Penalty reason changed from ' || NVL(:OLD.reason, 'NULL') || ' to ' || NVL(:NEW.reason, 'NULL'));
+            END IF;
+            IF :OLD.status != :NEW.status THEN
+                log_action(NULL, 'UPDATE', 
+                    'Penalty status changed from ' || :OLD.status || ' to ' || :NEW.status);
+            END IF;
+        ELSIF DELETING THEN
+            log_action(NULL, 'DELETE', 
+                'Penalty deleted: ID=' || :OLD.penalty_id || ', Rent_id=' || :OLD.rent_id || 
+                ', Amount=' || :OLD.amount || ', Reason=' || NVL(:OLD.reason, 'NULL') || 
+                ', Status=' || :OLD.status);
+        END IF;
+    END AFTER EACH ROW;
+
+    AFTER STATEMENT IS
+    BEGIN
+        pkg_audit_trail.flush(g_entries);
+    END AFTER STATEMENT;
+END trg_penalties_audit;
 /
 
 -- PAYMENT REFERENCE VALIDATION TRIGGER
@@ -914,6 +1563,11 @@ END;
 /
 
 -- VIEWS FOR FRONTEND
+-- Async audit backlog: entries waiting in Audit_Queue and how far behind the oldest is
+CREATE OR REPLACE VIEW v_audit_queue_lag AS
+SELECT COUNT(*) AS pending, ROUND((SYSDATE - MIN(timestamp)) * 86400) AS lag_seconds
+FROM Audit_Queue;
+
 CREATE OR REPLACE VIEW v_available_gear AS
 SELECT gear_id, name, category, brand, rent_price_per_day, sub_price_per_month, stock
 FROM Gear
@@ -933,6 +1587,168 @@ FROM Subscriptions s
 JOIN Users u ON s.user_id = u.user_id
 JOIN Gear g ON s.gear_id = g.gear_id;
 
+CREATE OR REPLACE VIEW v_user_penalties AS
+SELECT p.penalty_id, p.rent_id, p.amount, p.reason, p.status, r.user_id
+FROM Penalties p
+JOIN Rentals r ON p.rent_id = r.rent_id;
+
+-- REPORTING SUMMARIES
+-- The Reports tab reads only the v_report_* views below, which sit on small
+-- materialized views instead of scanning Payments, Rentals and Penalties.
+-- The materialized view logs record every change to the base tables, and
+-- pkg_reports.refresh applies just those changes (fast refresh), so the cost
+-- of a refresh follows what changed since the last one, not the history size.
+-- Every SUM has a matching COUNT so deletes and updates can be applied
+-- incrementally too. Each log records every column its views use, join keys
+-- included (rent_id, sub_id, gear_id); without them fast refresh fails with
+-- ORA-12033. After changing a view or a log, check that
+-- DBMS_MVIEW.EXPLAIN_MVIEW still reports REFRESH_FAST_AFTER_ANY_DML as 'Y'.
+CREATE MATERIALIZED VIEW LOG ON Payments WITH ROWID, SEQUENCE (amount, payment_date, type, ref_id) INCLUDING NEW VALUES;
+CREATE MATERIALIZED VIEW LOG ON Rentals WITH ROWID, SEQUENCE (rent_id, gear_id, start_date, end_date, return_date, status) INCLUDING NEW VALUES;
+CREATE MATERIALIZED VIEW LOG ON Subscriptions WITH ROWID, SEQUENCE (sub_id, gear_id, is_active) INCLUDING NEW VALUES;
+CREATE MATERIALIZED VIEW LOG ON Gear WITH ROWID, SEQUENCE (gear_id, category, stock) INCLUDING NEW VALUES;
+CREATE MATERIALIZED VIEW LOG ON Penalties WITH ROWID, SEQUENCE (amount, status) INCLUDING NEW VALUES;
+
+CREATE MATERIALIZED VIEW mv_revenue_by_month
+BUILD IMMEDIATE REFRESH FAST ON DEMAND AS
+SELECT TRUNC(payment_date, 'MM') AS month, type, SUM(amount) AS amount, COUNT(amount) AS amount_count, COUNT(*) AS payments
+FROM Payments
+GROUP BY TRUNC(payment_date, 'MM'), type;
+
+-- Join aggregates: fast refresh needs the old-style join syntax
+CREATE MATERIALIZED VIEW mv_rental_revenue_by_gear
+BUILD IMMEDIATE REFRESH FAST ON DEMAND AS
+SELECT r.gear_id, SUM(p.amount) AS amount, COUNT(p.amount) AS amount_count, COUNT(*) AS payments
+FROM Payments p, Rentals r
+WHERE p.type = 'RENTAL' AND p.ref_id = r.rent_id
+GROUP BY r.gear_id;
+
+CREATE MATERIALIZED VIEW mv_sub_revenue_by_gear
+BUILD IMMEDIATE REFRESH FAST ON DEMAND AS
+SELECT s.gear_id, SUM(p.amount) AS amount, COUNT(p.amount) AS amount_count, COUNT(*) AS payments
+FROM Payments p, Subscriptions s
+WHERE p.type = 'SUBSCRIPTION' AND p.ref_id = s.sub_id
+GROUP BY s.gear_id;
+
+CREATE MATERIALIZED VIEW mv_category_rentals
+BUILD IMMEDIATE REFRESH FAST ON DEMAND AS
+SELECT g.category, COUNT(*) AS rentals,
+       SUM(CASE WHEN r.status = 'RENTED' THEN 1 ELSE 0 END) AS active_rentals,
+       COUNT(CASE WHEN r.status = 'RENTED' THEN 1 ELSE 0 END) AS active_rentals_count,
+       SUM(NVL(r.return_date, r.end_date) - r.start_date) AS rented_days,
+       COUNT(NVL(r.return_date, r.end_date) - r.start_date) AS rented_days_count
+FROM Rentals r, Gear g
+WHERE r.gear_id = g.gear_id
+GROUP BY g.category;
+
+CREATE MATERIALIZED VIEW mv_category_subs
+BUILD IMMEDIATE REFRESH FAST ON DEMAND AS
+SELECT g.category, COUNT(*) AS subscriptions,
+       SUM(CASE WHEN s.is_active = 'Y' THEN 1 ELSE 0 END) AS active_subscriptions,
+       COUNT(CASE WHEN s.is_active = 'Y' THEN 1 ELSE 0 END) AS active_subscriptions_count
+FROM Subscriptions s, Gear g
+WHERE s.gear_id = g.gear_id
+GROUP BY g.category;
+
+CREATE MATERIALIZED VIEW mv_category_stock
+BUILD IMMEDIATE REFRESH FAST ON DEMAND AS
+SELECT category, SUM(stock) AS units, COUNT(stock) AS units_count, COUNT(*) AS items
+FROM Gear
+GROUP BY category;
+
+CREATE MATERIALIZED VIEW mv_penalty_totals
+BUILD IMMEDIATE REFRESH FAST ON DEMAND AS
+SELECT status, SUM(amount) AS amount, COUNT(amount) AS amount_count, COUNT(*) AS penalties
+FROM Penalties
+GROUP BY status;
+
+CREATE OR REPLACE VIEW v_report_revenue_by_gear AS
+SELECT x.gear_id, g.name, NVL(g.category, '(none)') AS category, x.rental_revenue, x.subscription_revenue,
+       x.rental_revenue + x.subscription_revenue AS total_revenue
+FROM (
+    SELECT gear_id, SUM(rental_revenue) AS rental_revenue, SUM(subscription_revenue) AS subscription_revenue
+    FROM (
+        SELECT gear_id, NVL(amount, 0) AS rental_revenue, 0 AS subscription_revenue FROM mv_rental_revenue_by_gear
+        UNION ALL
+        SELECT gear_id, 0, NVL(amount, 0) FROM mv_sub_revenue_by_gear
+    )
+    GROUP BY gear_id
+) x
+JOIN Gear g ON g.gear_id = x.gear_id;
+
+-- Utilization: share of a category's units that are out on rental right now
+CREATE OR REPLACE VIEW v_report_utilization AS
+SELECT NVL(s.category, NVL(r.category, NVL(b.category, '(none)'))) AS category, NVL(s.items, 0) AS items,
+       NVL(s.units, 0) AS units_in_stock, NVL(r.active_rentals, 0) AS active_rentals,
+       NVL(r.rentals, 0) AS total_rentals, ROUND(NVL(r.rented_days, 0), 1) AS rented_days,
+       ROUND(100 * NVL(r.active_rentals, 0) / NULLIF(NVL(r.active_rentals, 0) + NVL(s.units, 0), 0), 1) AS utilization_pct,
+       NVL(b.active_subscriptions, 0) AS active_subscriptions
+FROM mv_category_stock s
+FULL OUTER JOIN mv_category_rentals r ON NVL(s.category, '(none)') = NVL(r.category, '(none)')
+FULL OUTER JOIN mv_category_subs b ON NVL(s.category, NVL(r.category, '(none)')) = NVL(b.category, '(none)');
+
+CREATE OR REPLACE VIEW v_report_revenue_by_month AS
+SELECT TO_CHAR(month, 'YYYY-MM') AS month,
+       SUM(CASE WHEN type = 'RENTAL' THEN amount ELSE 0 END) AS rental_revenue,
+       SUM(CASE WHEN type = 'SUBSCRIPTION' THEN amount ELSE 0 END) AS subscription_revenue,
+       SUM(CASE WHEN type = 'PENALTY' THEN amount ELSE 0 END) AS penalty_revenue,
+       SUM(amount) AS total_revenue
+FROM mv_revenue_by_month
+GROUP BY month;
+
+CREATE OR REPLACE VIEW v_report_penalties AS
+SELECT status, penalties, NVL(amount, 0) AS amount
+FROM mv_penalty_totals;
+
+-- PACKAGE FOR REPORTS
+CREATE OR REPLACE PACKAGE pkg_reports AS
+    -- Apply the changes logged since the last refresh to every summary
+    PROCEDURE refresh;
+    PROCEDURE schedule_refresh(p_interval_minutes IN NUMBER DEFAULT 5);
+    PROCEDURE unschedule_refresh;
+END pkg_reports;
+/
+
+CREATE OR REPLACE PACKAGE BODY pkg_reports AS
+    c_summaries CONSTANT VARCHAR2(200) := 'mv_revenue_by_month, mv_rental_revenue_by_gear, mv_sub_revenue_by_gear, '
+                                          || 'mv_category_rentals, mv_category_subs, mv_category_stock, mv_penalty_totals';
+
+    PROCEDURE refresh IS
+    BEGIN
+        DBMS_MVIEW.REFRESH(c_summaries, method => 'F');
+    END refresh;
+
+    PROCEDURE schedule_refresh(p_interval_minutes IN NUMBER DEFAULT 5) IS
+    BEGIN
+        unschedule_refresh;
+        DBMS_SCHEDULER.CREATE_JOB(
+            job_name        => 'REPORTS_REFRESH_JOB',
+            job_type        => 'PLSQL_BLOCK',
+            job_action      => 'BEGIN pkg_reports.refresh; END;',
+            repeat_interval => 'FREQ=MINUTELY;INTERVAL=' || p_interval_minutes,
+            enabled         => TRUE);
+    END schedule_refresh;
+
+    PROCEDURE unschedule_refresh IS
+        e_no_job EXCEPTION;
+        PRAGMA EXCEPTION_INIT(e_no_job, -27475);
+    BEGIN
+        DBMS_SCHEDULER.DROP_JOB('REPORTS_REFRESH_JOB', force => TRUE);
+    EXCEPTION
+        WHEN e_no_job THEN
+            NULL;
+    END unschedule_refresh;
+END pkg_reports;
+/
+
+BEGIN
+    pkg_reports.schedule_refresh;
+    pkg_penalty_center.schedule_sweep;
+    pkg_subscription_service.schedule_expiry;
+    pkg_audit_trail.schedule_retention;
+END;
+/
+
 select * from gear;
 select * from users;
 select * from rentals;
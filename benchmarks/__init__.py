@@ -0,0 +1 @@
+"""Benchmarks and load tools; each module runs on its own with ``python -m benchmarks.<name>``."""
@@ -0,0 +1,110 @@
+"""Throughput of bulk UPDATEs on an audited table.
+
+Seeds ``--rows`` gear items, then times set-based UPDATEs over all of them:
+one changing a single audited column (one audit entry per row) and one
+changing two (two entries per row). The audit triggers are what dominates,
+so this is the number to watch when they change. Like call_latency, it
+writes its own data: run it against a scratch schema or database file.
+
+Compare two trigger implementations by loading the old backend.sql, running
+with ``--save before.json``, then loading the new one and running with
+``--compare before.json``.
+"""
+import argparse
+import json
+import time
+import uuid
+
+from dal import SQLiteDriver, open_driver
+
+UPDATES = {
+    "stock": "UPDATE Gear SET stock = stock + 1 WHERE category = :category",
+    "stock_and_price": ("UPDATE Gear SET stock = stock + 1, rent_price_per_day = rent_price_per_day + 1 "
+                        "WHERE category = :category"),
+}
+
+
+def execute(db, statement, params):
+    """Run one statement (executemany for a list of params) and commit; return the row count."""
+    if isinstance(db, SQLiteDriver):
+        with db.transaction() as cur:
+            if isinstance(params, list):
+                cur.executemany(statement, params)
+            else:
+                cur.execute(statement, params)
+            return cur.rowcount
+
+    def run(cursor):
+        if isinstance(params, list):
+            cursor.executemany(statement, params)
+        else:
+            cursor.execute(statement, params)
+        cursor.connection.commit()
+        return cursor.rowcount
+    return db.pool.run(run)
+
+
+def seed(db, rows):
+    category = f"Bench {uuid.uuid4().hex[:8]}"
+    execute(db, """
+        INSERT INTO Gear (name, category, brand, rent_price_per_day, sub_price_per_month, stock)
+        VALUES (:name, :category, 'Bench', 10, 100, 1)
+    """, [{"name": f"{category} #{i}", "category": category} for i in range(rows)])
+    return category
+
+
+def run(db, rows, repeat):
+    category = seed(db, rows)
+    results = {}
+    for name, statement in UPDATES.items():
+        elapsed = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            updated = execute(db, statement, {"category": category})
+            elapsed.append(time.perf_counter() - start)
+        best = min(elapsed)
+        results[name] = {"rows": updated, "best_s": best, "rows_per_s": updated / best}
+    return results
+
+
+def report(results, baseline=None):
+    header = f"{'update':<18}{'rows':>8}{'best s':>10}{'rows/s':>12}"
+    if baseline:
+        header += f"{'before':>12}{'speedup':>10}"
+    print(header)
+    for name, stats in results.items():
+        line = f"{name:<18}{stats['rows']:>8}{stats['best_s']:>10.3f}{stats['rows_per_s']:>12.0f}"
+        if baseline and name in baseline:
+            before = baseline[name]["rows_per_s"]
+            line += f"{before:>12.0f}{stats['rows_per_s'] / before:>9.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", help="oracle or sqlite (default: RENTAL_DB_BACKEND)")
+    parser.add_argument("--path", help="SQLite database file (default: a fresh in-memory database)")
+    parser.add_argument("--rows", type=int, default=5000, help="gear rows touched by each UPDATE")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per UPDATE; the best one is reported")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="show speedup against results saved earlier")
+    args = parser.parse_args()
+
+    db = open_driver(args.backend, path=args.path or ":memory:")
+    try:
+        results = run(db, args.rows, args.repeat)
+    finally:
+        db.close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
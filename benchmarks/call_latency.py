@@ -0,0 +1,119 @@
+"""Per-call latency of the package operations on the rental hot path.
+
+Times rent_gear, calc_rental_charge, calc_penalty_amt, return_gear and
+make_payment through the driver layer, so the same script measures the
+PL/SQL packages (RENTAL_DB_BACKEND=oracle) and the SQLite stand-in. It
+creates its own users, gear and rentals: point it at a scratch schema or
+database file, never at production data.
+
+To compare two versions of backend.sql, load the old one, run with
+``--save before.json``, load the new one and run with
+``--compare before.json``:
+
+    python -m benchmarks.call_latency --calls 500 --save before.json
+    python -m benchmarks.call_latency --calls 500 --compare before.json
+"""
+import argparse
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from dal import open_driver
+
+OPERATIONS = ["rent_gear", "calc_rental_charge", "calc_penalty_amt", "return_gear", "make_payment"]
+
+
+def setup(db, users):
+    """Create an admin, ``users`` customers and one well-stocked item; return their ids."""
+    run_id = uuid.uuid4().hex[:8]
+    db.register_user(f"Bench Admin {run_id}", f"bench-admin-{run_id}@example.com", None, "bench", "ADMIN")
+    admin_id = db.verify_user(f"bench-admin-{run_id}@example.com", "bench")
+    customer_ids = []
+    for i in range(users):
+        email = f"bench-{run_id}-{i}@example.com"
+        db.register_user(f"Bench Customer {i}", email, None, "bench")
+        customer_ids.append(db.verify_user(email, "bench"))
+    name = f"Bench Gear {run_id}"
+    db.add_gear(admin_id, name, "Benchmark", "Bench", 10, 100, users * 3)
+    gear_id = next(row[0] for row in db.list_available_gear() if row[1] == name)
+    return customer_ids, gear_id
+
+
+def run(db, calls, users):
+    customer_ids, gear_id = setup(db, users)
+    timings = {op: [] for op in OPERATIONS}
+
+    def timed(op, *args):
+        start = time.perf_counter()
+        result = getattr(db, op)(*args)
+        timings[op].append(time.perf_counter() - start)
+        return result
+
+    # Every rental gets its own start time so uniq_rental_once never fires
+    base = datetime.now().replace(microsecond=0) - timedelta(days=calls)
+    for i in range(calls):
+        user_id = customer_ids[i % len(customer_ids)]
+        start = base + timedelta(minutes=i)
+        timed("rent_gear", user_id, gear_id, start, start + timedelta(days=2))
+        rent_id = max(row[0] for row in db.list_rentals(user_id))
+        charge = timed("calc_rental_charge", rent_id)
+        timed("calc_penalty_amt", rent_id)
+        timed("return_gear", rent_id, "GOOD", start + timedelta(days=2))
+        timed("make_payment", user_id, "RENTAL", rent_id, charge)
+    return {op: summarize(samples) for op, samples in timings.items()}
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "calls": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+    }
+
+
+def report(results, baseline=None):
+    width = max(20, max(map(len, results), default=0) + 2)
+    header = f"{'operation':<{width}}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}"
+    if baseline:
+        header += f"{'before p50':>12}{'speedup':>10}"
+    print(header)
+    for op, stats in results.items():
+        line = f"{op:<{width}}{stats['mean_ms']:>10.3f}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}"
+        if baseline and op in baseline:
+            before = baseline[op]["p50_ms"]
+            line += f"{before:>12.3f}{before / stats['p50_ms']:>9.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", help="oracle or sqlite (default: RENTAL_DB_BACKEND)")
+    parser.add_argument("--path", help="SQLite database file (default: a fresh in-memory database)")
+    parser.add_argument("--calls", type=int, default=200, help="rentals to run through the full cycle")
+    parser.add_argument("--users", type=int, default=20, help="customers to spread the rentals over")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="show speedup against results saved earlier")
+    args = parser.parse_args()
+
+    db = open_driver(args.backend, path=args.path or ":memory:")
+    try:
+        results = run(db, args.calls, args.users)
+    finally:
+        db.close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
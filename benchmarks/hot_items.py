@@ -0,0 +1,176 @@
+"""Contention benchmark: many renters competing for the stock of a few hot items.
+
+Every client rents one of ``--items`` items (``--stock`` units each), holds
+it for ``--hold-ms`` and returns it, as fast as it can for ``--duration``
+seconds. Each client is its own customer and holds one rental at a time, so
+the rental limit never fires: every failure is a lost race for stock or a
+locking problem. The figure that matters is successful rentals per second.
+With few items and many clients, every rent_gear and return_gear queues on
+the same Gear rows, and throughput depends on how long each call holds the
+row lock.
+
+The report gives successful rentals per second, how many attempts found
+the item sold out, latency percentiles for rent_gear and return_gear, and
+failures by kind (see load_test). On Oracle it also gives the row-lock
+waits taken during the run. The pool gets one session per client. The
+SQLite stand-in runs every call on one connection, so there the row lock
+never comes into play. Run it against a scratch schema or database file.
+
+To compare two versions of backend.sql, load the old one and run with
+``--save``, then load the new one and run with ``--compare``:
+
+    python -m benchmarks.hot_items --clients 100 --items 2 --stock 10 --save before.json
+    python -m benchmarks.hot_items --clients 100 --items 2 --stock 10 --compare before.json
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.load_test import classify, percentile, row_lock_waits, setup
+from dal import open_driver
+
+SOLD_OUT = 20023
+
+
+class Stats:
+    def __init__(self):
+        self.samples = {"rent_gear": [], "return_gear": []}
+        self.rentals = 0
+        self.sold_out = 0
+        self.failures = {}
+        self._lock = threading.Lock()
+
+    def record(self, op, elapsed, error=None):
+        with self._lock:
+            self.samples[op].append(elapsed)
+            if error is None:
+                self.rentals += op == "rent_gear"
+            elif getattr(error, "code", None) == SOLD_OUT:
+                self.sold_out += 1
+            else:
+                kind = classify(error)
+                self.failures[kind] = self.failures.get(kind, 0) + 1
+
+
+def timed(stats, op, func, *args):
+    started = time.perf_counter()
+    try:
+        func(*args)
+    except Exception as e:
+        stats.record(op, time.perf_counter() - started, e)
+        return False
+    stats.record(op, time.perf_counter() - started)
+    return True
+
+
+def run(db, clients, duration, items, stock, hold_ms):
+    logins, gear_ids = setup(db, clients, items, stock)
+    user_ids = [db.verify_user(*login) for login in logins]
+    # Every rental gets its own start time, so uniq_rental_once never fires
+    base = datetime.now().replace(second=0, microsecond=0) - timedelta(days=3)
+    counter = itertools.count()
+    stats = Stats()
+
+    def client(user_id, deadline):
+        while time.monotonic() < deadline:
+            start = base - timedelta(minutes=next(counter))
+            end = start + timedelta(days=2)
+            if not timed(stats, "rent_gear", db.rent_gear, user_id, random.choice(gear_ids), start, end):
+                continue
+            time.sleep(hold_ms / 1000)
+            rent_id = db.grid_page("rentals", user_id=user_id)[0][0]
+            timed(stats, "return_gear", db.return_gear, rent_id, "GOOD", end)
+
+    waits_before = row_lock_waits(db)
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, args=(user_id, started + duration), daemon=True)
+               for user_id in user_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    waits_after = row_lock_waits(db)
+
+    lock_waits = None
+    if waits_before is not None and waits_after is not None:
+        lock_waits = {"waits": waits_after[0] - waits_before[0], "seconds": waits_after[1] - waits_before[1]}
+    operations = {}
+    for op, samples in stats.samples.items():
+        samples = sorted(samples)
+        if samples:
+            operations[op] = {"calls": len(samples), "p50_ms": percentile(samples, 50),
+                              "p95_ms": percentile(samples, 95), "p99_ms": percentile(samples, 99)}
+    return {
+        "clients": clients,
+        "items": items,
+        "stock": stock,
+        "seconds": elapsed,
+        "rentals": stats.rentals,
+        "rentals_per_second": stats.rentals / elapsed,
+        "sold_out": stats.sold_out,
+        "failures": stats.failures,
+        "row_lock_waits": lock_waits,
+        "operations": operations,
+    }
+
+
+def report(results, baseline=None):
+    print(f"{results['clients']} clients on {results['items']} items x {results['stock']} units, "
+          f"{results['seconds']:.1f} s")
+    line = f"successful rentals: {results['rentals']} ({results['rentals_per_second']:.1f}/s)"
+    if baseline:
+        before = baseline["rentals_per_second"]
+        line += f", before {before:.1f}/s ({results['rentals_per_second'] / before:.2f}x)" if before else ""
+    print(f"{line}, sold out: {results['sold_out']}")
+    print(f"{'operation':<14}{'calls':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for op, stats in results["operations"].items():
+        print(f"{op:<14}{stats['calls']:>8}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+    failures = results["failures"]
+    print(f"deadlocks (ORA-00060): {failures.get('deadlock', 0)}, lock timeouts: {failures.get('lock_timeout', 0)}, "
+          f"other rejections: {failures.get('rejected', 0)}, other errors: {failures.get('error', 0)}")
+    waits = results["row_lock_waits"]
+    if waits is not None:
+        print(f"row lock waits: {waits['waits']} ({waits['seconds']:.2f} s waited)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", help="oracle or sqlite (default: RENTAL_DB_BACKEND)")
+    parser.add_argument("--path", help="SQLite database file (default: a fresh in-memory database)")
+    parser.add_argument("--clients", type=int, default=50, help="concurrent renters")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run for")
+    parser.add_argument("--items", type=int, default=2, help="hot items the clients compete for")
+    parser.add_argument("--stock", type=int, default=10, help="units of each item")
+    parser.add_argument("--hold-ms", type=float, default=0, help="how long a client keeps an item before returning it")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="show rentals/s against results saved earlier")
+    args = parser.parse_args()
+
+    pool = None
+    if (args.backend or os.environ.get("RENTAL_DB_BACKEND", "oracle")).lower() == "oracle":
+        from db_pool import ConnectionPool
+        pool = ConnectionPool.from_env(max=args.clients)
+    db = open_driver(args.backend, path=args.path or ":memory:", pool=pool)
+    try:
+        results = run(db, args.clients, args.duration, args.items, args.stock, args.hold_ms)
+    finally:
+        db.close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""Load test: many renters running the GUI's operations at the same time.
+
+Each client logs in as its own customer and then repeats a session for
+``--duration`` seconds: login, browse gear, rent an item, list its rentals,
+return the item, pay, subscribe, list its subscriptions, cancel and pay.
+These are the same driver calls the app makes for each button, so the
+rental limit trigger, the stock UPDATEs and the audit triggers all see the
+concurrency they would see with that many people at their screens. Fewer
+``--gear`` items means more clients competing for the same rows.
+
+Clients run as threads (``--mode threads``) or as asyncio tasks that hand
+each blocking call to an executor (``--mode asyncio``), the way an async
+front end would. On Oracle the pool gets one session per client. The
+SQLite stand-in runs every call on one connection, so there it measures
+queueing rather than row locking.
+
+The report gives throughput, latency percentiles for each operation, and
+failures grouped by kind. "Rejected" means a business rule said no, e.g.
+the item is out of stock. "Deadlock" means ORA-00060. "Lock timeout"
+means ORA-00054/ORA-30006, or "database is locked" on SQLite. On Oracle
+the report also shows the row-lock waits (``enq: TX - row lock
+contention``) from V$SYSTEM_EVENT taken during the run, when the user
+can read it. Like the other benchmarks, it writes its own data: run it
+against a scratch schema or database file.
+
+    python -m benchmarks.load_test --backend sqlite --path load.db --clients 50 --duration 30
+    python -m benchmarks.load_test --clients 200 --gear 5 --save before.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from dal import DataError, SQLiteDriver, UNIQUE_VIOLATION, open_driver
+
+OPERATIONS = ["login", "browse_gear", "rent_gear", "list_rentals", "return_gear", "pay_rental",
+              "subscribe_gear", "list_subscriptions", "cancel_subscription", "pay_subscription"]
+
+DEADLOCK = 60
+LOCK_TIMEOUTS = {54, 30006}
+
+ROW_LOCK_WAITS = """
+    SELECT total_waits, time_waited_micro FROM v$system_event WHERE event = 'enq: TX - row lock contention'
+"""
+
+
+def classify(e):
+    """Failure kind of an exception raised by a driver call."""
+    code = getattr(e, "code", None)
+    if code == DEADLOCK:
+        return "deadlock"
+    if code in LOCK_TIMEOUTS or "database is locked" in str(e):
+        return "lock_timeout"
+    if isinstance(e, DataError) and (20000 <= code <= 20999 or code == UNIQUE_VIOLATION):
+        return "rejected"
+    return "error"
+
+
+class Stats:
+    """Latency samples and failure counts per operation, shared by every client."""
+
+    def __init__(self):
+        self.samples = {op: [] for op in OPERATIONS}
+        self.failures = {op: {} for op in OPERATIONS}
+        self.sessions = 0
+        self._lock = threading.Lock()
+
+    def record(self, op, elapsed, failure=None):
+        with self._lock:
+            self.samples[op].append(elapsed)
+            if failure:
+                self.failures[op][failure] = self.failures[op].get(failure, 0) + 1
+
+    def session_done(self):
+        with self._lock:
+            self.sessions += 1
+
+
+def setup(db, clients, gear, stock):
+    """Create ``clients`` customers and ``gear`` items; return their (email, password) and gear ids."""
+    run_id = uuid.uuid4().hex[:8]
+    db.register_user(f"Load Admin {run_id}", f"load-admin-{run_id}@example.com", None, "load", "ADMIN")
+    admin_id = db.verify_user(f"load-admin-{run_id}@example.com", "load")
+    logins = []
+    for i in range(clients):
+        email = f"load-{run_id}-{i}@example.com"
+        db.register_user(f"Load Customer {i}", email, None, "load")
+        logins.append((email, "load"))
+    category = f"Load {run_id}"
+    for i in range(gear):
+        db.add_gear(admin_id, f"{category} #{i}", category, "Load", 10, 100, stock)
+    gear_ids = [row[0] for row in db.grid_page("gear", filters={"category": category}, limit=gear)]
+    return logins, gear_ids
+
+
+class Session:
+    """One client: its login and the steps of one pass through the GUI's operations.
+
+    ``steps()`` returns ``(operation, func)`` pairs for a new pass, so both
+    client modes run the same script. Later steps use what earlier ones
+    found, e.g. the rental id; a failed step ends the pass.
+    """
+
+    def __init__(self, db, login, gear_ids, next_start):
+        self.db = db
+        self.login = login
+        self.gear_ids = gear_ids
+        self.next_start = next_start
+        self.user_id = None
+
+    def steps(self):
+        db = self.db
+        # Every rental and subscription gets its own start time, so uniq_rental_once never fires
+        start = self.next_start()
+        end = start + timedelta(days=2)
+        gear_id = random.choice(self.gear_ids)
+        state = {}
+
+        def login():
+            user_id = db.verify_user(*self.login)
+            db.get_user_role(user_id)
+            self.user_id = user_id
+
+        def list_rentals():
+            state["rent_id"] = db.grid_page("rentals", user_id=self.user_id)[0][0]
+
+        def return_gear():
+            state["charge"] = db.calc_rental_charge(state["rent_id"])
+            db.return_gear(state["rent_id"], "GOOD", end)
+
+        def list_subscriptions():
+            state["sub_id"] = db.grid_page("subscriptions", user_id=self.user_id)[0][0]
+
+        def cancel_subscription():
+            state["sub_charge"] = db.calc_subscription_charge(state["sub_id"])
+            db.cancel_subscription(state["sub_id"])
+
+        def pay(pay_type, key, amount_key):
+            def run():
+                if state[amount_key]:
+                    db.make_payment(self.user_id, pay_type, state[key], state[amount_key])
+            return run
+
+        return [
+            ("login", login),
+            ("browse_gear", lambda: db.grid_page("gear")),
+            ("rent_gear", lambda: db.rent_gear(self.user_id, gear_id, start, end)),
+            ("list_rentals", list_rentals),
+            ("return_gear", return_gear),
+            ("pay_rental", pay("RENTAL", "rent_id", "charge")),
+            ("subscribe_gear", lambda: db.subscribe_gear(self.user_id, gear_id, start, start + timedelta(days=30))),
+            ("list_subscriptions", list_subscriptions),
+            ("cancel_subscription", cancel_subscription),
+            ("pay_subscription", pay("SUBSCRIPTION", "sub_id", "sub_charge")),
+        ]
+
+
+def timed_step(stats, op, func):
+    """Run one step, record it, and return whether the session may go on."""
+    started = time.perf_counter()
+    try:
+        func()
+    except Exception as e:
+        stats.record(op, time.perf_counter() - started, classify(e))
+        return False
+    stats.record(op, time.perf_counter() - started)
+    return True
+
+
+def run_threads(sessions, stats, deadline, think):
+    def client(session):
+        while time.monotonic() < deadline:
+            for op, func in session.steps():
+                if not timed_step(stats, op, func):
+                    break
+                time.sleep(think)
+            stats.session_done()
+
+    threads = [threading.Thread(target=client, args=(session,), daemon=True) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_asyncio(sessions, stats, deadline, think):
+    async def client(loop, executor, session):
+        while time.monotonic() < deadline:
+            for op, func in session.steps():
+                if not await loop.run_in_executor(executor, timed_step, stats, op, func):
+                    break
+                await asyncio.sleep(think)
+            stats.session_done()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=len(sessions), thread_name_prefix="load") as executor:
+            await asyncio.gather(*(client(loop, executor, session) for session in sessions))
+
+    asyncio.run(main())
+
+
+def row_lock_waits(db):
+    """(waits, seconds waited) for row locks so far, or None when V$SYSTEM_EVENT is not readable."""
+    if isinstance(db, SQLiteDriver):
+        return None
+    try:
+        row = db.fetch_one(ROW_LOCK_WAITS)
+    except DataError:
+        return None
+    return (row[0], row[1] / 1e6) if row else (0, 0.0)
+
+
+def run(db, clients, duration, gear, stock, mode, think_ms):
+    logins, gear_ids = setup(db, clients, gear, stock)
+    # Start times walk back from three days ago, a minute apart, across every client
+    # (next() on itertools.count is atomic, so the clients need no lock for it)
+    base = datetime.now().replace(second=0, microsecond=0) - timedelta(days=3)
+    counter = itertools.count()
+    sessions = [Session(db, login, gear_ids, lambda: base - timedelta(minutes=next(counter))) for login in logins]
+    stats = Stats()
+    waits_before = row_lock_waits(db)
+    started = time.monotonic()
+    runner = run_asyncio if mode == "asyncio" else run_threads
+    runner(sessions, stats, started + duration, think_ms / 1000)
+    elapsed = time.monotonic() - started
+    waits_after = row_lock_waits(db)
+    lock_waits = None
+    if waits_before is not None and waits_after is not None:
+        lock_waits = {"waits": waits_after[0] - waits_before[0], "seconds": waits_after[1] - waits_before[1]}
+    return summarize(stats, elapsed, clients, mode, lock_waits)
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1000
+
+
+def summarize(stats, elapsed, clients, mode, lock_waits):
+    operations = {}
+    for op in OPERATIONS:
+        samples = sorted(stats.samples[op])
+        if not samples:
+            continue
+        operations[op] = {
+            "calls": len(samples),
+            "per_second": len(samples) / elapsed,
+            "p50_ms": percentile(samples, 50),
+            "p95_ms": percentile(samples, 95),
+            "p99_ms": percentile(samples, 99),
+            "failures": stats.failures[op],
+        }
+    calls = sum(op["calls"] for op in operations.values())
+    totals = {}
+    for op in operations.values():
+        for kind, count in op["failures"].items():
+            totals[kind] = totals.get(kind, 0) + count
+    return {
+        "mode": mode,
+        "clients": clients,
+        "seconds": elapsed,
+        "sessions": stats.sessions,
+        "calls": calls,
+        "calls_per_second": calls / elapsed,
+        "failures": totals,
+        "row_lock_waits": lock_waits,
+        "operations": operations,
+    }
+
+
+def report(results, baseline=None):
+    print(f"{results['clients']} clients ({results['mode']}), {results['seconds']:.1f} s: "
+          f"{results['sessions']} sessions, {results['calls']} calls, {results['calls_per_second']:.1f} calls/s")
+    header = f"{'operation':<22}{'calls':>8}{'per s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  failures"
+    if baseline:
+        header = header.replace("  failures", f"{'before p95':>12}  failures")
+    print(header)
+    for op, stats in results["operations"].items():
+        line = (f"{op:<22}{stats['calls']:>8}{stats['per_second']:>9.1f}{stats['p50_ms']:>9.1f}"
+                f"{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+        before = baseline and baseline["operations"].get(op)
+        if baseline:
+            line += f"{before['p95_ms']:>12.1f}" if before else f"{'':>12}"
+        failures = ", ".join(f"{kind} {count}" for kind, count in sorted(stats["failures"].items()))
+        print(f"{line}  {failures}")
+    failures = results["failures"]
+    print(f"deadlocks (ORA-00060): {failures.get('deadlock', 0)}, lock timeouts: {failures.get('lock_timeout', 0)}, "
+          f"rejected: {failures.get('rejected', 0)}, other errors: {failures.get('error', 0)}")
+    waits = results["row_lock_waits"]
+    if waits is not None:
+        print(f"row lock waits: {waits['waits']} ({waits['seconds']:.2f} s waited)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", help="oracle or sqlite (default: RENTAL_DB_BACKEND)")
+    parser.add_argument("--path", help="SQLite database file (default: a fresh in-memory database)")
+    parser.add_argument("--clients", type=int, default=50, help="concurrent renters")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run for")
+    parser.add_argument("--gear", type=int, default=10, help="gear items the clients share (fewer = more contention)")
+    parser.add_argument("--stock", type=int, default=5, help="stock of each gear item")
+    parser.add_argument("--mode", choices=("threads", "asyncio"), default="threads", help="how clients run")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between a client's calls")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="show p95 against results saved earlier")
+    args = parser.parse_args()
+
+    pool = None
+    if (args.backend or os.environ.get("RENTAL_DB_BACKEND", "oracle")).lower() == "oracle":
+        # One session per client, as if each renter had the app open
+        from db_pool import ConnectionPool
+        pool = ConnectionPool.from_env(max=args.clients)
+    db = open_driver(args.backend, path=args.path or ":memory:", pool=pool)
+    try:
+        results = run(db, args.clients, args.duration, args.gear, args.stock, args.mode, args.think_ms)
+    finally:
+        db.close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
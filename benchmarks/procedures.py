@@ -0,0 +1,191 @@
+"""Microbenchmarks for every public entry point of the PL/SQL packages.
+
+Times each procedure and function of pkg_user_ops, pkg_gear_ops,
+pkg_rental_ops, pkg_subscription_service, pkg_payment_gateway,
+pkg_penalty_center and pkg_audit_trail through the driver method that wraps
+it, so the same suite measures the packages and the SQLite stand-in. Some
+functions return BOOLEAN, and pkg_audit_trail.log_action has no driver
+method; on Oracle these are called directly from PL/SQL. The scheduler
+procedures (schedule_*/unschedule_*) create jobs instead of doing work, so
+they are left out, and so are queue_action and flush, which only the audit
+triggers use.
+
+Calls only mean something against a realistic volume, so the suite first
+seeds ``--dataset`` rentals (1k, 100k or 10m) with their payments,
+penalties and subscriptions from datagen.py. Then it runs each entry point
+``--calls`` times. Run it on a scratch schema or database file. Pass
+``--no-seed`` to reuse a schema that a previous run already loaded.
+
+Save the results of one version of backend.sql and compare the next one
+against them. The dataset goes into the file name so runs stay comparable:
+
+    python -m benchmarks.procedures --dataset 100k --save procedures-100k.json
+    python -m benchmarks.procedures --dataset 100k --no-seed --compare procedures-100k.json
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.call_latency import report, summarize
+from dal import SQLiteDriver, open_driver
+from datagen import Generator
+
+DATASETS = {"1k": 1_000, "100k": 100_000, "10m": 10_000_000}
+
+
+def seed(db, rows):
+    """Load a generated history of ``rows`` rentals over rows/100 customers and rows/1000 items."""
+    Generator(db).run(users=max(20, rows // 100), gear=max(10, rows // 1000), rentals=rows,
+                      subscriptions=rows // 20)
+
+
+class Suite:
+    def __init__(self, db, calls):
+        self.db = db
+        self.calls = calls
+        self.timings = {}
+
+    def timed(self, name, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.timings.setdefault(name, []).append(time.perf_counter() - start)
+        return result
+
+    def plsql_bool(self, name, expression, params):
+        """Time a BOOLEAN package function, which SQL cannot call, from a PL/SQL block."""
+        def run(cursor):
+            result = cursor.var(int)
+            cursor.execute(f"BEGIN :result := CASE WHEN {expression} THEN 1 ELSE 0 END; END;",
+                           {**params, "result": result})
+            return result.getvalue()
+        return self.timed(name, self.db.pool.run, run)
+
+    def run(self):
+        db, calls = self.db, self.calls
+        oracle = not isinstance(db, SQLiteDriver)
+        run_id = uuid.uuid4().hex[:8]
+        base = datetime.now().replace(microsecond=0) - timedelta(days=10)
+
+        # pkg_user_ops
+        db.register_user(f"Bench Admin {run_id}", f"bench-admin-{run_id}@example.com", None, "bench", "ADMIN")
+        admin_id = db.verify_user(f"bench-admin-{run_id}@example.com", "bench")
+        customers = []
+        for i in range(calls):
+            email = f"bench-{run_id}-{i}@example.com"
+            self.timed("register_user", db.register_user, f"Bench Customer {i}", email, None, "bench")
+            customers.append(self.timed("verify_user", db.verify_user, email, "bench"))
+        for user_id in customers:
+            self.timed("get_user_info", db.get_user_info, user_id)
+
+        # pkg_gear_ops
+        for i in range(calls):
+            self.timed("add_gear", db.add_gear, admin_id, f"Bench Gear {run_id} #{i}", f"Bench {run_id}", "Bench",
+                       10, 100, calls * 3)
+        gear_ids = [row[0] for row in db.fetch_all("SELECT gear_id FROM Gear WHERE category = :category",
+                                                    {"category": f"Bench {run_id}"})]
+        for i in range(calls):
+            rows = [(f"Bench Import {run_id} {i}.{j}", f"Bench {run_id}", "Bench", 10, 100, 1) for j in range(100)]
+            self.timed("import_gear", db.import_gear, admin_id, rows)
+        for gear_id in gear_ids:
+            self.timed("update_stock", db.update_stock, gear_id, 1)
+            if oracle:
+                self.plsql_bool("is_gear_available", "pkg_gear_ops.is_gear_available(:gear_id)", {"gear_id": gear_id})
+
+        # pkg_rental_ops and pkg_penalty_center: one rental per customer, so the limit never fires
+        rentals = []
+        for i, user_id in enumerate(customers):
+            start = base + timedelta(minutes=i)
+            self.timed("rent_gear", db.rent_gear, user_id, gear_ids[i], start, start + timedelta(days=2))
+            rentals.append((user_id, db.grid_page("rentals", user_id=user_id)[0][0], start))
+        for user_id, rent_id, _ in rentals:
+            self.timed("calc_rental_charge", db.calc_rental_charge, rent_id)
+            self.timed("calc_penalty_amt", db.calc_penalty_amt, rent_id)
+            self.timed("assign_penalty", db.assign_penalty, rent_id, "Benchmark")
+        penalty_ids = [db.grid_page("penalties", filters={"rent_id": str(rent_id)})[0][0] for _, rent_id, _ in rentals]
+        for user_id, rent_id, start in rentals:
+            self.timed("return_gear", db.return_gear, rent_id, "GOOD", start + timedelta(days=2))
+        for penalty_id in penalty_ids:
+            self.timed("resolve_penalty", db.resolve_penalty, penalty_id)
+        for i, user_id in enumerate(customers):
+            start = base + timedelta(days=1, minutes=i)
+            items = [(gear_ids[(i + k) % len(gear_ids)], start, start + timedelta(days=2)) for k in range(2)]
+            self.timed("rent_gear_batch", db.rent_gear_batch, user_id, items)
+        for _ in range(calls):
+            self.timed("sweep_overdue", db.sweep_overdue)
+
+        # pkg_payment_gateway
+        for user_id, rent_id, _ in rentals:
+            self.timed("make_payment", db.make_payment, user_id, "RENTAL", rent_id, 10)
+            if oracle:
+                self.plsql_bool("validate_ref", "pkg_payment_gateway.validate_ref('RENTAL', :rent_id)",
+                                {"rent_id": rent_id})
+
+        # pkg_subscription_service
+        subscriptions = []
+        for i, user_id in enumerate(customers):
+            start = base + timedelta(minutes=i)
+            self.timed("subscribe_gear", db.subscribe_gear, user_id, gear_ids[i], start, start + timedelta(days=30))
+            subscriptions.append(db.grid_page("subscriptions", user_id=user_id)[0][0])
+            if oracle:
+                self.plsql_bool("is_active_sub", "pkg_subscription_service.is_active_sub(:user_id, :gear_id)",
+                                {"user_id": user_id, "gear_id": gear_ids[i]})
+        for sub_id in subscriptions:
+            self.timed("calc_subscription_charge", db.calc_subscription_charge, sub_id)
+            self.timed("cancel_subscription", db.cancel_subscription, sub_id)
+        for _ in range(calls):
+            self.timed("expire_subscriptions", db.expire_subscriptions)
+
+        # pkg_audit_trail
+        for i in range(calls):
+            if oracle:
+                self.timed("log_action", db.call, "pkg_audit_trail.log_action(:user_id, 'Gear', 'BENCH', :details)",
+                           {"user_id": admin_id, "details": f"Benchmark entry {i}"})
+            self.timed("get_audit_log", db.audit_page, "Rentals")
+            self.timed("get_audit_log_dates", db.audit_page, None, base, base + timedelta(days=1))
+        self.timed("set_async", db.set_audit_async, True)
+        for i in range(calls):
+            # Each deactivation is audited through the queue, so every drain has an entry to move
+            self.timed("deactivate_user", db.deactivate_user, customers[i])
+            self.timed("drain", db.drain_audit)
+        self.timed("set_async", db.set_audit_async, False)
+        for _ in range(calls):
+            self.timed("set_retention", db.set_audit_retention, None, None)
+            self.timed("apply_retention", db.apply_audit_retention)
+        return {name: summarize(samples) for name, samples in self.timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", help="oracle or sqlite (default: RENTAL_DB_BACKEND)")
+    parser.add_argument("--path", help="SQLite database file (default: a fresh in-memory database)")
+    parser.add_argument("--dataset", choices=DATASETS, default="1k", help="rentals to seed before timing")
+    parser.add_argument("--no-seed", action="store_true", help="time against what the schema already holds")
+    parser.add_argument("--calls", type=int, default=50, help="calls of each entry point")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="show speedup against results saved earlier")
+    args = parser.parse_args()
+
+    db = open_driver(args.backend, path=args.path or ":memory:")
+    try:
+        if not args.no_seed:
+            started = time.perf_counter()
+            seed(db, DATASETS[args.dataset])
+            print(f"seeded {args.dataset} rentals in {time.perf_counter() - started:.1f} s")
+        results = Suite(db, args.calls).run()
+    finally:
+        db.close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Query-plan regression check: every filtered statement must use its index.
+
+Explains each statement the drivers, packages and triggers run with a
+selective filter (EXPLAIN QUERY PLAN on SQLite, EXPLAIN PLAN on Oracle) and
+fails if none of the indexes expected for it shows up in the plan, e.g.
+after a schema change dropped or invalidated one, or a query was rewritten
+so it can no longer use it. Exits with status 1 if any check fails.
+
+Oracle costs plans from optimizer statistics, so run it against a schema
+holding realistic volumes with statistics gathered (an empty schema makes
+full scans look cheapest); SQLite's planner prefers indexes even on an empty
+database file.
+
+    python -m benchmarks.query_plans --backend sqlite
+"""
+import argparse
+import re
+import sys
+import uuid
+from datetime import datetime
+
+from dal import SQLiteDriver, open_driver
+from dal.base import GRID_MATCH, GRID_PAGE_SIZE, GRID_PAGING, GRID_SOURCES, grid_query
+from dal.search import contains_query
+from dal.sqlite import audit_query
+
+# Matches an index in SQLite's EXPLAIN QUERY PLAN details
+SQLITE_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)|USING (INTEGER PRIMARY KEY)")
+
+NOW = datetime.now().replace(microsecond=0)
+
+# Audit search as pkg_audit_trail.get_audit_log builds it for a table filter and
+# for a date range
+AUDIT_ORACLE = ("SELECT log_id, user_id, table_name, action, timestamp, details FROM Audit_Log WHERE 1 = 1"
+                " AND {table} AND {start} AND {end} AND (1 = 1 OR :bt IS NULL OR :b IS NULL)"
+                " ORDER BY timestamp DESC, log_id DESC FETCH FIRST :n ROWS ONLY")
+
+
+def grid(backend, source, **kwargs):
+    """A page of a grid as Driver.grid_page runs it on ``backend``: the first, or the one past ``after``."""
+    key = GRID_SOURCES[source][1]
+
+    def match(column, search_words):
+        binds = {"search": contains_query(search_words)} if backend == "oracle" else {}
+        return (*(part.format(column=column, key=key) for part in GRID_MATCH[backend]), binds)
+
+    query, params = grid_query(source, match=match, **kwargs)
+    return f"{query} {GRID_PAGING[backend]}", {**params, "offset": 0, "limit": GRID_PAGE_SIZE + 1}
+
+
+def checks():
+    """(name, {backend: (statement, params)}, indexes any of which satisfies the check).
+
+    A backend missing from a check is skipped, e.g. SQLite for the Oracle Text
+    searches, which it answers from in-memory indexes instead.
+    """
+    def both(query, params):
+        return {"sqlite": (query, params), "oracle": (query, params)}
+
+    def grids(source, **kwargs):
+        return {backend: grid(backend, source, **kwargs) for backend in GRID_PAGING}
+
+    return [
+        ("trg_rental_limit", {
+            "sqlite": ("SELECT COUNT(*) FROM Rentals WHERE user_id = :user_id AND status = 'RENTED'", {"user_id": 1}),
+            "oracle": ("SELECT COUNT(*) FROM Rentals WHERE CASE WHEN status = 'RENTED' THEN user_id END = :user_id",
+                       {"user_id": 1}),
+        }, ("idx_rentals_active", "idx_rentals_user_status")),
+        ("is_active_sub", {
+            "sqlite": ("SELECT 1 FROM Subscriptions WHERE user_id = :user_id AND gear_id = :gear_id "
+                       "AND is_active = 'Y' AND end_date >= :now", {"user_id": 1, "gear_id": 1, "now": NOW}),
+            "oracle": ("SELECT COUNT(*) FROM Subscriptions "
+                       "WHERE CASE WHEN is_active = 'Y' THEN user_id END = :user_id "
+                       "AND CASE WHEN is_active = 'Y' THEN gear_id END = :gear_id "
+                       "AND end_date >= SYSDATE", {"user_id": 1, "gear_id": 1}),
+        }, ("idx_subs_active",)),
+        ("expire_subscriptions", {
+            "sqlite": ("UPDATE Subscriptions SET is_active = 'N' WHERE is_active = 'Y' AND end_date < :now", {"now": NOW}),
+            "oracle": ("UPDATE Subscriptions SET is_active = 'N' "
+                       "WHERE CASE WHEN is_active = 'Y' THEN end_date END < SYSDATE", {}),
+        }, ("idx_subs_expiry",)),
+        ("make_payment duplicate check", both(
+            "SELECT 1 FROM Payments WHERE type = :type AND ref_id = :ref_id", {"type": "RENTAL", "ref_id": 1}),
+         ("idx_payments_type_ref",)),
+        ("gear grid", grids("gear"), ("PRIMARY KEY",)),
+        ("gear change token", both("SELECT MAX(last_change) FROM Gear", {}), ("idx_gear_last_change",)),
+        ("rentals grid (customer)", grids("rentals", user_id=1), ("idx_rentals_user_status", "idx_rentals_active")),
+        ("subscriptions grid (customer)", grids("subscriptions", user_id=1),
+         ("idx_subs_active", "uniq_sub_once", "sqlite_autoindex_Subscriptions_1")),
+        ("payments grid (customer)", grids("payments", user_id=1), ("idx_payments_user_id",)),
+        ("penalties grid (customer)", grids("penalties", user_id=1), ("idx_penalties_rent_id",)),
+        ("audit grid", grids("audit"), ("idx_audit_timestamp",)),
+        ("audit grid, next page", grids("audit", after=(1, None, None, None, NOW, None)), ("idx_audit_timestamp",)),
+        ("audit grid by table", grids("audit", filters={"table_name": "Users"}), ("idx_audit_table_ts",)),
+        ("audit grid by month", grids("audit", filters={"timestamp": NOW.strftime("%Y-%m")}), ("idx_audit_timestamp",)),
+        ("sweep_overdue", {
+            "sqlite": ("SELECT rent_id FROM Rentals WHERE status = 'RENTED' AND end_date < :now", {"now": NOW}),
+            "oracle": ("SELECT rent_id, penalty FROM v_rental_billing WHERE rented_until < SYSDATE AND penalty > 0", {}),
+        }, ("idx_rentals_overdue",)),
+        ("list_penalties (customer)", both("""
+            SELECT p.penalty_id, p.rent_id, p.amount, p.reason, p.status
+            FROM Penalties p
+            JOIN Rentals r ON p.rent_id = r.rent_id
+            WHERE r.user_id = :user_id
+        """, {"user_id": 1}), ("idx_penalties_rent_id",)),
+        ("audit search by table", {
+            "sqlite": audit_query("Users"),
+            "oracle": (AUDIT_ORACLE.format(table="table_name = :t", start="(1 = 1 OR :s IS NULL)",
+                                           end="(1 = 1 OR :e IS NULL)"),
+                       {"t": "Users", "s": None, "e": None, "bt": None, "b": None, "n": 200}),
+        }, ("idx_audit_table_ts",)),
+        ("audit search, next page", {
+            "sqlite": audit_query("Users", before_id=1),
+            "oracle": (AUDIT_ORACLE.replace("(1 = 1 OR :bt IS NULL OR :b IS NULL)",
+                                            "timestamp <= :bt AND (timestamp < :bt OR log_id < :b)")
+                       .format(table="table_name = :t", start="(1 = 1 OR :s IS NULL)", end="(1 = 1 OR :e IS NULL)"),
+                       {"t": "Users", "s": None, "e": None, "bt": NOW, "b": 1, "n": 200}),
+        }, ("idx_audit_table_ts",)),
+        ("gear grid search", {"oracle": grid("oracle", "gear", search="canon")}, ("idx_gear_text",)),
+        ("audit grid search", {"oracle": grid("oracle", "audit", search="canon today")}, ("idx_audit_text",)),
+        ("audit search by date", {
+            "sqlite": audit_query(start_date=NOW, end_date=NOW),
+            "oracle": (AUDIT_ORACLE.format(table="(1 = 1 OR :t IS NULL)", start="timestamp >= :s", end="timestamp <= :e"),
+                       {"t": None, "s": NOW, "e": NOW, "bt": None, "b": None, "n": 200}),
+        }, ("idx_audit_timestamp",)),
+    ]
+
+
+def sqlite_indexes(db, query, params):
+    with db.lock:
+        details = [row[3] for row in db.conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+    used = {(match.group(1) or "PRIMARY KEY") for detail in details for match in SQLITE_INDEX.finditer(detail)}
+    if any(re.fullmatch(r"SCAN \w+", detail) for detail in details) and \
+            not any("TEMP B-TREE FOR ORDER BY" in detail for detail in details):
+        # A table read in rowid order with no sort: the ORDER BY is on the primary key
+        used.add("PRIMARY KEY")
+    return used
+
+
+def oracle_indexes(db, query, params):
+    statement_id = uuid.uuid4().hex[:30]
+
+    def run(cursor):
+        cursor.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{statement_id}' FOR {query}", params)
+        # Primary key indexes have generated names, so they are reported as PRIMARY KEY
+        cursor.execute("""
+            SELECT NVL2(c.constraint_name, 'PRIMARY KEY', p.object_name)
+            FROM plan_table p
+            LEFT JOIN user_constraints c ON c.index_name = p.object_name AND c.constraint_type = 'P'
+            WHERE p.statement_id = :id AND p.object_type LIKE 'INDEX%'
+        """, {"id": statement_id})
+        names = {row[0] for row in cursor.fetchall()}
+        cursor.execute("DELETE FROM plan_table WHERE statement_id = :id", {"id": statement_id})
+        cursor.connection.commit()
+        return names
+    return db.pool.run(run)
+
+
+def run(db):
+    backend = "sqlite" if isinstance(db, SQLiteDriver) else "oracle"
+    explain = sqlite_indexes if backend == "sqlite" else oracle_indexes
+    results = []
+    for name, statements, expected in checks():
+        if backend not in statements:
+            continue
+        query, params = statements[backend]
+        used = explain(db, query, params)
+        ok = bool({index.lower() for index in used} & {index.lower() for index in expected})
+        results.append((name, ok, sorted(used), expected))
+    return results
+
+
+def report(results):
+    print(f"{'statement':<32}{'result':<8}indexes used")
+    for name, ok, used, expected in results:
+        line = f"{name:<32}{'ok' if ok else 'FAIL':<8}{', '.join(used) or '(none)'}"
+        if not ok:
+            line += f"  -- expected one of: {', '.join(expected)}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", help="oracle or sqlite (default: RENTAL_DB_BACKEND)")
+    parser.add_argument("--path", help="SQLite database file (default: a fresh in-memory database)")
+    args = parser.parse_args()
+
+    db = open_driver(args.backend, path=args.path or ":memory:")
+    try:
+        results = run(db)
+    finally:
+        db.close()
+    report(results)
+    if not all(ok for _, ok, _, _ in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
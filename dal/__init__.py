@@ -0,0 +1,22 @@
+"""Data-access layer: every database operation the application performs.
+
+``open_driver()`` picks the backend from ``RENTAL_DB_BACKEND`` ("oracle", the
+default, or "sqlite"). The Oracle driver is imported lazily so the SQLite
+backend works on machines without the oracledb package.
+"""
+import os
+
+from dal.base import AUDIT_DRAIN_BATCH, BATCH_REJECTED, UNIQUE_VIOLATION, BatchError, DataError, Driver
+from dal.sqlite import SQLiteDriver
+
+__all__ = ["AUDIT_DRAIN_BATCH", "BATCH_REJECTED", "UNIQUE_VIOLATION", "BatchError", "DataError", "Driver", "SQLiteDriver", "open_driver"]
+
+
+def open_driver(backend=None, **kwargs):
+    backend = (backend or os.environ.get("RENTAL_DB_BACKEND", "oracle")).lower()
+    if backend == "sqlite":
+        return SQLiteDriver(kwargs.get("path") or os.environ.get("RENTAL_DB_PATH", "rental.db"))
+    if backend == "oracle":
+        from dal.oracle import OracleDriver
+        return OracleDriver(kwargs.get("pool"))
+    raise ValueError(f"Unknown database backend: {backend}")
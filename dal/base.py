@@ -0,0 +1,545 @@
+"""Driver interface shared by the Oracle and SQLite backends.
+
+Every method maps onto one operation of the PL/SQL packages in backend.sql
+(or onto one of the queries the GUI used to run inline). Drivers commit each
+mutating call on their own and report business-rule violations as
+:class:`DataError` carrying the same code the PL/SQL raises, so callers can
+handle both backends identically.
+"""
+import re
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from dal.search import AUDIT_NOISE, parse_query
+
+# Oracle codes for constraint violations, reused by the SQLite driver
+UNIQUE_VIOLATION = 1
+NOT_NULL_VIOLATION = 1400
+CHECK_VIOLATION = 2290
+FK_VIOLATION = 2291
+
+# Raised (as BatchError) when a batch call rejects one or more of its items
+BATCH_REJECTED = 20064
+
+# Reason of the penalties Driver.sweep_overdue assesses (pkg_penalty_center.c_overdue_reason)
+OVERDUE_REASON = "Overdue rental"
+
+AUDIT_PAGE_SIZE = 200
+AUDIT_DRAIN_BATCH = 500
+
+# Sources for Driver.grid_page: (table or view, key column, (column, filter
+# kind) pairs in the order rows are returned, default order, extra condition
+# when only one user's rows are listed, (column, noise words) a text search
+# matches, or None). "number" and "date" filters take a value, a comparison
+# (">= 50", "<2026-01") or a range ("2026-01-01..2026-01-31"), where a date
+# is a day, a month or a year; "code" filters match exactly and "text"
+# filters match anywhere in the value, ignoring case.
+GRID_SOURCES = {
+    "gear": ("v_available_gear", "gear_id",
+             (("gear_id", "number"), ("name", "text"), ("category", "text"), ("brand", "text"),
+              ("rent_price_per_day", "number"), ("sub_price_per_month", "number"), ("stock", "number")),
+             "gear_id", None, ("name", frozenset())),
+    "rentals": ("v_user_rentals", "rent_id",
+                (("rent_id", "number"), ("user_name", "text"), ("gear_name", "text"), ("start_date", "date"),
+                 ("end_date", "date"), ("return_date", "date"), ("status", "code"), ("condition_returned", "code")),
+                "rent_id DESC", "status = 'RENTED'", None),
+    "subscriptions": ("v_user_subscriptions", "sub_id",
+                      (("sub_id", "number"), ("user_name", "text"), ("gear_name", "text"), ("start_date", "date"),
+                       ("end_date", "date"), ("is_active", "code")),
+                      "sub_id DESC", "is_active = 'Y'", None),
+    "payments": ("Payments", "payment_id",
+                 (("payment_id", "number"), ("user_id", "number"), ("amount", "number"), ("payment_date", "date"),
+                  ("type", "code"), ("ref_id", "number")),
+                 "payment_id DESC", None, None),
+    "penalties": ("v_user_penalties", "penalty_id",
+                  (("penalty_id", "number"), ("rent_id", "number"), ("amount", "number"), ("reason", "text"),
+                   ("status", "code")),
+                  "penalty_id DESC", None, None),
+    "audit": ("Audit_Log", "log_id",
+              (("log_id", "number"), ("user_id", "number"), ("table_name", "code"), ("action", "code"),
+               ("timestamp", "date"), ("details", "text")),
+              "timestamp DESC, log_id DESC", None, ("details", AUDIT_NOISE)),
+}
+GRID_PAGE_SIZE = 100
+# Paging clause each backend appends to a grid_query
+GRID_PAGING = {
+    "oracle": "OFFSET :offset ROWS FETCH NEXT :limit ROWS ONLY",
+    "sqlite": "LIMIT :limit OFFSET :offset",
+}
+# Text-search condition and score each backend's grid_page hands grid_query
+# through ``match``; SQLite first fills temp.search_hits from its in-memory index
+GRID_MATCH = {
+    "oracle": ("CONTAINS({column}, :search, 1) > 0", "SCORE(1)"),
+    "sqlite": ("{key} IN (SELECT doc_id FROM temp.search_hits)", "(SELECT score FROM temp.search_hits WHERE doc_id = {key})"),
+}
+
+COMPARISON = re.compile(r"(<=|>=|<>|!=|<|>|=)?\s*(.*)")
+
+
+def parse_number(column, text):
+    try:
+        return float(text) if "." in text else int(text)
+    except ValueError:
+        raise ValueError(f"{column}: {text!r} is not a number") from None
+
+
+def parse_period(column, text):
+    """(first moment, first moment after) of a YYYY-MM-DD day, YYYY-MM month or YYYY year."""
+    for fmt, unit in (("%Y-%m-%d", "day"), ("%Y-%m", "month"), ("%Y", "year")):
+        try:
+            start = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if unit == "day":
+            return start, datetime.fromordinal(start.toordinal() + 1)
+        if unit == "month":
+            return start, start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        return start, start.replace(year=start.year + 1)
+    raise ValueError(f"{column}: {text!r} is not a date (YYYY-MM-DD, YYYY-MM or YYYY)")
+
+
+def filter_condition(column, kind, text, bind):
+    """SQL condition and named binds for one grid filter (see GRID_SOURCES)."""
+    if kind == "text":
+        pattern = text.upper().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"UPPER({column}) LIKE :{bind} ESCAPE '\\'", {bind: f"%{pattern}%"}
+    if kind == "code":
+        return f"{column} = :{bind}", {bind: text}
+    if ".." in text:
+        low, high = (part.strip() for part in text.split("..", 1))
+        conditions, params = [], {}
+        if low:
+            conditions.append(f"{column} >= :{bind}_from")
+            params[f"{bind}_from"] = parse_number(column, low) if kind == "number" else parse_period(column, low)[0]
+        if high:
+            if kind == "number":
+                conditions.append(f"{column} <= :{bind}_to")
+                params[f"{bind}_to"] = parse_number(column, high)
+            else:
+                conditions.append(f"{column} < :{bind}_to")
+                params[f"{bind}_to"] = parse_period(column, high)[1]
+        return " AND ".join(conditions) or "1 = 1", params
+    operator, value = COMPARISON.match(text).groups()
+    operator = "<>" if operator == "!=" else operator or "="
+    if kind == "number":
+        return f"{column} {operator} :{bind}", {bind: parse_number(column, value)}
+    start, after = parse_period(column, value)
+    if operator == "=":
+        return f"{column} >= :{bind} AND {column} < :{bind}_to", {bind: start, f"{bind}_to": after}
+    if operator == "<>":
+        return f"({column} < :{bind} OR {column} >= :{bind}_to)", {bind: start, f"{bind}_to": after}
+    # A date stands for the whole period it names: "> 2026-01" starts in February
+    if operator in ("<", "<="):
+        return f"{column} < :{bind}", {bind: start if operator == "<" else after}
+    return f"{column} >= :{bind}", {bind: after if operator == ">" else start}
+
+
+def grid_query(source, filters=None, sort=None, descending=False, user_id=None, search=None, match=None,
+               after=None):
+    """Build the SQL and named binds behind :meth:`Driver.grid_page`, without the paging clause.
+
+    Filter values only ever reach the database as bind variables, and only
+    the source's own column names reach the SQL text. ``match(column,
+    words)`` returns the driver's (condition, score expression, binds) for
+    the words of ``search``; a period in the search text ("last week")
+    applies to the source's first date column unless that is filtered.
+    When the rows come in the default order, ``after`` (the last row of the
+    previous page) starts the page just past it and the binds set the
+    paging offset back to 0; any other order ignores it.
+    Raises ValueError for an unknown column or a filter that does not parse.
+    """
+    table, key, fields, default_order, user_condition, searched = GRID_SOURCES[source]
+    kinds = dict(fields)
+    where, params = [], {}
+    if user_id is not None:
+        where.append("user_id = :user_id")
+        params["user_id"] = user_id
+        if user_condition:
+            where.append(user_condition)
+    filters = {column: str(text).strip() for column, text in (filters or {}).items() if str(text or "").strip()}
+    for number, (column, text) in enumerate(filters.items()):
+        if column not in kinds:
+            raise ValueError(f"{source} has no column {column!r}")
+        condition, binds = filter_condition(column, kinds[column], text, f"f{number}")
+        where.append(condition)
+        params.update(binds)
+    order = default_order
+    if search and searched:
+        column, noise = searched
+        search_words, start, end = parse_query(search, noise=noise)
+        date_column = next((name for name, kind in fields if kind == "date"), None)
+        if date_column and date_column not in filters:
+            for condition, bind, value in ((f"{date_column} >= :search_start", "search_start", start),
+                                           (f"{date_column} <= :search_end", "search_end", end)):
+                if value is not None:
+                    where.append(condition)
+                    params[bind] = value
+        if search_words:
+            condition, score, binds = match(column, search_words)
+            where.append(condition)
+            params.update(binds)
+            order = f"{score} DESC, {default_order}"
+    if sort is not None:
+        if sort not in kinds:
+            raise ValueError(f"{source} has no column {sort!r}")
+        direction = "DESC" if descending else "ASC"
+        # The key breaks ties, so every row lands on exactly one page
+        order = f"{sort} {direction} NULLS LAST, {key} {direction}"
+    if after is not None and order == default_order:
+        # Seek past the previous page through the default order's index, where
+        # OFFSET would read and throw away every row before the page
+        names = [name for name, _ in fields]
+        keys = [(part.split()[0], part.split()[-1].upper() == "DESC") for part in default_order.split(",")]
+        condition = None
+        for number, (column, desc) in reversed(list(enumerate(keys))):
+            params[f"after{number}"] = after[names.index(column)]
+            past = f"{column} {'<' if desc else '>'} :after{number}"
+            condition = past if condition is None else f"({past} OR {column} = :after{number} AND {condition})"
+        if len(keys) > 1:
+            column, desc = keys[0]
+            condition = f"{column} {'<=' if desc else '>='} :after0 AND {condition}"
+        where.append(condition)
+        params["offset"] = 0
+    query = f"SELECT {', '.join(name for name, _ in fields)} FROM {table}"
+    if where:
+        query += f" WHERE {' AND '.join(where)}"
+    return query + f" ORDER BY {order}", params
+
+
+# Sources for Driver.export_rows: (table or view, key column the export is
+# ordered and resumed by, date column the date range applies to, columns)
+EXPORT_SOURCES = {
+    "audit": ("Audit_Log", "log_id", "timestamp", ("log_id", "user_id", "table_name", "action", "timestamp", "details")),
+    "audit_archive": ("Audit_Archive", "log_id", "timestamp",
+                      ("log_id", "user_id", "table_name", "action", "timestamp", "details")),
+    "payments": ("Payments", "payment_id", "payment_date",
+                 ("payment_id", "user_id", "amount", "payment_date", "type", "ref_id")),
+    "rentals": ("v_user_rentals", "rent_id", "start_date",
+                ("rent_id", "user_id", "user_name", "gear_name", "start_date", "end_date", "return_date", "status",
+                 "condition_returned")),
+    "subscriptions": ("v_user_subscriptions", "sub_id", "start_date",
+                      ("sub_id", "user_id", "user_name", "gear_name", "start_date", "end_date", "is_active")),
+}
+EXPORT_BATCH = 5000
+
+
+def export_query(source, start_date=None, end_date=None, after_id=None):
+    """Build the SQL and named binds behind :meth:`Driver.export_rows`, in key order."""
+    table, key, date_column, columns = EXPORT_SOURCES[source]
+    where, params = [], {}
+    if start_date is not None:
+        where.append(f"{date_column} >= :start_date")
+        params["start_date"] = start_date
+    if end_date is not None:
+        where.append(f"{date_column} <= :end_date")
+        params["end_date"] = end_date
+    if after_id is not None:
+        where.append(f"{key} > :after_id")
+        params["after_id"] = after_id
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    if where:
+        query += f" WHERE {' AND '.join(where)}"
+    return query + f" ORDER BY {key}", params
+
+
+# Reports for Driver.report: (summary view, columns, order). The views read
+# only the summaries kept by materialized views (Oracle) or summary tables
+# (SQLite), never the base tables they summarize.
+REPORTS = {
+    "revenue_by_gear": ("v_report_revenue_by_gear",
+                        ("gear_id", "name", "category", "rental_revenue", "subscription_revenue", "total_revenue"),
+                        "total_revenue DESC, gear_id"),
+    "utilization": ("v_report_utilization",
+                    ("category", "items", "units_in_stock", "active_rentals", "total_rentals", "rented_days",
+                     "utilization_pct", "active_subscriptions"),
+                    "category"),
+    "revenue_by_month": ("v_report_revenue_by_month",
+                         ("month", "rental_revenue", "subscription_revenue", "penalty_revenue", "total_revenue"),
+                         "month DESC"),
+    "penalties": ("v_report_penalties", ("status", "penalties", "amount"), "status"),
+}
+
+
+def report_query(name):
+    """Build the SQL behind :meth:`Driver.report`."""
+    view, columns, order = REPORTS[name]
+    return f"SELECT {', '.join(columns)} FROM {view} ORDER BY {order}"
+
+
+class DataError(Exception):
+    """A database error with the Oracle error code (e.g. 20021 or 1)."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+    def __str__(self):
+        if self.message.startswith("ORA-") or not self.code:
+            return self.message
+        return f"ORA-{self.code:05d}: {self.message}"
+
+
+class BatchError(DataError):
+    """A batch call that changed nothing because some items were rejected.
+
+    ``errors`` maps the index of each rejected item to a :class:`DataError`
+    with the code the single-item call would have raised for it.
+    """
+
+    def __init__(self, errors, total):
+        super().__init__(BATCH_REJECTED, f"{len(errors)} of {total} items rejected")
+        self.errors = errors
+
+    @classmethod
+    def from_codes(cls, codes, messages):
+        """Raise for per-item result arrays (code 0 means the item was fine), if any item failed."""
+        errors = {i: DataError(int(code), message) for i, (code, message) in enumerate(zip(codes, messages)) if code}
+        if errors:
+            raise cls(errors, len(codes))
+
+
+class Driver(ABC):
+    # Number of calls the driver can usefully run at the same time
+    max_concurrency = 1
+
+    def close(self):
+        pass
+
+    def trace(self, tracer):
+        """Report every statement from now on to ``tracer``, a dal.metrics.Metrics."""
+        pass
+
+    # Users (pkg_user_ops)
+    @abstractmethod
+    def register_user(self, name, email, phone, password, role="CUSTOMER"):
+        pass
+
+    @abstractmethod
+    def deactivate_user(self, user_id):
+        pass
+
+    @abstractmethod
+    def get_user_info(self, user_id):
+        """Return the one-line summary shown on the Users tab."""
+
+    @abstractmethod
+    def verify_user(self, email, password):
+        """Return the user id for valid credentials, otherwise 0."""
+
+    @abstractmethod
+    def get_user_role(self, user_id):
+        pass
+
+    # Gear (pkg_gear_ops)
+    @abstractmethod
+    def list_available_gear(self):
+        """Rows of (gear_id, name, category, brand, rent_price_per_day, sub_price_per_month, stock)."""
+
+    @abstractmethod
+    def add_gear(self, user_id, name, category, brand, rent_price, sub_price, stock):
+        pass
+
+    @abstractmethod
+    def import_gear(self, user_id, rows):
+        """Insert ``(name, category, brand, rent_price, sub_price, stock)`` rows as one array DML call.
+
+        Rows the database rejects are skipped and the rest are committed;
+        returns ``[(index, DataError), ...]`` for the rejected ones. Raises
+        like ``add_gear`` if ``user_id`` is not an admin.
+        """
+
+    @abstractmethod
+    def update_stock(self, gear_id, qty):
+        pass
+
+    @abstractmethod
+    def gear_change_token(self):
+        """The highest Gear ``last_change`` stamp, which moves whenever any gear row is inserted or updated."""
+
+    # Rentals (pkg_rental_ops)
+    @abstractmethod
+    def list_rentals(self, user_id=None):
+        """Rows of (rent_id, user_name, gear_name, start_date, end_date, return_date, status, condition).
+
+        With ``user_id`` only that user's active rentals are returned.
+        """
+
+    @abstractmethod
+    def rent_gear(self, user_id, gear_id, start_date, end_date):
+        pass
+
+    @abstractmethod
+    def rent_gear_batch(self, user_id, items):
+        """Rent every ``(gear_id, start_date, end_date)`` in ``items`` in one transaction.
+
+        Either all items are rented or none: if any item breaks a rule,
+        :class:`BatchError` reports each failing item by its index.
+        """
+
+    @abstractmethod
+    def return_gear(self, rent_id, condition, return_date=None):
+        """Return a rental; ``return_date`` defaults to now (SYSDATE)."""
+
+    @abstractmethod
+    def calc_rental_charge(self, rent_id):
+        pass
+
+    # Subscriptions (pkg_subscription_service)
+    @abstractmethod
+    def list_subscriptions(self, user_id=None):
+        """Rows of (sub_id, user_name, gear_name, start_date, end_date, is_active).
+
+        With ``user_id`` only that user's active subscriptions are returned.
+        """
+
+    @abstractmethod
+    def subscribe_gear(self, user_id, gear_id, start_date, end_date):
+        pass
+
+    @abstractmethod
+    def cancel_subscription(self, sub_id):
+        pass
+
+    @abstractmethod
+    def calc_subscription_charge(self, sub_id):
+        """Days used times the daily rate, or None if the subscription does not exist."""
+
+    @abstractmethod
+    def expire_subscriptions(self):
+        """Deactivate every active subscription past its end date in one statement; return how many.
+
+        Oracle runs it on a schedule (SUBSCRIPTION_EXPIRY_JOB); subscription_expiry.py
+        and the admin menu run it on demand.
+        """
+
+    # Payments (pkg_payment_gateway)
+    @abstractmethod
+    def list_payments(self, user_id=None):
+        """Rows of (payment_id, user_id, amount, payment_date, type, ref_id)."""
+
+    @abstractmethod
+    def make_payment(self, user_id, pay_type, ref_id, amount):
+        pass
+
+    # Penalties (pkg_penalty_center)
+    @abstractmethod
+    def list_penalties(self, user_id=None):
+        """Rows of (penalty_id, rent_id, amount, reason, status)."""
+
+    @abstractmethod
+    def assign_penalty(self, rent_id, reason):
+        pass
+
+    @abstractmethod
+    def resolve_penalty(self, penalty_id):
+        pass
+
+    @abstractmethod
+    def get_penalty_amount(self, penalty_id):
+        """Return the penalty amount, or None if the penalty does not exist."""
+
+    @abstractmethod
+    def calc_penalty_amt(self, rent_id):
+        pass
+
+    @abstractmethod
+    def sweep_overdue(self):
+        """Charge every overdue rental in one set-based pass; return (processed, elapsed_seconds).
+
+        Each rental still out past its end date gets one OVERDUE_REASON
+        penalty at the calc_penalty_amt rate; pending ones are brought up to
+        date on later runs, so running it again is harmless. ``processed``
+        counts the penalties added or changed.
+        """
+
+    # Billing (v_rental_billing, v_subscription_billing)
+    @abstractmethod
+    def rental_billing(self, user_id=None, rent_ids=None):
+        """Rows of (rent_id, user_id, charge, penalty, paid, penalties_due, amount_due) in one query.
+
+        ``charge`` is what calc_rental_charge returns and ``penalty`` what
+        calc_penalty_amt returns. ``paid`` is the rental payment made so far,
+        ``penalties_due`` the assessed penalties not yet paid, and
+        ``amount_due`` the charge if it is unpaid plus ``penalties_due``.
+        Covers every rental, or only ``user_id``'s, or only ``rent_ids``.
+        """
+
+    @abstractmethod
+    def subscription_billing(self, user_id=None, sub_ids=None):
+        """Rows of (sub_id, user_id, charge, paid, amount_due) in one query, like rental_billing."""
+
+    # Audit (pkg_audit_trail)
+    @abstractmethod
+    def audit_page(self, table_name=None, start_date=None, end_date=None, before_id=None, limit=AUDIT_PAGE_SIZE):
+        """One page of (log_id, user_id, table_name, action, timestamp, details), newest first.
+
+        Rows are ordered by (timestamp, log_id) and keyset-paginated: pass the
+        log_id of the last row of the previous page as ``before_id`` to get
+        the next one.
+        """
+
+    @abstractmethod
+    def set_audit_async(self, enabled):
+        """Switch audit triggers between writing Audit_Log directly and queueing to Audit_Queue."""
+
+    @abstractmethod
+    def drain_audit(self, batch_size=AUDIT_DRAIN_BATCH):
+        """Move up to ``batch_size`` of the oldest queued entries into Audit_Log; return how many moved."""
+
+    @abstractmethod
+    def audit_lag(self):
+        """Return (pending, lag_seconds) for Audit_Queue; lag_seconds is None when it is empty."""
+
+    @abstractmethod
+    def set_audit_retention(self, compress_after_months=None, archive_after_months=None):
+        """Change the retention tiers kept in Audit_Config; None leaves a tier as it is."""
+
+    @abstractmethod
+    def apply_audit_retention(self):
+        """Compress and archive the audit months past their tier; return (compressed, archived) month counts.
+
+        Months older than ``archive_after_months`` leave Audit_Log for
+        Audit_Archive. On Oracle whole monthly partitions move, and months
+        older than ``compress_after_months`` are compressed in place first.
+        """
+
+    # Grids
+    @abstractmethod
+    def grid_page(self, source, filters=None, sort=None, descending=False, offset=0, limit=GRID_PAGE_SIZE,
+                  after=None, user_id=None, search=None):
+        """One page of a ``GRID_SOURCES`` entry, filtered, sorted and paged in the database.
+
+        ``filters`` maps columns to what the user typed (see GRID_SOURCES) and
+        ``sort`` names the column to order by, else the source's default
+        order applies; ``offset`` and ``limit`` select the page. In the
+        default order, ``after`` (the last row of the previous page) finds
+        the page by key instead of ``offset``. With
+        ``user_id`` only that user's rows are listed, as in the list_*
+        methods. ``search`` is free text (dal/search.py) matched against
+        the sources that have it; its best matches come first unless
+        ``sort`` is given.
+        """
+
+    # Export
+    @abstractmethod
+    def export_rows(self, source, start_date=None, end_date=None, after_id=None, batch_size=EXPORT_BATCH):
+        """Yield the rows of an ``EXPORT_SOURCES`` entry in key order, as lists of up to ``batch_size``."""
+
+    # Bulk loading (datagen.py)
+    @abstractmethod
+    def load_rows(self, table, columns, rows):
+        """Insert ``rows`` (tuples in ``columns`` order) into ``table`` as one array DML call and commit.
+
+        Rows go straight into the table through its triggers and constraints;
+        one bad row fails the whole call.
+        """
+
+    # Reports
+    @abstractmethod
+    def report(self, name):
+        """Rows of one of the REPORTS, read from its summary alone."""
+
+    @abstractmethod
+    def refresh_reports(self):
+        """Bring the report summaries up to date with the base tables."""
@@ -0,0 +1,52 @@
+"""Pricing rules for rental, subscription and penalty charges, over whole columns.
+
+These mirror the v_rental_billing and v_subscription_billing views in
+backend.sql, which hold the same rules as set-based SQL for Oracle. The
+SQLite driver fetches the inputs for any number of rows in one query, with
+each period already reduced to whole seconds, and prices them here. Each
+function takes parallel sequences (one item per row) and returns a list;
+None inputs give None, like NULL does in SQL.
+"""
+import math
+
+# Overdue days are charged at this multiple of the daily rate
+OVERDUE_RATE = 2
+# Flat fee on top of the overdue charge for gear returned in this condition
+DAMAGE_FEES = {"DAMAGED": 100, "BROKEN": 200}
+
+DAY = 86400
+
+
+def charge_days(seconds):
+    """CEIL(end - start) in days, as Oracle computes it for DATE arithmetic."""
+    return math.ceil(seconds / DAY)
+
+
+def rental_charges(seconds, prices):
+    """CEIL(days rented) * daily rate, for rentals lasting ``seconds`` (to the return, else the end, else now)."""
+    return [charge_days(s) * p if s is not None and p is not None else None for s, p in zip(seconds, prices)]
+
+
+def subscription_charges(seconds, prices):
+    """(whole days used + 1) * daily rate, for subscriptions lasting ``seconds`` (to the end, else now)."""
+    return [(s // DAY + 1) * p if s is not None and p is not None else None for s, p in zip(seconds, prices)]
+
+
+def penalty_amounts(overdue_seconds, prices, conditions):
+    """OVERDUE_RATE * daily rate per overdue day, plus DAMAGE_FEES.
+
+    ``overdue_seconds`` runs from the end date to the return (or now); it is
+    None for rentals without an end date, which are never overdue.
+    """
+    return [penalty_amount(*row) for row in zip(overdue_seconds, prices, conditions)]
+
+
+def penalty_amount(overdue_seconds, price, condition):
+    """penalty_amounts for one rental."""
+    amount = 0
+    if overdue_seconds is not None and overdue_seconds > 0:
+        if price is None:
+            return None
+        amount = charge_days(overdue_seconds) * (price * OVERDUE_RATE)
+    amount += DAMAGE_FEES.get(condition, 0)
+    return round(amount, 2)
@@ -0,0 +1,375 @@
+"""Per-operation latency, row and round-trip metrics, and the slow-query log.
+
+``InstrumentedDriver`` wraps a driver so every call is timed, and
+``Driver.trace`` makes the backend report each statement it executes
+(``TracedCursor``), with the rows it returned or changed and each fetch.
+Calls are grouped by logical operation: the app action that issued them
+(``rent_gear``, ``refresh_audit``, ...), set with :func:`action` or the
+:func:`instrumented` decorator and carried onto the worker thread by
+DBWorker, together with the driver method that ran. Statements slower than
+``slow_ms`` go to the slow-query log (kept in memory and, with
+RENTAL_SLOW_QUERY_LOG, appended to a file). On Oracle each session is also
+tagged with the module, the action and the logged-in user
+(``client_identifier``), so the same operations show up in V$SESSION,
+ASH and AWR.
+
+Histograms use fixed buckets, so recording is cheap and the percentiles
+are upper bounds: p95 = 50 means 95% of calls took at most 50 ms.
+"""
+import contextvars
+import functools
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+MODULE = "tech-gear-rental"
+DEFAULT_SLOW_MS = 200.0
+SLOW_LOG_SIZE = 200
+
+# Upper bounds of the latency buckets, in milliseconds; the last one catches the rest
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float("inf"))
+
+current_action = contextvars.ContextVar("current_action", default=None)
+
+
+@contextmanager
+def action(name, inherit=False):
+    """Attribute the database calls made inside the block to ``name``.
+
+    With ``inherit`` an action that is already set is kept, so ``name`` only
+    names calls that would otherwise have none.
+    """
+    if inherit and current_action.get() is not None:
+        yield
+        return
+    token = current_action.set(name)
+    try:
+        yield
+    finally:
+        current_action.reset(token)
+
+
+def instrumented(method):
+    """Run a method as the action named after it, e.g. ``refresh_audit``."""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with action(method.__name__):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.total = 0
+
+    def add(self, ms):
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (None when empty or above the last bound)."""
+        if not self.total:
+            return None
+        wanted = self.total * p / 100
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= wanted:
+                return bound if bound != float("inf") else None
+        return None
+
+    def as_dict(self):
+        return {("+inf" if bound == float("inf") else f"<={bound}"): count for bound, count in zip(BUCKETS_MS, self.counts)}
+
+
+class OperationStats:
+    """Totals for one (action, driver call) pair."""
+
+    def __init__(self, action_name, call):
+        self.action = action_name
+        self.call = call
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.round_trips = 0
+        self.statements = 0
+        self.last_error = None
+        self.histogram = Histogram()
+
+    def as_dict(self):
+        return {
+            "action": self.action,
+            "call": self.call,
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(self.total_ms, 1),
+            "avg_ms": round(self.total_ms / self.calls, 1) if self.calls else None,
+            "p50_ms": self.histogram.percentile(50),
+            "p95_ms": self.histogram.percentile(95),
+            "p99_ms": self.histogram.percentile(99),
+            "max_ms": round(self.max_ms, 1),
+            "rows": self.rows,
+            "round_trips": self.round_trips,
+            "statements": self.statements,
+            "last_error": self.last_error,
+            "histogram": self.histogram.as_dict(),
+        }
+
+
+class Statement:
+    """One statement of a call: its text, time spent executing and fetching, rows and round trips."""
+    __slots__ = ("sql", "elapsed", "rows", "round_trips")
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.elapsed = 0.0
+        self.rows = 0
+        self.round_trips = 0
+
+
+class _Call:
+    def __init__(self, action_name, name):
+        self.action = action_name
+        self.name = name
+        self.statements = []
+
+
+class Metrics:
+    def __init__(self, slow_ms=DEFAULT_SLOW_MS, slow_log=None, module=MODULE):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.module = module
+        # Logged-in user, sent to Oracle as the session's client_identifier
+        self.client_identifier = None
+        self.started = datetime.now()
+        self._slow_queries = deque(maxlen=SLOW_LOG_SIZE)
+        self._operations = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls):
+        return cls(slow_ms=float(os.environ.get("RENTAL_SLOW_QUERY_MS", DEFAULT_SLOW_MS)),
+                   slow_log=os.environ.get("RENTAL_SLOW_QUERY_LOG") or None)
+
+    @contextmanager
+    def call(self, name):
+        """Time one driver call; statements run inside it are counted towards it."""
+        if getattr(self._local, "call", None) is not None:
+            # A driver method calling another through the wrapper counts once
+            yield
+            return
+        record = _Call(current_action.get(), name)
+        self._local.call = record
+        error = None
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._local.call = None
+            self._finish(record, elapsed_ms, error)
+
+    def statement(self, sql):
+        """Start recording a statement of the current call (or an unrecorded one outside any call)."""
+        statement = Statement(sql)
+        record = getattr(self._local, "call", None)
+        if record is not None:
+            record.statements.append(statement)
+        return statement
+
+    def wrap(self, cursor):
+        """``cursor`` reporting its statements to these metrics."""
+        return TracedCursor(cursor, self)
+
+    def tag_session(self, connection):
+        """Tag an Oracle session with the module, action and user of the call it is borrowed for.
+
+        python-oracledb sends the tags along with the next statement, so this
+        costs no extra round trip.
+        """
+        record = getattr(self._local, "call", None)
+        name = (record.action or record.name) if record else None
+        connection.module = self.module[:48]
+        connection.action = (name or "")[:32]
+        connection.client_identifier = (self.client_identifier or "")[:64]
+
+    def _finish(self, record, elapsed_ms, error):
+        key = (record.action or "-", record.name)
+        slow = [s for s in record.statements if s.elapsed * 1000 >= self.slow_ms]
+        with self._lock:
+            stats = self._operations.get(key)
+            if stats is None:
+                stats = self._operations[key] = OperationStats(*key)
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.histogram.add(elapsed_ms)
+            stats.statements += len(record.statements)
+            stats.rows += sum(s.rows for s in record.statements)
+            stats.round_trips += sum(s.round_trips for s in record.statements)
+            if error is not None:
+                stats.errors += 1
+                stats.last_error = str(error)
+            entries = [self._slow_entry(key, s) for s in slow]
+            self._slow_queries.extend(entries)
+        if entries and self.slow_log:
+            with open(self.slow_log, "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(f"{entry['time']}\t{entry['ms']:.1f} ms\t{entry['action']}/{entry['call']}\t"
+                            f"rows={entry['rows']}\t{entry['sql']}\n")
+
+    @staticmethod
+    def _slow_entry(key, statement):
+        return {
+            "time": datetime.now().replace(microsecond=0).isoformat(" "),
+            "ms": round(statement.elapsed * 1000, 1),
+            "action": key[0],
+            "call": key[1],
+            "rows": statement.rows,
+            # One line, without the indentation the statements are written with
+            "sql": re.sub(r"\s+", " ", str(statement.sql)).strip()[:1000],
+        }
+
+    def operations(self):
+        """Stats of every operation as dicts, the most total time first."""
+        with self._lock:
+            rows = [stats.as_dict() for stats in self._operations.values()]
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def slow_queries(self):
+        """The slow-query log, oldest first."""
+        with self._lock:
+            return list(self._slow_queries)
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+            self._slow_queries.clear()
+        self.started = datetime.now()
+
+    def export(self, path):
+        """Write every operation and the slow-query log to ``path`` as JSON."""
+        data = {
+            "since": self.started.replace(microsecond=0).isoformat(" "),
+            "exported": datetime.now().replace(microsecond=0).isoformat(" "),
+            "slow_query_ms": self.slow_ms,
+            "operations": self.operations(),
+            "slow_queries": self.slow_queries(),
+        }
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+
+class TracedCursor:
+    """DB-API cursor that reports each execute and fetch to a :class:`Metrics`.
+
+    Every execute, executemany, callproc and fetch call counts as one round
+    trip; rows are the rows fetched, or those changed by DML.
+    """
+
+    def __init__(self, cursor, metrics):
+        self.__dict__.update(_cursor=cursor, _metrics=metrics, _statement=Statement(None))
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def _run(self, sql, method, *args, **kwargs):
+        statement = self._metrics.statement(sql)
+        self.__dict__["_statement"] = statement
+        started = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            statement.elapsed += time.perf_counter() - started
+            statement.round_trips += 1
+        if self._cursor.description is None and (self._cursor.rowcount or 0) > 0:
+            statement.rows += self._cursor.rowcount
+        return result
+
+    def execute(self, statement, *args, **kwargs):
+        self._run(statement, self._cursor.execute, statement, *args, **kwargs)
+        return self
+
+    def executemany(self, statement, *args, **kwargs):
+        self._run(statement, self._cursor.executemany, statement, *args, **kwargs)
+        return self
+
+    def callproc(self, name, *args, **kwargs):
+        return self._run(name, self._cursor.callproc, name, *args, **kwargs)
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._statement.elapsed += time.perf_counter() - started
+            self._statement.round_trips += 1
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is not None:
+            self._statement.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._fetch(self._cursor.fetchmany, *args)
+        self._statement.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._statement.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        statement, iterator = self._statement, iter(self._cursor)
+        statement.round_trips += 1
+        while True:
+            started = time.perf_counter()
+            try:
+                row = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                statement.elapsed += time.perf_counter() - started
+            statement.rows += 1
+            yield row
+
+
+class InstrumentedDriver:
+    """A driver whose every public method call is timed as an operation of ``metrics``."""
+
+    def __init__(self, driver, metrics):
+        self.driver = driver
+        self.metrics = metrics
+        driver.trace(metrics)
+
+    def __getattr__(self, name):
+        attr = getattr(self.driver, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def timed(*args, **kwargs):
+            with self.metrics.call(name):
+                return attr(*args, **kwargs)
+        return timed
@@ -0,0 +1,377 @@
+"""Oracle backend: thin wrappers around the PL/SQL packages in backend.sql."""
+from contextlib import contextmanager
+
+import oracledb
+
+from db_pool import ConnectionPool
+from dal.base import (
+    AUDIT_DRAIN_BATCH,
+    AUDIT_PAGE_SIZE,
+    EXPORT_BATCH,
+    GRID_MATCH,
+    GRID_PAGE_SIZE,
+    GRID_PAGING,
+    BatchError,
+    DataError,
+    Driver,
+    export_query,
+    grid_query,
+    report_query,
+)
+from dal.search import contains_query
+
+
+@contextmanager
+def translate_errors():
+    try:
+        yield
+    except oracledb.Error as e:
+        error = e.args[0]
+        raise DataError(getattr(error, "code", 0), getattr(error, "message", str(e))) from e
+
+
+class OracleDriver(Driver):
+    def __init__(self, pool=None):
+        with translate_errors():
+            self.pool = pool or ConnectionPool.from_env()
+            self.pool.health_check()
+        self.max_concurrency = self.pool.max
+
+    def close(self):
+        self.pool.close()
+
+    def trace(self, tracer):
+        self.pool.tracer = tracer
+
+    def fetch_all(self, query, params=None):
+        def run(cursor):
+            cursor.execute(query, params or {})
+            return cursor.fetchall()
+        with translate_errors():
+            return self.pool.run(run, retry=True)
+
+    def fetch_one(self, query, params=None):
+        def run(cursor):
+            cursor.execute(query, params or {})
+            return cursor.fetchone()
+        with translate_errors():
+            return self.pool.run(run, retry=True)
+
+    def call(self, statement, params=None):
+        """Run a PL/SQL call and commit it in the same round trip."""
+        with translate_errors():
+            self.pool.run(lambda cursor: cursor.execute(f"""
+                BEGIN
+                    {statement};
+                    COMMIT;
+                END;
+            """, params or {}))
+
+    # Users
+    def register_user(self, name, email, phone, password, role="CUSTOMER"):
+        self.call("pkg_user_ops.register_user(:name, :email, :phone, :password, :role)",
+                  {"name": name, "email": email, "phone": phone, "password": password, "role": role})
+
+    def deactivate_user(self, user_id):
+        self.call("pkg_user_ops.deactivate_user(:id)", {"id": user_id})
+
+    def get_user_info(self, user_id):
+        return self.fetch_one("SELECT pkg_user_ops.get_user_info(:id) FROM dual", {"id": user_id})[0]
+
+    def verify_user(self, email, password):
+        return self.fetch_one("SELECT pkg_user_ops.verify_user(:email, :password) FROM dual",
+                              {"email": email, "password": password})[0]
+
+    def get_user_role(self, user_id):
+        row = self.fetch_one("SELECT role FROM Users WHERE user_id = :id", {"id": user_id})
+        return row[0] if row else None
+
+    # Gear
+    def list_available_gear(self):
+        return self.fetch_all("SELECT gear_id, name, category, brand, rent_price_per_day, sub_price_per_month, stock FROM v_available_gear")
+
+    def gear_change_token(self):
+        return self.fetch_one("SELECT MAX(last_change) FROM Gear")[0]
+
+    def add_gear(self, user_id, name, category, brand, rent_price, sub_price, stock):
+        self.call("pkg_gear_ops.add_gear(:user_id, :name, :category, :brand, :rent_price, :sub_price, :stock)", {
+            "user_id": user_id,
+            "name": name,
+            "category": category,
+            "brand": brand,
+            "rent_price": rent_price,
+            "sub_price": sub_price,
+            "stock": stock
+        })
+
+    def import_gear(self, user_id, rows):
+        role = self.get_user_role(user_id)
+        if role is None:
+            raise DataError(20015, "User does not exist")
+        if role != "ADMIN":
+            raise DataError(20052, "Only admins can add gear")
+
+        def run(cursor):
+            # One round trip for the whole chunk; failing rows are collected, not raised
+            cursor.executemany("""
+                INSERT INTO Gear (name, category, brand, rent_price_per_day, sub_price_per_month, stock)
+                VALUES (:1, :2, :3, :4, :5, :6)
+            """, rows, batcherrors=True)
+            errors = [(error.offset, DataError(error.code, error.message)) for error in cursor.getbatcherrors()]
+            cursor.connection.commit()
+            return errors
+        with translate_errors():
+            return self.pool.run(run)
+
+    def update_stock(self, gear_id, qty):
+        self.call("pkg_gear_ops.update_stock(:gear_id, :qty)", {"gear_id": gear_id, "qty": qty})
+
+    # Rentals
+    def list_rentals(self, user_id=None):
+        query = """
+            SELECT rent_id, user_name, gear_name, start_date, end_date, return_date, status, condition_returned
+            FROM v_user_rentals
+        """
+        params = {}
+        if user_id is not None:
+            query += " WHERE user_id = :id AND status = 'RENTED'"
+            params["id"] = user_id
+        return self.fetch_all(query, params)
+
+    def rent_gear(self, user_id, gear_id, start_date, end_date):
+        self.call("pkg_rental_ops.rent_gear(:user_id, :gear_id, :start_date, :end_date)",
+                  {"user_id": user_id, "gear_id": gear_id, "start_date": start_date, "end_date": end_date})
+
+    def rent_gear_batch(self, user_id, items):
+        if not items:
+            return
+        gear_ids, starts, ends = (list(column) for column in zip(*items))
+
+        def run(cursor):
+            # One round trip: the arrays go over as PL/SQL index-by tables
+            codes = cursor.arrayvar(oracledb.DB_TYPE_NUMBER, len(items))
+            messages = cursor.arrayvar(oracledb.DB_TYPE_VARCHAR, len(items), 4000)
+            cursor.execute("""
+                BEGIN
+                    pkg_rental_ops.rent_gear_batch(:user_id, :gear_ids, :starts, :ends, :codes, :messages);
+                    COMMIT;
+                END;
+            """, {
+                "user_id": user_id,
+                "gear_ids": cursor.arrayvar(oracledb.DB_TYPE_NUMBER, gear_ids),
+                "starts": cursor.arrayvar(oracledb.DB_TYPE_DATE, starts),
+                "ends": cursor.arrayvar(oracledb.DB_TYPE_DATE, ends),
+                "codes": codes,
+                "messages": messages,
+            })
+            return codes.getvalue(), messages.getvalue()
+        with translate_errors():
+            codes, messages = self.pool.run(run)
+        BatchError.from_codes(codes, messages)
+
+    def return_gear(self, rent_id, condition, return_date=None):
+        self.call("pkg_rental_ops.return_gear(:rent_id, NVL(:return_date, SYSDATE), :condition)",
+                  {"rent_id": rent_id, "return_date": return_date, "condition": condition})
+
+    def calc_rental_charge(self, rent_id):
+        return self.fetch_one("SELECT pkg_rental_ops.calc_rental_charge(:rent_id) FROM dual", {"rent_id": rent_id})[0]
+
+    # Subscriptions
+    def list_subscriptions(self, user_id=None):
+        query = "SELECT sub_id, user_name, gear_name, start_date, end_date, is_active FROM v_user_subscriptions"
+        params = {}
+        if user_id is not None:
+            query += " WHERE user_id = :id AND is_active = 'Y'"
+            params["id"] = user_id
+        return self.fetch_all(query, params)
+
+    def subscribe_gear(self, user_id, gear_id, start_date, end_date):
+        self.call("pkg_subscription_service.subscribe_gear(:user_id, :gear_id, :start_date, :end_date)",
+                  {"user_id": user_id, "gear_id": gear_id, "start_date": start_date, "end_date": end_date})
+
+    def cancel_subscription(self, sub_id):
+        self.call("pkg_subscription_service.cancel_subscription(:sub_id)", {"sub_id": sub_id})
+
+    def calc_subscription_charge(self, sub_id):
+        row = self.fetch_one("SELECT charge FROM v_subscription_billing WHERE sub_id = :sub_id", {"sub_id": sub_id})
+        return row[0] if row else None
+
+    def expire_subscriptions(self):
+        def run(cursor):
+            expired = cursor.var(int)
+            cursor.execute("""
+                BEGIN
+                    pkg_subscription_service.expire_subscriptions(:expired);
+                    COMMIT;
+                END;
+            """, {"expired": expired})
+            return expired.getvalue()
+        with translate_errors():
+            return self.pool.run(run)
+
+    # Payments
+    def list_payments(self, user_id=None):
+        query = "SELECT payment_id, user_id, amount, payment_date, type, ref_id FROM Payments"
+        params = {}
+        if user_id is not None:
+            query += " WHERE user_id = :id"
+            params["id"] = user_id
+        return self.fetch_all(query, params)
+
+    def make_payment(self, user_id, pay_type, ref_id, amount):
+        self.call("pkg_payment_gateway.make_payment(:user_id, :type, :ref_id, :amount)",
+                  {"user_id": user_id, "type": pay_type, "ref_id": ref_id, "amount": amount})
+
+    # Penalties
+    def list_penalties(self, user_id=None):
+        if user_id is None:
+            return self.fetch_all("SELECT penalty_id, rent_id, amount, reason, status FROM Penalties")
+        return self.fetch_all("""
+            SELECT p.penalty_id, p.rent_id, p.amount, p.reason, p.status
+            FROM Penalties p
+            JOIN Rentals r ON p.rent_id = r.rent_id
+            WHERE r.user_id = :id
+        """, {"id": user_id})
+
+    def assign_penalty(self, rent_id, reason):
+        self.call("pkg_penalty_center.assign_penalty(:rent_id, :reason)", {"rent_id": rent_id, "reason": reason})
+
+    def resolve_penalty(self, penalty_id):
+        self.call("pkg_penalty_center.resolve_penalty(:penalty_id)", {"penalty_id": penalty_id})
+
+    def get_penalty_amount(self, penalty_id):
+        row = self.fetch_one("SELECT amount FROM Penalties WHERE penalty_id = :id", {"id": penalty_id})
+        return row[0] if row else None
+
+    def calc_penalty_amt(self, rent_id):
+        return self.fetch_one("SELECT pkg_penalty_center.calc_penalty_amt(:rent_id) FROM dual", {"rent_id": rent_id})[0]
+
+    def sweep_overdue(self):
+        def run(cursor):
+            processed, elapsed = cursor.var(int), cursor.var(float)
+            cursor.execute("""
+                BEGIN
+                    pkg_penalty_center.sweep_overdue(:processed, :elapsed);
+                    COMMIT;
+                END;
+            """, {"processed": processed, "elapsed": elapsed})
+            return processed.getvalue(), elapsed.getvalue()
+        with translate_errors():
+            return self.pool.run(run)
+
+    # Billing
+    def rental_billing(self, user_id=None, rent_ids=None):
+        return self._billing("v_rental_billing", "rent_id, user_id, charge, penalty, paid, penalties_due, amount_due",
+                             "rent_id", user_id, rent_ids)
+
+    def subscription_billing(self, user_id=None, sub_ids=None):
+        return self._billing("v_subscription_billing", "sub_id, user_id, charge, paid, amount_due",
+                             "sub_id", user_id, sub_ids)
+
+    def _billing(self, view, columns, key, user_id, ids):
+        def run(cursor):
+            where, params = [], {}
+            if user_id is not None:
+                where.append("user_id = :user_id")
+                params["user_id"] = user_id
+            if ids is not None:
+                # Any number of ids in one bind, without an IN list per batch
+                id_list = cursor.connection.gettype("SYS.ODCINUMBERLIST").newobject(list(ids))
+                where.append(f"{key} IN (SELECT COLUMN_VALUE FROM TABLE(:ids))")
+                params["ids"] = id_list
+            query = f"SELECT {columns} FROM {view}"
+            if where:
+                query += f" WHERE {' AND '.join(where)}"
+            cursor.execute(query + f" ORDER BY {key}", params)
+            return cursor.fetchall()
+        with translate_errors():
+            return self.pool.run(run, retry=True)
+
+    # Audit
+    def audit_page(self, table_name=None, start_date=None, end_date=None, before_id=None, limit=AUDIT_PAGE_SIZE):
+        def run(cursor):
+            ref_cursor = cursor.var(oracledb.CURSOR)
+            cursor.callproc("pkg_audit_trail.get_audit_log", keyword_parameters={
+                "p_table_name": table_name,
+                "p_start_date": start_date,
+                "p_end_date": end_date,
+                "p_cursor": ref_cursor,
+                "p_before_id": before_id,
+                "p_limit": limit,
+            })
+            return ref_cursor.getvalue().fetchall()
+        with translate_errors():
+            return self.pool.run(run, retry=True)
+
+    def set_audit_async(self, enabled):
+        self.call("pkg_audit_trail.set_async(:enabled)", {"enabled": "Y" if enabled else "N"})
+
+    def drain_audit(self, batch_size=AUDIT_DRAIN_BATCH):
+        def run(cursor):
+            moved = cursor.var(int)
+            cursor.execute("""
+                BEGIN
+                    pkg_audit_trail.drain(:batch_size, :moved);
+                    COMMIT;
+                END;
+            """, {"batch_size": batch_size, "moved": moved})
+            return moved.getvalue()
+        with translate_errors():
+            return self.pool.run(run)
+
+    def audit_lag(self):
+        return self.fetch_one("SELECT pending, lag_seconds FROM v_audit_queue_lag")
+
+    def set_audit_retention(self, compress_after_months=None, archive_after_months=None):
+        self.call("pkg_audit_trail.set_retention(:compress_months, :archive_months)",
+                  {"compress_months": compress_after_months, "archive_months": archive_after_months})
+
+    def apply_audit_retention(self):
+        def run(cursor):
+            compressed, archived = cursor.var(int), cursor.var(int)
+            # Partition DDL commits as it goes, so there is no COMMIT to add
+            cursor.callproc("pkg_audit_trail.apply_retention", [compressed, archived])
+            return compressed.getvalue(), archived.getvalue()
+        with translate_errors():
+            return self.pool.run(run)
+
+    # Grids
+    def grid_page(self, source, filters=None, sort=None, descending=False, offset=0, limit=GRID_PAGE_SIZE,
+                  after=None, user_id=None, search=None):
+        def match(column, search_words):
+            condition, score = GRID_MATCH["oracle"]
+            return condition.format(column=column), score, {"search": contains_query(search_words)}
+
+        query, params = grid_query(source, filters, sort, descending, user_id, search, match, after)
+        return self.fetch_all(f"{query} {GRID_PAGING['oracle']}", {"offset": offset, **params, "limit": limit})
+
+    # Export
+    def load_rows(self, table, columns, rows):
+        binds = ", ".join(f":{i}" for i in range(1, len(columns) + 1))
+
+        def run(cursor):
+            cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({binds})", rows)
+            cursor.connection.commit()
+        with translate_errors():
+            self.pool.run(run)
+
+    def export_rows(self, source, start_date=None, end_date=None, after_id=None, batch_size=EXPORT_BATCH):
+        query, params = export_query(source, start_date, end_date, after_id)
+        # One cursor streams the whole result; each fetchmany is one round trip of batch_size rows
+        with translate_errors(), self.pool.cursor() as cursor:
+            cursor.arraysize = batch_size
+            cursor.prefetchrows = batch_size + 1
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                yield rows
+
+    # Reports (pkg_reports)
+    def report(self, name):
+        return self.fetch_all(report_query(name))
+
+    def refresh_reports(self):
+        # Fast refresh: applies only what the materialized view logs recorded since the last one
+        self.call("pkg_reports.refresh")
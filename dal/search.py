@@ -0,0 +1,161 @@
+"""Free-text search over the gear catalog and audit details.
+
+Oracle answers searches from Oracle Text indexes (idx_gear_text,
+idx_audit_text in backend.sql). The SQLite stand-in has no text indexes, so
+it keeps an ``InvertedIndex`` per source in memory instead, built on the
+first search and brought up to date incrementally before each later one.
+
+``parse_query`` turns what the user typed into search words plus an optional
+date range, so "canon cameras last week" searches for canon and camera in
+entries from the last seven days. Both backends share it; each one then
+matches the words its own way (``contains_query`` for Oracle Text, ``stem``
+for the inverted index).
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+WORD = re.compile(r"[a-z0-9]+")
+
+# Words that never narrow a search
+STOPWORDS = frozenset("""
+    a all an and any are as at be by every for from in is it of on or show
+    that the this to was were with
+""".split())
+# Words that describe the audit log itself rather than what is in it
+AUDIT_NOISE = frozenset("audit audits entry entries event events log logs record records".split())
+
+# Oracle Text operators, which have to be escaped to be searched as words
+RESERVED = frozenset("""
+    about accum and bt btg bti btp equiv fuzzy haspath inpath mdata minus near
+    not nt ntg nti ntp or pt rt sqe syn tr trsyn tt within
+""".split())
+
+# "today", "yesterday", "this week", "last month", "last 3 days", ...
+PERIOD = re.compile(r"\b(?:(today)|(yesterday)|(this|last|past)\s+(?:(\d+)\s+)?(day|week|month)s?)\b")
+
+
+def words(text):
+    """The lower-case words of ``text``, in order."""
+    return WORD.findall((text or "").lower())
+
+
+def stem(word):
+    """Strip plural endings, so "cameras" and "camera" index the same."""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    if word.endswith("sses"):
+        return word[:-2]
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("xes", "zzes", "ches", "shes")) and not word.endswith("aches"):
+        # "boxes", "watches"; "caches" and "headaches" keep their e below
+        return word[:-2]
+    if word.endswith("lenses"):
+        # "lens" loses its s below as if it were a plural, so "lenses" has to match that
+        word = word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def terms(text):
+    """Stemmed index terms of ``text``, as the inverted index stores them."""
+    return [stem(word) for word in words(text)]
+
+
+def parse_query(text, now=None, noise=frozenset()):
+    """Split a search into (words, start_date, end_date).
+
+    A relative period anywhere in the text becomes the date range and is
+    dropped from the words, as are stopwords and ``noise``. Dates are None
+    when the text names no period.
+    """
+    now = now or datetime.now().replace(microsecond=0)
+    text = (text or "").lower()
+    start = end = None
+    match = PERIOD.search(text)
+    if match:
+        today = now.replace(hour=0, minute=0, second=0)
+        today_word, yesterday, which, count, unit = match.groups()
+        if today_word:
+            start = today
+        elif yesterday:
+            start, end = today - timedelta(days=1), today - timedelta(seconds=1)
+        else:
+            days = {"day": 1, "week": 7, "month": 30}[unit] * int(count or 1)
+            if which == "this" and unit == "week":
+                start = today - timedelta(days=today.weekday())
+            elif which == "this" and unit == "month":
+                start = today.replace(day=1)
+            elif which == "this":
+                start = today
+            else:
+                start = now - timedelta(days=days)
+        text = text[:match.start()] + " " + text[match.end():]
+    kept = [word for word in words(text) if word not in STOPWORDS and stem(word) not in noise]
+    return kept, start, end
+
+
+def contains_query(search_words):
+    """Oracle Text query matching every word in any of its forms ($ is the stem operator)."""
+    return " AND ".join(f"{{{word}}}" if word in RESERVED else f"${word}" for word in search_words)
+
+
+class InvertedIndex:
+    """term -> {doc_id: term count}, with tf-idf ranking and a small payload per document."""
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        # doc_id -> (distinct terms, payload)
+        self.docs = {}
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, doc_id, text, payload=None):
+        """Index (or re-index) one document."""
+        self.remove(doc_id)
+        counts = Counter(terms(text))
+        for term, count in counts.items():
+            self.postings[term][doc_id] = count
+        self.docs[doc_id] = (tuple(counts), payload)
+
+    def remove(self, doc_id):
+        entry = self.docs.pop(doc_id, None)
+        if entry is None:
+            return
+        for term in entry[0]:
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+
+    def search(self, search_words, where=None):
+        """(doc_id, score, payload) for the documents holding every word, unordered.
+
+        ``where(payload)`` filters documents before they are scored.
+        """
+        query = list(dict.fromkeys(stem(word) for word in search_words))
+        if not query:
+            return []
+        postings = [self.postings.get(term, {}) for term in query]
+        # Walk the rarest term's documents and probe the others
+        postings.sort(key=len)
+        total = len(self.docs)
+        weights = [math.log(1 + total / len(p)) if p else 0 for p in postings]
+        hits = []
+        for doc_id, count in postings[0].items():
+            payload = self.docs[doc_id][1]
+            if where is not None and not where(payload):
+                continue
+            score = (1 + math.log(count)) * weights[0]
+            for p, weight in zip(postings[1:], weights[1:]):
+                other = p.get(doc_id)
+                if other is None:
+                    break
+                score += (1 + math.log(other)) * weight
+            else:
+                hits.append((doc_id, round(score, 2), payload))
+        return hits
@@ -0,0 +1,1302 @@
+"""SQLite stand-in for the Oracle schema.
+
+Mirrors the tables, views and triggers of backend.sql and re-implements the
+pkg_*_ops business rules in Python, raising the same error codes, so the
+application logic can be exercised, profiled and load-tested on any machine
+without an Oracle instance. SQLite allows a single writer, so calls are
+serialised on one connection.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from dal.base import (
+    AUDIT_DRAIN_BATCH,
+    AUDIT_PAGE_SIZE,
+    CHECK_VIOLATION,
+    EXPORT_BATCH,
+    EXPORT_SOURCES,
+    FK_VIOLATION,
+    GRID_MATCH,
+    GRID_PAGE_SIZE,
+    GRID_PAGING,
+    GRID_SOURCES,
+    NOT_NULL_VIOLATION,
+    OVERDUE_REASON,
+    UNIQUE_VIOLATION,
+    BatchError,
+    DataError,
+    Driver,
+    export_query,
+    grid_query,
+    report_query,
+)
+from dal.billing import penalty_amounts, rental_charges, subscription_charges
+from dal.search import InvertedIndex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS Users (
+    user_id         INTEGER PRIMARY KEY,
+    name            TEXT NOT NULL,
+    email           TEXT UNIQUE NOT NULL,
+    phone           TEXT,
+    status          TEXT DEFAULT 'ACTIVE' CHECK (status IN ('ACTIVE', 'INACTIVE')),
+    created_at      DATE DEFAULT (datetime('now', 'localtime')),
+    role            TEXT DEFAULT 'CUSTOMER' CHECK (role IN ('ADMIN', 'CUSTOMER')),
+    password_hash   TEXT
+);
+
+CREATE TABLE IF NOT EXISTS Gear (
+    gear_id             INTEGER PRIMARY KEY,
+    name                TEXT NOT NULL,
+    category            TEXT,
+    brand               TEXT,
+    rent_price_per_day  REAL CHECK (rent_price_per_day >= 0),
+    sub_price_per_month REAL CHECK (sub_price_per_month >= 0),
+    stock               INTEGER DEFAULT 0 CHECK (stock >= 0),
+    status              TEXT DEFAULT 'AVAILABLE' CHECK (status IN ('AVAILABLE', 'UNAVAILABLE')),
+    last_change         INTEGER,
+    CONSTRAINT uniq_gear_name UNIQUE (name)
+);
+
+CREATE TABLE IF NOT EXISTS Rentals (
+    rent_id             INTEGER PRIMARY KEY,
+    user_id             INTEGER REFERENCES Users(user_id) ON DELETE CASCADE,
+    gear_id             INTEGER REFERENCES Gear(gear_id) ON DELETE CASCADE,
+    start_date          DATE NOT NULL,
+    end_date            DATE,
+    return_date         DATE,
+    status              TEXT DEFAULT 'RENTED' CHECK (status IN ('RENTED', 'RETURNED')),
+    condition_returned  TEXT CHECK (condition_returned IN ('GOOD', 'DAMAGED', 'BROKEN')),
+    CONSTRAINT chk_dates CHECK (end_date >= start_date),
+    CONSTRAINT uniq_rental_once UNIQUE (user_id, gear_id, start_date)
+);
+
+CREATE TABLE IF NOT EXISTS Subscriptions (
+    sub_id      INTEGER PRIMARY KEY,
+    user_id     INTEGER REFERENCES Users(user_id) ON DELETE CASCADE,
+    gear_id     INTEGER REFERENCES Gear(gear_id) ON DELETE CASCADE,
+    start_date  DATE NOT NULL,
+    end_date    DATE NOT NULL,
+    is_active   TEXT DEFAULT 'Y' CHECK (is_active IN ('Y', 'N')),
+    CONSTRAINT uniq_sub_once UNIQUE (user_id, gear_id, start_date)
+);
+
+CREATE TABLE IF NOT EXISTS Payments (
+    payment_id   INTEGER PRIMARY KEY,
+    user_id      INTEGER REFERENCES Users(user_id) ON DELETE CASCADE,
+    amount       REAL CHECK (amount >= 0),
+    payment_date DATE DEFAULT (datetime('now', 'localtime')),
+    type         TEXT CHECK (type IN ('RENTAL', 'SUBSCRIPTION', 'PENALTY')),
+    ref_id       INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS Penalties (
+    penalty_id  INTEGER PRIMARY KEY,
+    rent_id     INTEGER REFERENCES Rentals(rent_id) ON DELETE CASCADE,
+    amount      REAL CHECK (amount >= 0),
+    reason      TEXT,
+    status      TEXT DEFAULT 'PENDING' CHECK (status IN ('PENDING', 'PAID'))
+);
+
+-- AUTOINCREMENT: log_ids must never be reused once retention has emptied the
+-- log, or the archive would reject them and the search index would skip them
+CREATE TABLE IF NOT EXISTS Audit_Log (
+    log_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id     INTEGER REFERENCES Users(user_id),
+    table_name  TEXT,
+    action      TEXT,
+    timestamp   DATE DEFAULT (datetime('now', 'localtime')),
+    details     TEXT
+);
+
+-- Entries past Audit_Config.archive_after_months (backend.sql moves whole
+-- monthly partitions here; SQLite has no partitions, so rows are moved)
+CREATE TABLE IF NOT EXISTS Audit_Archive (
+    log_id      INTEGER PRIMARY KEY,
+    user_id     INTEGER,
+    table_name  TEXT,
+    action      TEXT,
+    timestamp   DATE,
+    details     TEXT
+);
+
+CREATE TABLE IF NOT EXISTS Audit_Queue (
+    log_id      INTEGER PRIMARY KEY,
+    user_id     INTEGER,
+    table_name  TEXT,
+    action      TEXT,
+    timestamp   DATE DEFAULT (datetime('now', 'localtime')),
+    details     TEXT
+);
+
+CREATE TABLE IF NOT EXISTS Audit_Config (
+    config_id       INTEGER PRIMARY KEY CHECK (config_id = 1),
+    async_enabled   TEXT DEFAULT 'N' CHECK (async_enabled IN ('Y', 'N')),
+    compress_after_months INTEGER DEFAULT 3 CHECK (compress_after_months >= 1),
+    archive_after_months  INTEGER DEFAULT 24 CHECK (archive_after_months >= 1)
+);
+INSERT OR IGNORE INTO Audit_Config (config_id, async_enabled) VALUES (1, 'N');
+
+-- One index per filter the drivers and triggers issue (same names as backend.sql).
+-- idx_subs_active, idx_subs_expiry and idx_rentals_overdue are partial indexes
+-- over active rows only; the rental limit count is already answered from
+-- idx_rentals_user_status alone, so Oracle's idx_rentals_active has no
+-- counterpart here. log_id is the rowid, which every index ends in, so the
+-- audit indexes need no log_id column.
+DROP INDEX IF EXISTS idx_rentals_user_id;
+CREATE INDEX IF NOT EXISTS idx_rentals_user_status ON Rentals(user_id, status);
+CREATE INDEX IF NOT EXISTS idx_rentals_overdue ON Rentals(end_date) WHERE status = 'RENTED';
+CREATE INDEX IF NOT EXISTS idx_subs_active ON Subscriptions(user_id, gear_id) WHERE is_active = 'Y';
+CREATE INDEX IF NOT EXISTS idx_subs_expiry ON Subscriptions(end_date) WHERE is_active = 'Y';
+CREATE INDEX IF NOT EXISTS idx_payments_type_ref ON Payments(type, ref_id);
+CREATE INDEX IF NOT EXISTS idx_payments_user_id ON Payments(user_id);
+CREATE INDEX IF NOT EXISTS idx_penalties_rent_id ON Penalties(rent_id);
+DROP INDEX IF EXISTS idx_audit_table_log;
+CREATE INDEX IF NOT EXISTS idx_audit_table_ts ON Audit_Log(table_name, timestamp);
+CREATE INDEX IF NOT EXISTS idx_audit_timestamp ON Audit_Log(timestamp);
+CREATE INDEX IF NOT EXISTS idx_gear_last_change ON Gear(last_change);
+-- Only Gear is still change-tracked, for the gear search index
+DROP INDEX IF EXISTS idx_rentals_last_change;
+DROP INDEX IF EXISTS idx_subs_last_change;
+DROP INDEX IF EXISTS idx_payments_last_change;
+DROP TRIGGER IF EXISTS trg_rentals_change_ins;
+DROP TRIGGER IF EXISTS trg_rentals_change_upd;
+DROP TRIGGER IF EXISTS trg_subscriptions_change_ins;
+DROP TRIGGER IF EXISTS trg_subscriptions_change_upd;
+DROP TRIGGER IF EXISTS trg_payments_change_ins;
+DROP TRIGGER IF EXISTS trg_payments_change_upd;
+
+-- trg_rental_limit
+CREATE TRIGGER IF NOT EXISTS trg_rental_limit
+BEFORE INSERT ON Rentals
+WHEN (SELECT COUNT(*) FROM Rentals WHERE user_id = NEW.user_id AND status = 'RENTED') >= 3
+BEGIN
+    SELECT RAISE(ABORT, 'ORA-20053: User has reached rental limit of 3 active rentals');
+END;
+
+-- Replaced by expire_subscriptions
+DROP TRIGGER IF EXISTS trg_subscriptions_expiry;
+
+-- trg_check_payment_ref
+CREATE TRIGGER IF NOT EXISTS trg_check_payment_ref
+BEFORE INSERT ON Payments
+WHEN NOT CASE NEW.type
+    WHEN 'RENTAL' THEN EXISTS (SELECT 1 FROM Rentals WHERE rent_id = NEW.ref_id)
+    WHEN 'SUBSCRIPTION' THEN EXISTS (SELECT 1 FROM Subscriptions WHERE sub_id = NEW.ref_id)
+    WHEN 'PENALTY' THEN EXISTS (SELECT 1 FROM Penalties WHERE penalty_id = NEW.ref_id)
+    ELSE 0
+END
+BEGIN
+    SELECT RAISE(ABORT, 'ORA-20010: Invalid reference for given payment type');
+END;
+
+CREATE VIEW IF NOT EXISTS v_audit_queue_lag AS
+SELECT COUNT(*) AS pending,
+       ROUND((julianday('now', 'localtime') - julianday(MIN(timestamp))) * 86400) AS lag_seconds
+FROM Audit_Queue;
+
+CREATE VIEW IF NOT EXISTS v_available_gear AS
+SELECT gear_id, name, category, brand, rent_price_per_day, sub_price_per_month, stock
+FROM Gear
+WHERE status = 'AVAILABLE' AND stock > 0;
+
+CREATE VIEW IF NOT EXISTS v_user_rentals AS
+SELECT r.rent_id, u.user_id, u.name AS user_name, g.name AS gear_name,
+       r.start_date, r.end_date, r.return_date, r.status, r.condition_returned
+FROM Rentals r
+JOIN Users u ON r.user_id = u.user_id
+JOIN Gear g ON r.gear_id = g.gear_id;
+
+CREATE VIEW IF NOT EXISTS v_user_subscriptions AS
+SELECT s.sub_id, u.user_id, u.name AS user_name, g.name AS gear_name,
+       s.start_date, s.end_date, s.is_active
+FROM Subscriptions s
+JOIN Users u ON s.user_id = u.user_id
+JOIN Gear g ON s.gear_id = g.gear_id;
+
+CREATE VIEW IF NOT EXISTS v_user_penalties AS
+SELECT p.penalty_id, p.rent_id, p.amount, p.reason, p.status, r.user_id
+FROM Penalties p
+JOIN Rentals r ON p.rent_id = r.rent_id;
+
+-- Report summaries: backend.sql keeps these as fast-refreshed materialized
+-- views; here summary tables are kept current by the trg_*_summary triggers,
+-- which add each inserted row and subtract each deleted one (an update does
+-- both). Rows are never removed, so the views skip the ones counting nothing.
+CREATE TABLE IF NOT EXISTS rpt_revenue_by_month (
+    month           TEXT,
+    type            TEXT,
+    amount          REAL DEFAULT 0,
+    payments        INTEGER DEFAULT 0,
+    PRIMARY KEY (month, type)
+);
+
+CREATE TABLE IF NOT EXISTS rpt_revenue_by_gear (
+    gear_id              INTEGER PRIMARY KEY,
+    rental_revenue       REAL DEFAULT 0,
+    subscription_revenue REAL DEFAULT 0,
+    payments             INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rpt_category_usage (
+    category        TEXT PRIMARY KEY,
+    items           INTEGER DEFAULT 0,
+    units           INTEGER DEFAULT 0,
+    rentals         INTEGER DEFAULT 0,
+    active_rentals  INTEGER DEFAULT 0,
+    rented_days     REAL DEFAULT 0,
+    active_subscriptions INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rpt_penalty_totals (
+    status          TEXT PRIMARY KEY,
+    penalties       INTEGER DEFAULT 0,
+    amount          REAL DEFAULT 0
+);
+
+CREATE VIEW IF NOT EXISTS v_report_revenue_by_gear AS
+SELECT x.gear_id, g.name, IFNULL(g.category, '(none)') AS category, ROUND(x.rental_revenue, 2) AS rental_revenue,
+       ROUND(x.subscription_revenue, 2) AS subscription_revenue,
+       ROUND(x.rental_revenue + x.subscription_revenue, 2) AS total_revenue
+FROM rpt_revenue_by_gear x
+JOIN Gear g ON g.gear_id = x.gear_id
+WHERE x.payments > 0;
+
+CREATE VIEW IF NOT EXISTS v_report_utilization AS
+SELECT category, items, units AS units_in_stock, active_rentals, rentals AS total_rentals,
+       ROUND(rented_days, 1) AS rented_days,
+       ROUND(100.0 * active_rentals / NULLIF(active_rentals + units, 0), 1) AS utilization_pct,
+       active_subscriptions
+FROM rpt_category_usage
+WHERE items > 0 OR rentals > 0 OR active_subscriptions > 0;
+
+CREATE VIEW IF NOT EXISTS v_report_revenue_by_month AS
+SELECT month,
+       ROUND(SUM(CASE WHEN type = 'RENTAL' THEN amount ELSE 0 END), 2) AS rental_revenue,
+       ROUND(SUM(CASE WHEN type = 'SUBSCRIPTION' THEN amount ELSE 0 END), 2) AS subscription_revenue,
+       ROUND(SUM(CASE WHEN type = 'PENALTY' THEN amount ELSE 0 END), 2) AS penalty_revenue,
+       ROUND(SUM(amount), 2) AS total_revenue
+FROM rpt_revenue_by_month
+WHERE payments > 0
+GROUP BY month;
+
+CREATE VIEW IF NOT EXISTS v_report_penalties AS
+SELECT status, penalties, ROUND(amount, 2) AS amount
+FROM rpt_penalty_totals
+WHERE penalties > 0;
+"""
+
+# Audited tables: (label used in details, primary key, column holding the acting user, columns)
+AUDITED_TABLES = {
+    "Users": ("User", "user_id", "user_id",
+              ["name", "email", "phone", "status", "role", "password_hash", "created_at"]),
+    "Gear": ("Gear", "gear_id", None,
+             ["name", "category", "brand", "rent_price_per_day", "sub_price_per_month", "stock", "status"]),
+    "Rentals": ("Rental", "rent_id", "user_id",
+                ["user_id", "gear_id", "start_date", "end_date", "return_date", "status", "condition_returned"]),
+    "Subscriptions": ("Subscription", "sub_id", "user_id",
+                      ["user_id", "gear_id", "start_date", "end_date", "is_active"]),
+    "Payments": ("Payment", "payment_id", "user_id",
+                 ["user_id", "amount", "payment_date", "type", "ref_id"]),
+    "Penalties": ("Penalty", "penalty_id", None,
+                  ["rent_id", "amount", "reason", "status"]),
+}
+
+# Columns whose values are never written to the audit trail
+SECRET_COLUMNS = {"password_hash"}
+
+
+# Async audit mode is on (entries go to Audit_Queue until AuditDrainer moves them)
+AUDIT_ASYNC = "IFNULL((SELECT async_enabled FROM Audit_Config WHERE config_id = 1), 'N') = 'Y'"
+
+
+def create_trigger_sql(name, event, body):
+    """Drop and recreate a generated trigger, so files created by older versions pick up changes."""
+    return f"DROP TRIGGER IF EXISTS {name};\nCREATE TRIGGER {name} {event}\nBEGIN\n{body}\nEND;"
+
+
+def audit_trigger_sql(table):
+    """Build the INSERT/UPDATE/DELETE audit triggers for one table (trg_*_audit)."""
+    label, pk, user_col, columns = AUDITED_TABLES[table]
+
+    def snapshot(ref):
+        parts = [f"'ID=' || {ref}.{pk}"]
+        parts += [f"', {col.capitalize()}=' || IFNULL({ref}.{col}, 'NULL')"
+                  for col in columns if col not in SECRET_COLUMNS]
+        return " || ".join(parts)
+
+    def user(ref):
+        return f"{ref}.{user_col}" if user_col else "NULL"
+
+    def log(user_id, action, details):
+        entry = f"SELECT {user_id}, '{table}', '{action}', {details}"
+        return (f"    INSERT INTO Audit_Log (user_id, table_name, action, details)\n"
+                f"    {entry} WHERE NOT {AUDIT_ASYNC};\n"
+                f"    INSERT INTO Audit_Queue (user_id, table_name, action, details)\n"
+                f"    {entry} WHERE {AUDIT_ASYNC};")
+
+    prefix = f"trg_{table.lower()}_audit"
+    statements = [
+        create_trigger_sql(f"{prefix}_ins", f"AFTER INSERT ON {table}",
+                           log(user("NEW"), "INSERT", f"'{label} added: ' || {snapshot('NEW')}")),
+        create_trigger_sql(f"{prefix}_del", f"AFTER DELETE ON {table}",
+                           log(user("OLD"), "DELETE", f"'{label} deleted: ' || {snapshot('OLD')}")),
+    ]
+    for col in columns:
+        if col in SECRET_COLUMNS:
+            details = f"'{label} {col} changed'"
+        else:
+            details = (f"'{label} {col} changed from ' || IFNULL(OLD.{col}, 'NULL') || "
+                       f"' to ' || IFNULL(NEW.{col}, 'NULL')")
+        statements.append(create_trigger_sql(f"{prefix}_upd_{col}",
+                                             f"AFTER UPDATE OF {col} ON {table} WHEN OLD.{col} IS NOT NEW.{col}",
+                                             log(user("NEW"), "UPDATE", details)))
+    return "\n".join(statements)
+
+
+# Tables stamped with last_change, by primary key: only Gear, so the gear
+# search index re-reads just the items changed since the last search and the
+# gear cache can tell from MAX(last_change) whether anything changed
+CHANGE_TRACKED = {
+    "Gear": "gear_id",
+}
+
+# Gear changed after a last_change value, and whether it is still listed
+GEAR_CHANGES = """
+    SELECT last_change, status = 'AVAILABLE' AND stock > 0,
+           gear_id, name, category, brand, rent_price_per_day, sub_price_per_month, stock
+    FROM Gear
+    WHERE last_change > ?
+"""
+
+
+def change_trigger_sql(table):
+    """Build the triggers stamping last_change (trg_*_change).
+
+    SQLite cannot assign NEW, so the row is stamped afterwards with the
+    table's next value, which keeps the stamps increasing.
+    """
+    pk = CHANGE_TRACKED[table]
+    stamp = (f"    UPDATE {table} SET last_change = (SELECT IFNULL(MAX(last_change), 0) + 1 FROM {table})\n"
+             f"    WHERE {pk} = NEW.{pk};")
+    prefix = f"trg_{table.lower()}_change"
+    return "\n".join([
+        create_trigger_sql(f"{prefix}_ins", f"AFTER INSERT ON {table}", stamp),
+        create_trigger_sql(f"{prefix}_upd", f"AFTER UPDATE ON {table} WHEN NEW.last_change IS OLD.last_change", stamp),
+    ])
+
+
+def rented_days_sql(ref):
+    """Days a rental covers, as mv_category_rentals counts them: up to its return, else its end."""
+    return f"IFNULL(julianday(COALESCE({ref}.return_date, {ref}.end_date)) - julianday({ref}.start_date), 0)"
+
+
+def summary_upsert_sql(table, keys, columns, source):
+    """Add the rows of ``source`` (keys then columns) onto a summary table."""
+    updates = ", ".join(f"{col} = {col} + excluded.{col}" for col in columns)
+    # The WHERE every source ends with keeps SQLite from reading ON CONFLICT as a join constraint
+    return (f"    INSERT INTO {table} ({', '.join(keys + columns)})\n"
+            f"    {source}\n"
+            f"    ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates};")
+
+
+def payment_summary_sql(ref, sign):
+    amount = f"{sign} * IFNULL({ref}.amount, 0)"
+    return "\n".join([
+        summary_upsert_sql("rpt_revenue_by_month", ["month", "type"], ["amount", "payments"],
+                           f"SELECT strftime('%Y-%m', {ref}.payment_date), {ref}.type, {amount}, {sign} WHERE 1"),
+        summary_upsert_sql("rpt_revenue_by_gear", ["gear_id"], ["rental_revenue", "subscription_revenue", "payments"],
+                           f"SELECT gear_id, CASE WHEN {ref}.type = 'RENTAL' THEN {amount} ELSE 0 END, "
+                           f"CASE WHEN {ref}.type = 'SUBSCRIPTION' THEN {amount} ELSE 0 END, {sign} FROM ("
+                           f"SELECT gear_id FROM Rentals WHERE {ref}.type = 'RENTAL' AND rent_id = {ref}.ref_id "
+                           f"UNION ALL SELECT gear_id FROM Subscriptions "
+                           f"WHERE {ref}.type = 'SUBSCRIPTION' AND sub_id = {ref}.ref_id) WHERE 1"),
+    ])
+
+
+def rental_summary_sql(ref, sign):
+    return summary_upsert_sql("rpt_category_usage", ["category"], ["rentals", "active_rentals", "rented_days"],
+                              f"SELECT IFNULL(category, '(none)'), {sign}, {sign} * ({ref}.status = 'RENTED'), "
+                              f"{sign} * {rented_days_sql(ref)} FROM Gear WHERE gear_id = {ref}.gear_id")
+
+
+def gear_summary_sql(ref, sign):
+    return summary_upsert_sql("rpt_category_usage", ["category"], ["items", "units"],
+                              f"SELECT IFNULL({ref}.category, '(none)'), {sign}, {sign} * IFNULL({ref}.stock, 0) WHERE 1")
+
+
+def subscription_summary_sql(ref, sign):
+    return summary_upsert_sql("rpt_category_usage", ["category"], ["active_subscriptions"],
+                              f"SELECT IFNULL(category, '(none)'), {sign} * ({ref}.is_active = 'Y') "
+                              f"FROM Gear WHERE gear_id = {ref}.gear_id")
+
+
+def gear_rentals_summary_sql(ref, sign):
+    """Move all of one gear's rentals and subscriptions onto (or off) a category, when the gear changes category."""
+    return "\n".join([
+        summary_upsert_sql("rpt_category_usage", ["category"], ["rentals", "active_rentals", "rented_days"],
+                           f"SELECT IFNULL({ref}.category, '(none)'), {sign} * COUNT(*), "
+                           f"{sign} * IFNULL(SUM(status = 'RENTED'), 0), "
+                           f"{sign} * IFNULL(SUM({rented_days_sql('Rentals')}), 0) "
+                           f"FROM Rentals WHERE gear_id = {ref}.gear_id"),
+        summary_upsert_sql("rpt_category_usage", ["category"], ["active_subscriptions"],
+                           f"SELECT IFNULL({ref}.category, '(none)'), {sign} * COUNT(*) "
+                           f"FROM Subscriptions WHERE gear_id = {ref}.gear_id AND is_active = 'Y'"),
+    ])
+
+
+def penalty_summary_sql(ref, sign):
+    return summary_upsert_sql("rpt_penalty_totals", ["status"], ["penalties", "amount"],
+                              f"SELECT {ref}.status, {sign}, {sign} * IFNULL({ref}.amount, 0) WHERE 1")
+
+
+# Tables feeding the report summaries: (columns an update must touch to change a summary, delta statements)
+SUMMARIZED_TABLES = {
+    "Payments": ("amount, payment_date, type, ref_id", payment_summary_sql),
+    "Rentals": ("gear_id, start_date, end_date, return_date, status", rental_summary_sql),
+    "Subscriptions": ("gear_id, is_active", subscription_summary_sql),
+    "Gear": ("category, stock", gear_summary_sql),
+    "Penalties": ("amount, status", penalty_summary_sql),
+}
+
+
+def summary_trigger_sql(table):
+    """Build the triggers keeping the report summaries current (trg_*_summary)."""
+    columns, summary = SUMMARIZED_TABLES[table]
+    prefix = f"trg_{table.lower()}_summary"
+    statements = [
+        create_trigger_sql(f"{prefix}_ins", f"AFTER INSERT ON {table}", summary("NEW", 1)),
+        create_trigger_sql(f"{prefix}_del", f"AFTER DELETE ON {table}", summary("OLD", -1)),
+        create_trigger_sql(f"{prefix}_upd", f"AFTER UPDATE OF {columns} ON {table}",
+                           f"{summary('OLD', -1)}\n{summary('NEW', 1)}"),
+    ]
+    if table == "Gear":
+        statements.append(create_trigger_sql(f"{prefix}_category",
+                                             "AFTER UPDATE OF category ON Gear WHEN OLD.category IS NOT NEW.category",
+                                             f"{gear_rentals_summary_sql('OLD', -1)}\n"
+                                             f"{gear_rentals_summary_sql('NEW', 1)}"))
+    return "\n".join(statements)
+
+
+# Full rebuild of each summary from its base tables (SQLiteDriver.refresh_reports)
+REPORT_REBUILDS = {
+    "rpt_revenue_by_month": """
+        SELECT strftime('%Y-%m', payment_date), type, IFNULL(SUM(amount), 0), COUNT(*)
+        FROM Payments
+        GROUP BY 1, 2
+    """,
+    "rpt_revenue_by_gear": """
+        SELECT gear_id, SUM(rental), SUM(subscription), COUNT(*)
+        FROM (
+            SELECT r.gear_id, IFNULL(p.amount, 0) AS rental, 0 AS subscription
+            FROM Payments p JOIN Rentals r ON p.type = 'RENTAL' AND p.ref_id = r.rent_id
+            UNION ALL
+            SELECT s.gear_id, 0, IFNULL(p.amount, 0)
+            FROM Payments p JOIN Subscriptions s ON p.type = 'SUBSCRIPTION' AND p.ref_id = s.sub_id
+        )
+        GROUP BY gear_id
+    """,
+    "rpt_category_usage": f"""
+        SELECT category, SUM(items), SUM(units), SUM(rentals), SUM(active_rentals), SUM(rented_days),
+               SUM(active_subscriptions)
+        FROM (
+            SELECT IFNULL(category, '(none)') AS category, 1 AS items, IFNULL(stock, 0) AS units,
+                   0 AS rentals, 0 AS active_rentals, 0 AS rented_days, 0 AS active_subscriptions
+            FROM Gear
+            UNION ALL
+            SELECT IFNULL(g.category, '(none)'), 0, 0, 1, r.status = 'RENTED', {rented_days_sql('r')}, 0
+            FROM Rentals r JOIN Gear g ON g.gear_id = r.gear_id
+            UNION ALL
+            SELECT IFNULL(g.category, '(none)'), 0, 0, 0, 0, 0, 1
+            FROM Subscriptions s JOIN Gear g ON g.gear_id = s.gear_id
+            WHERE s.is_active = 'Y'
+        )
+        GROUP BY category
+    """,
+    "rpt_penalty_totals": """
+        SELECT status, COUNT(*), IFNULL(SUM(amount), 0)
+        FROM Penalties
+        GROUP BY status
+    """,
+}
+
+
+def to_db_date(value):
+    """Store dates the way Oracle DATE holds them: to the second, as sortable text."""
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return value.replace(microsecond=0).isoformat(" ")
+
+
+def from_db_date(value):
+    return datetime.fromisoformat(value.decode() if isinstance(value, bytes) else value)
+
+
+sqlite3.register_adapter(datetime, to_db_date)
+sqlite3.register_adapter(date, to_db_date)
+sqlite3.register_converter("DATE", from_db_date)
+
+
+def seconds_sql(start, end):
+    """Whole seconds from ``start`` to ``end``; dates are stored to the second, so rounding only drops float noise."""
+    return f"CAST(ROUND((julianday({end}) - julianday({start})) * 86400) AS INTEGER)"
+
+
+def sysdate():
+    return datetime.now().replace(microsecond=0)
+
+
+def translate_error(e):
+    message = str(e)
+    match = re.match(r"ORA-(\d+)", message)
+    if match:
+        return DataError(int(match.group(1)), message)
+    if "UNIQUE constraint failed" in message:
+        return DataError(UNIQUE_VIOLATION, f"ORA-00001: unique constraint violated ({message})")
+    if "CHECK constraint failed" in message:
+        return DataError(CHECK_VIOLATION, f"ORA-02290: check constraint violated ({message})")
+    if "FOREIGN KEY constraint failed" in message:
+        return DataError(FK_VIOLATION, f"ORA-02291: integrity constraint violated ({message})")
+    if "NOT NULL constraint failed" in message:
+        return DataError(NOT_NULL_VIOLATION, f"ORA-01400: cannot insert NULL ({message})")
+    return DataError(0, message)
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose cursors report to ``tracer`` (see Driver.trace) once one is set."""
+    tracer = None
+
+    def cursor(self, *args):
+        cursor = super().cursor(*args)
+        return cursor if self.tracer is None else self.tracer.wrap(cursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+
+class SQLiteDriver(Driver):
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self.conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES,
+                                    isolation_level=None, check_same_thread=False, factory=TracedConnection)
+        self.lock = threading.RLock()
+        # In-memory text indexes, built by the first search: (index, how far it is synced)
+        self._gear_search = None
+        self._audit_search = None
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("CREATE TEMP TABLE search_hits (doc_id INTEGER PRIMARY KEY, score REAL)")
+        self.migrate()
+        new_summaries = not self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rpt_category_usage'").fetchone()
+        self.conn.executescript(SCHEMA)
+        for table in AUDITED_TABLES:
+            self.conn.executescript(audit_trigger_sql(table))
+        for table in CHANGE_TRACKED:
+            self.conn.executescript(change_trigger_sql(table))
+        for table in SUMMARIZED_TABLES:
+            self.conn.executescript(summary_trigger_sql(table))
+        if new_summaries:
+            # A file created before the summaries existed: build them from what is already there
+            self.refresh_reports()
+
+    def migrate(self):
+        """Add columns introduced since an existing database file was created, and redo changed indexes."""
+        for table in CHANGE_TRACKED:
+            columns = [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")]
+            if columns and "last_change" not in columns:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN last_change INTEGER DEFAULT 0")
+        for view in ("v_user_rentals", "v_user_subscriptions"):
+            if "last_change" in [row[1] for row in self.conn.execute(f"PRAGMA table_info({view})")]:
+                # Rentals and Subscriptions are no longer change-tracked; recreated without it by SCHEMA
+                self.conn.execute(f"DROP VIEW {view}")
+        summary_columns = [row[1] for row in self.conn.execute("PRAGMA table_info(rpt_category_usage)")]
+        if summary_columns and "active_subscriptions" not in summary_columns:
+            # Recreated by SCHEMA and rebuilt from the base tables like a new summary
+            self.conn.execute("DROP VIEW IF EXISTS v_report_utilization")
+            self.conn.execute("DROP TABLE rpt_category_usage")
+        config_columns = [row[1] for row in self.conn.execute("PRAGMA table_info(Audit_Config)")]
+        if config_columns and "archive_after_months" not in config_columns:
+            self.conn.execute("ALTER TABLE Audit_Config ADD COLUMN compress_after_months INTEGER DEFAULT 3")
+            self.conn.execute("ALTER TABLE Audit_Config ADD COLUMN archive_after_months INTEGER DEFAULT 24")
+        audit_sql = self.conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'Audit_Log'").fetchone()
+        if audit_sql and "AUTOINCREMENT" not in audit_sql[0]:
+            self.migrate_audit_log_ids()
+        if len(self.conn.execute("PRAGMA index_info(idx_subs_active)").fetchall()) > 2:
+            # end_date was dropped from it once lapsed subscriptions came to be expired in bulk
+            self.conn.execute("DROP INDEX idx_subs_active")
+
+    def migrate_audit_log_ids(self):
+        """Rebuild Audit_Log with AUTOINCREMENT, continuing after every id already used, archived ones included."""
+        with self.transaction() as cur:
+            cur.execute("""
+                CREATE TABLE Audit_Log_new (
+                    log_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id     INTEGER REFERENCES Users(user_id),
+                    table_name  TEXT,
+                    action      TEXT,
+                    timestamp   DATE DEFAULT (datetime('now', 'localtime')),
+                    details     TEXT
+                )
+            """)
+            cur.execute("INSERT INTO Audit_Log_new SELECT log_id, user_id, table_name, action, timestamp, details FROM Audit_Log")
+            used = cur.execute("SELECT COALESCE(MAX(log_id), 0) FROM Audit_Log").fetchone()[0]
+            if cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Audit_Archive'").fetchone():
+                used = max(used, cur.execute("SELECT COALESCE(MAX(log_id), 0) FROM Audit_Archive").fetchone()[0])
+            cur.execute("DELETE FROM sqlite_sequence WHERE name = 'Audit_Log_new'")
+            cur.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('Audit_Log_new', ?)", (used,))
+            cur.execute("DROP TABLE Audit_Log")
+            # Legacy rename leaves the triggers and views that name Audit_Log alone
+            # (its indexes are recreated by SCHEMA)
+            cur.execute("PRAGMA legacy_alter_table = ON")
+            cur.execute("ALTER TABLE Audit_Log_new RENAME TO Audit_Log")
+            cur.execute("PRAGMA legacy_alter_table = OFF")
+
+    def close(self):
+        self.conn.close()
+
+    def trace(self, tracer):
+        self.conn.tracer = tracer
+
+    @contextmanager
+    def transaction(self):
+        """One atomic unit of work, like a PL/SQL call followed by COMMIT."""
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except sqlite3.Error as e:
+                cursor.execute("ROLLBACK")
+                raise translate_error(e) from e
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            else:
+                cursor.execute("COMMIT")
+            finally:
+                cursor.close()
+
+    def fetch_all(self, query, params=()):
+        with self.lock:
+            try:
+                return self.conn.execute(query, params).fetchall()
+            except sqlite3.Error as e:
+                raise translate_error(e) from e
+
+    def fetch_one(self, query, params=()):
+        with self.lock:
+            try:
+                return self.conn.execute(query, params).fetchone()
+            except sqlite3.Error as e:
+                raise translate_error(e) from e
+
+    # Users (pkg_user_ops)
+    def register_user(self, name, email, phone, password, role="CUSTOMER"):
+        if not name or not email:
+            raise DataError(20014, "Name and email are required")
+        if not password:
+            raise DataError(20054, "Password is required")
+        if role not in ("ADMIN", "CUSTOMER"):
+            raise DataError(20055, "Invalid role")
+        with self.transaction() as cur:
+            cur.execute("INSERT INTO Users (name, email, phone, password_hash, role) VALUES (?, ?, ?, ?, ?)",
+                        (name, email, phone, password, role))
+
+    def deactivate_user(self, user_id):
+        with self.transaction() as cur:
+            cur.execute("UPDATE Users SET status = 'INACTIVE' WHERE user_id = ?", (user_id,))
+            if cur.rowcount == 0:
+                raise DataError(20015, "User does not exist")
+
+    def get_user_info(self, user_id):
+        row = self.fetch_one("SELECT name, email, phone, status, role, created_at FROM Users WHERE user_id = ?",
+                             (user_id,))
+        if not row:
+            return "User not found"
+        name, email, phone, status, role, created_at = row
+        return (f"Name: {name}, Email: {email}, Phone: {phone or 'N/A'}, Status: {status}, "
+                f"Role: {role}, Created: {created_at:%Y-%m-%d}")
+
+    def verify_user(self, email, password):
+        row = self.fetch_one("SELECT user_id, password_hash FROM Users WHERE email = ?", (email,))
+        if row and row[1] == password:
+            return row[0]
+        return 0
+
+    def get_user_role(self, user_id):
+        row = self.fetch_one("SELECT role FROM Users WHERE user_id = ?", (user_id,))
+        return row[0] if row else None
+
+    # Gear (pkg_gear_ops)
+    def list_available_gear(self):
+        return self.fetch_all("SELECT gear_id, name, category, brand, rent_price_per_day, sub_price_per_month, stock FROM v_available_gear")
+
+    def gear_change_token(self):
+        return self.fetch_one("SELECT MAX(last_change) FROM Gear")[0]
+
+    def add_gear(self, user_id, name, category, brand, rent_price, sub_price, stock):
+        with self.transaction() as cur:
+            self._check_admin(cur, user_id)
+            if not name:
+                raise DataError(20016, "Gear name is required")
+            if any(value is not None and value < 0 for value in (rent_price, sub_price, stock)):
+                raise DataError(20017, "Prices and stock cannot be negative")
+            cur.execute("""
+                INSERT INTO Gear (name, category, brand, rent_price_per_day, sub_price_per_month, stock)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (name, category, brand, rent_price, sub_price, stock))
+
+    def _check_admin(self, cur, user_id):
+        row = cur.execute("SELECT role FROM Users WHERE user_id = ?", (user_id,)).fetchone()
+        if not row:
+            raise DataError(20015, "User does not exist")
+        if row[0] != "ADMIN":
+            raise DataError(20052, "Only admins can add gear")
+
+    def import_gear(self, user_id, rows):
+        with self.transaction() as cur:
+            self._check_admin(cur, user_id)
+            # sqlite3 has no batch errors, but a failed INSERT only undoes itself
+            errors = []
+            for index, row in enumerate(rows):
+                try:
+                    cur.execute("""
+                        INSERT INTO Gear (name, category, brand, rent_price_per_day, sub_price_per_month, stock)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, row)
+                except sqlite3.Error as e:
+                    errors.append((index, translate_error(e)))
+            return errors
+
+    def update_stock(self, gear_id, qty):
+        with self.transaction() as cur:
+            self._update_stock(cur, gear_id, qty)
+
+    def _update_stock(self, cur, gear_id, qty):
+        cur.execute("UPDATE Gear SET stock = stock + ? WHERE gear_id = ?", (qty, gear_id))
+        if cur.rowcount == 0:
+            raise DataError(20018, "Gear does not exist")
+
+    # Rentals (pkg_rental_ops)
+    def list_rentals(self, user_id=None):
+        query = """
+            SELECT rent_id, user_name, gear_name, start_date, end_date, return_date, status, condition_returned
+            FROM v_user_rentals
+        """
+        params = ()
+        if user_id is not None:
+            query += " WHERE user_id = ? AND status = 'RENTED'"
+            params = (user_id,)
+        return self.fetch_all(query, params)
+
+    def rent_gear(self, user_id, gear_id, start_date, end_date):
+        # Same order as the package: fail fast on missing or sold-out gear,
+        # insert the rental, and take the unit with the guarded UPDATE last
+        with self.transaction() as cur:
+            row = cur.execute("SELECT stock FROM Gear WHERE gear_id = ?", (gear_id,)).fetchone()
+            if not row or row[0] <= 0:
+                self._raise_not_rentable(cur, user_id, gear_id)
+            try:
+                cur.execute("INSERT INTO Rentals (user_id, gear_id, start_date, end_date) VALUES (?, ?, ?, ?)",
+                            (user_id, gear_id, start_date, end_date))
+            except sqlite3.IntegrityError as e:
+                if "FOREIGN KEY" not in str(e):
+                    raise
+                self._raise_not_rentable(cur, user_id, gear_id)
+            cur.execute("UPDATE Gear SET stock = stock - 1 WHERE gear_id = ? AND stock > 0", (gear_id,))
+            if cur.rowcount == 0:
+                self._raise_not_rentable(cur, user_id, gear_id)
+
+    def _raise_not_rentable(self, cur, user_id, gear_id):
+        if not cur.execute("SELECT 1 FROM Users WHERE user_id = ?", (user_id,)).fetchone():
+            raise DataError(20021, "User does not exist")
+        if not cur.execute("SELECT 1 FROM Gear WHERE gear_id = ?", (gear_id,)).fetchone():
+            raise DataError(20022, "Gear does not exist")
+        raise DataError(20023, "Gear not available for rent")
+
+    def rent_gear_batch(self, user_id, items):
+        # Same checks, in the same order, as pkg_rental_ops.rent_gear_batch
+        if not items:
+            return
+        with self.transaction() as cur:
+            if not cur.execute("SELECT 1 FROM Users WHERE user_id = ?", (user_id,)).fetchone():
+                raise DataError(20021, "User does not exist")
+            gear_ids = sorted({gear_id for gear_id, _, _ in items})
+            stock = dict(cur.execute(f"SELECT gear_id, stock FROM Gear WHERE gear_id IN ({', '.join('?' * len(gear_ids))})",
+                                     gear_ids).fetchall())
+            taken = dict.fromkeys(stock, 0)
+            active = cur.execute("SELECT COUNT(*) FROM Rentals WHERE user_id = ? AND status = 'RENTED'",
+                                 (user_id,)).fetchone()[0]
+            accepted, errors = set(), {}
+            for i, (gear_id, start_date, end_date) in enumerate(items):
+                if gear_id not in stock:
+                    errors[i] = DataError(20022, "Gear does not exist")
+                elif taken[gear_id] >= stock[gear_id]:
+                    errors[i] = DataError(20023, "Gear not available for rent")
+                elif active >= 3:
+                    errors[i] = DataError(20053, "User has reached rental limit of 3 active rentals")
+                elif start_date is None:
+                    errors[i] = DataError(NOT_NULL_VIOLATION, "cannot insert NULL into start_date")
+                elif end_date is not None and end_date < start_date:
+                    errors[i] = DataError(CHECK_VIOLATION, "check constraint (CHK_DATES) violated")
+                elif (gear_id, start_date) in accepted or cur.execute(
+                        "SELECT 1 FROM Rentals WHERE user_id = ? AND gear_id = ? AND start_date = ?",
+                        (user_id, gear_id, start_date)).fetchone():
+                    errors[i] = DataError(UNIQUE_VIOLATION, "unique constraint (UNIQ_RENTAL_ONCE) violated")
+                else:
+                    accepted.add((gear_id, start_date))
+                    taken[gear_id] += 1
+                    active += 1
+            if errors:
+                raise BatchError(errors, len(items))
+            cur.executemany("INSERT INTO Rentals (user_id, gear_id, start_date, end_date) VALUES (?, ?, ?, ?)",
+                            [(user_id, gear_id, start_date, end_date) for gear_id, start_date, end_date in items])
+            # Stock last, guarded like rent_gear; a shortfall rolls the inserts back with the transaction
+            short = set()
+            for gear_id, count in taken.items():
+                cur.execute("UPDATE Gear SET stock = stock - ? WHERE gear_id = ? AND stock >= ?", (count, gear_id, count))
+                if cur.rowcount == 0:
+                    short.add(gear_id)
+            if short:
+                raise BatchError({i: DataError(20023, "Gear not available for rent")
+                                  for i, (gear_id, _, _) in enumerate(items) if gear_id in short}, len(items))
+
+    def return_gear(self, rent_id, condition, return_date=None):
+        with self.transaction() as cur:
+            if condition not in ("GOOD", "DAMAGED", "BROKEN"):
+                if not cur.execute("SELECT 1 FROM Rentals WHERE rent_id = ?", (rent_id,)).fetchone():
+                    raise DataError(20024, "Rental does not exist")
+                raise DataError(20056, "Invalid condition; must be GOOD, DAMAGED, or BROKEN")
+            row = cur.execute("""
+                UPDATE Rentals SET return_date = ?, status = 'RETURNED', condition_returned = ?
+                WHERE rent_id = ?
+                RETURNING gear_id
+            """, (return_date or sysdate(), condition, rent_id)).fetchone()
+            if not row:
+                raise DataError(20024, "Rental does not exist")
+            if condition in ("DAMAGED", "BROKEN"):
+                self._assign_penalty(cur, rent_id, f"Gear returned in {condition.lower()} condition")
+            cur.execute("UPDATE Gear SET stock = stock + 1 WHERE gear_id = ?", (row[0],))
+
+    def calc_rental_charge(self, rent_id):
+        rows = self.rental_billing(rent_ids=[rent_id])
+        if not rows:
+            raise DataError(20025, "Rental does not exist")
+        return rows[0][2]
+
+    # Subscriptions (pkg_subscription_service)
+    def list_subscriptions(self, user_id=None):
+        query = "SELECT sub_id, user_name, gear_name, start_date, end_date, is_active FROM v_user_subscriptions"
+        params = ()
+        if user_id is not None:
+            query += " WHERE user_id = ? AND is_active = 'Y'"
+            params = (user_id,)
+        return self.fetch_all(query, params)
+
+    def subscribe_gear(self, user_id, gear_id, start_date, end_date):
+        with self.transaction() as cur:
+            if not cur.execute("SELECT 1 FROM Users WHERE user_id = ?", (user_id,)).fetchone():
+                raise DataError(20026, "User does not exist")
+            if not cur.execute("SELECT 1 FROM Gear WHERE gear_id = ?", (gear_id,)).fetchone():
+                raise DataError(20027, "Gear does not exist")
+            if end_date < start_date:
+                raise DataError(20028, "End date cannot be before start date")
+            if self._is_active_sub(cur, user_id, gear_id):
+                raise DataError(20029, "User already has an active subscription for this gear")
+            cur.execute("""
+                INSERT INTO Subscriptions (user_id, gear_id, start_date, end_date, is_active)
+                VALUES (?, ?, ?, ?, 'Y')
+            """, (user_id, gear_id, start_date, end_date))
+
+    def cancel_subscription(self, sub_id):
+        with self.transaction() as cur:
+            cur.execute("UPDATE Subscriptions SET is_active = 'N' WHERE sub_id = ? AND IFNULL(is_active, 'Y') != 'N'",
+                        (sub_id,))
+            if cur.rowcount == 0:
+                if not cur.execute("SELECT 1 FROM Subscriptions WHERE sub_id = ?", (sub_id,)).fetchone():
+                    raise DataError(20030, "Subscription does not exist")
+                raise DataError(20063, "Subscription is already inactive")
+
+    def expire_subscriptions(self):
+        with self.transaction() as cur:
+            # Reads only the active rows, through idx_subs_expiry
+            cur.execute("UPDATE Subscriptions SET is_active = 'N' WHERE is_active = 'Y' AND end_date < ?", (sysdate(),))
+            expired = cur.rowcount
+        if expired:
+            self.log_action(None, "Subscriptions", "EXPIRY", f"{expired} lapsed subscriptions deactivated")
+        return expired
+
+    def _is_active_sub(self, cur, user_id, gear_id):
+        return cur.execute("""
+            SELECT 1 FROM Subscriptions
+            WHERE user_id = ? AND gear_id = ? AND is_active = 'Y' AND end_date >= ?
+        """, (user_id, gear_id, sysdate())).fetchone() is not None
+
+    def calc_subscription_charge(self, sub_id):
+        rows = self.subscription_billing(sub_ids=[sub_id])
+        return rows[0][2] if rows else None
+
+    # Payments (pkg_payment_gateway)
+    def list_payments(self, user_id=None):
+        query = "SELECT payment_id, user_id, amount, payment_date, type, ref_id FROM Payments"
+        params = ()
+        if user_id is not None:
+            query += " WHERE user_id = ?"
+            params = (user_id,)
+        return self.fetch_all(query, params)
+
+    def make_payment(self, user_id, pay_type, ref_id, amount):
+        with self.transaction() as cur:
+            self._make_payment(cur, user_id, pay_type, ref_id, amount)
+
+    def _make_payment(self, cur, user_id, pay_type, ref_id, amount):
+        cur.execute("""
+            INSERT INTO Payments (user_id, amount, type, ref_id)
+            SELECT :user_id, :amount, :type, :ref_id
+            FROM Users
+            WHERE user_id = :user_id
+              AND IFNULL(:amount, 0) >= 0
+              AND (   (:type = 'RENTAL' AND EXISTS (SELECT 1 FROM Rentals WHERE rent_id = :ref_id))
+                   OR (:type = 'SUBSCRIPTION' AND EXISTS (SELECT 1 FROM Subscriptions WHERE sub_id = :ref_id))
+                   OR (:type = 'PENALTY' AND EXISTS (SELECT 1 FROM Penalties WHERE penalty_id = :ref_id)))
+              AND NOT EXISTS (SELECT 1 FROM Payments WHERE type = :type AND ref_id = :ref_id)
+        """, {"user_id": user_id, "amount": amount, "type": pay_type, "ref_id": ref_id})
+        if cur.rowcount > 0:
+            return
+        if not cur.execute("SELECT 1 FROM Users WHERE user_id = ?", (user_id,)).fetchone():
+            raise DataError(20031, "User does not exist")
+        if amount < 0:
+            raise DataError(20032, "Payment amount cannot be negative")
+        if pay_type not in ("RENTAL", "SUBSCRIPTION", "PENALTY"):
+            raise DataError(20033, "Invalid payment type; must be RENTAL, SUBSCRIPTION, or PENALTY")
+        if not self._validate_ref(cur, pay_type, ref_id):
+            raise DataError(20034, "Invalid reference for the given payment type")
+        raise DataError(20062, "Payment already made for this reference")
+
+    def _validate_ref(self, cur, pay_type, ref_id):
+        lookups = {
+            "RENTAL": "SELECT 1 FROM Rentals WHERE rent_id = ?",
+            "SUBSCRIPTION": "SELECT 1 FROM Subscriptions WHERE sub_id = ?",
+            "PENALTY": "SELECT 1 FROM Penalties WHERE penalty_id = ?",
+        }
+        if pay_type not in lookups:
+            return False
+        return cur.execute(lookups[pay_type], (ref_id,)).fetchone() is not None
+
+    # Penalties (pkg_penalty_center)
+    def list_penalties(self, user_id=None):
+        if user_id is None:
+            return self.fetch_all("SELECT penalty_id, rent_id, amount, reason, status FROM Penalties")
+        return self.fetch_all("""
+            SELECT p.penalty_id, p.rent_id, p.amount, p.reason, p.status
+            FROM Penalties p
+            JOIN Rentals r ON p.rent_id = r.rent_id
+            WHERE r.user_id = ?
+        """, (user_id,))
+
+    def assign_penalty(self, rent_id, reason):
+        with self.transaction() as cur:
+            self._assign_penalty(cur, rent_id, reason)
+
+    def _assign_penalty(self, cur, rent_id, reason):
+        # Status and amount come from the same row read
+        rows = self._rental_billing(cur, "r.rent_id = :rent_id", {"rent_id": rent_id})
+        if not rows:
+            raise DataError(20034, "Rental does not exist")
+        status, condition, amount = rows[0][7], rows[0][8], rows[0][3]
+        if status != "RENTED" and condition not in ("DAMAGED", "BROKEN"):
+            raise DataError(20036, "Rental is not overdue or has already been returned")
+        if (amount or 0) <= 0 and condition not in ("DAMAGED", "BROKEN"):
+            raise DataError(20035, "No penalty applicable")
+        cur.execute("INSERT INTO Penalties (rent_id, amount, reason) VALUES (?, ?, ?)", (rent_id, amount, reason))
+
+    def resolve_penalty(self, penalty_id):
+        with self.transaction() as cur:
+            cur.execute("UPDATE Penalties SET status = 'PAID' WHERE penalty_id = ? AND IFNULL(status, 'PENDING') != 'PAID'",
+                        (penalty_id,))
+            if cur.rowcount == 0:
+                if not cur.execute("SELECT 1 FROM Penalties WHERE penalty_id = ?", (penalty_id,)).fetchone():
+                    raise DataError(20037, "Penalty does not exist")
+                raise DataError(20061, "Penalty has already been resolved and paid")
+
+    def get_penalty_amount(self, penalty_id):
+        row = self.fetch_one("SELECT amount FROM Penalties WHERE penalty_id = ?", (penalty_id,))
+        return row[0] if row else None
+
+    def calc_penalty_amt(self, rent_id):
+        rows = self.rental_billing(rent_ids=[rent_id])
+        if not rows:
+            raise DataError(20038, "Rental does not exist")
+        return rows[0][3]
+
+    def sweep_overdue(self):
+        started = time.perf_counter()
+        with self.transaction() as cur:
+            # Overdue rentals come off idx_rentals_overdue and are priced together
+            overdue = [(row[0], row[3]) for row in self._rental_billing(
+                cur, "r.status = 'RENTED' AND r.end_date < :now", {}) if row[3] and row[3] > 0]
+            # A rental can carry more than one overdue penalty (e.g. one assigned by hand)
+            existing = {}
+            for penalty_id, rent_id, status, amount in cur.execute("""
+                SELECT p.penalty_id, p.rent_id, p.status, p.amount
+                FROM Penalties p
+                JOIN Rentals r ON p.rent_id = r.rent_id
+                WHERE r.status = 'RENTED' AND r.end_date < :now AND p.reason = :reason
+            """, {"now": sysdate(), "reason": OVERDUE_REASON}):
+                existing.setdefault(rent_id, []).append((penalty_id, status, amount))
+            # MERGE, split in two: insert the missing penalties, move every pending match on
+            inserts = [(rent_id, amount, OVERDUE_REASON) for rent_id, amount in overdue if rent_id not in existing]
+            updates = [(amount, penalty_id) for rent_id, amount in overdue
+                       for penalty_id, status, current in existing.get(rent_id, ())
+                       if status == "PENDING" and current != amount]
+            cur.executemany("INSERT INTO Penalties (rent_id, amount, reason) VALUES (?, ?, ?)", inserts)
+            cur.executemany("UPDATE Penalties SET amount = ? WHERE penalty_id = ?", updates)
+        processed, elapsed = len(inserts) + len(updates), time.perf_counter() - started
+        self.log_action(None, "Penalties", "OVERDUE SWEEP",
+                        f"{processed} overdue penalties assessed or updated in {elapsed:.2f}s")
+        return processed, elapsed
+
+    # Billing (v_rental_billing, v_subscription_billing)
+    def rental_billing(self, user_id=None, rent_ids=None):
+        where, params = self._billing_filter("r", "rent_id", user_id, rent_ids)
+        with self.lock:
+            cur = self.conn.cursor()
+            try:
+                return [row[:7] for row in self._rental_billing(cur, where, params)]
+            except sqlite3.Error as e:
+                raise translate_error(e) from e
+            finally:
+                cur.close()
+
+    def _rental_billing(self, cur, where, params):
+        """v_rental_billing rows, followed by status and condition_returned.
+
+        One query fetches the inputs for every rental, with each period as
+        whole seconds, and dal.billing prices them all at once.
+        """
+        rows = cur.execute(f"""
+            SELECT r.rent_id, r.user_id, {seconds_sql("r.start_date", "COALESCE(r.return_date, r.end_date, :now)")},
+                   CASE WHEN r.end_date IS NOT NULL
+                        THEN {seconds_sql("r.end_date", "COALESCE(r.return_date, :now)")} END,
+                   g.rent_price_per_day, r.status, r.condition_returned, p.payment_id, IFNULL(p.amount, 0),
+                   IFNULL(pen.pending, 0)
+            FROM Rentals r
+            JOIN Gear g ON r.gear_id = g.gear_id
+            LEFT JOIN Payments p ON p.type = 'RENTAL' AND p.ref_id = r.rent_id
+            LEFT JOIN (
+                SELECT rent_id, SUM(amount) AS pending
+                FROM Penalties
+                WHERE IFNULL(status, 'PENDING') != 'PAID'
+                GROUP BY rent_id
+            ) pen ON pen.rent_id = r.rent_id
+            WHERE {where}
+            ORDER BY r.rent_id
+        """, {**params, "now": sysdate()}).fetchall()
+        if not rows:
+            return []
+        rent_ids, user_ids, rented, overdue, prices, statuses, conditions, payment_ids, paid, pending = zip(*rows)
+        charges = rental_charges(rented, prices)
+        penalties = penalty_amounts(overdue, prices, conditions)
+        due = [(charge if payment_id is None else 0) + owed if charge is not None else None
+               for charge, payment_id, owed in zip(charges, payment_ids, pending)]
+        return list(zip(rent_ids, user_ids, charges, penalties, paid, pending, due, statuses, conditions))
+
+    def subscription_billing(self, user_id=None, sub_ids=None):
+        where, params = self._billing_filter("s", "sub_id", user_id, sub_ids)
+        rows = self.fetch_all(f"""
+            SELECT s.sub_id, s.user_id, {seconds_sql("s.start_date", "COALESCE(s.end_date, :now)")},
+                   g.rent_price_per_day, p.payment_id, IFNULL(p.amount, 0)
+            FROM Subscriptions s
+            JOIN Gear g ON s.gear_id = g.gear_id
+            LEFT JOIN Payments p ON p.type = 'SUBSCRIPTION' AND p.ref_id = s.sub_id
+            WHERE {where}
+            ORDER BY s.sub_id
+        """, {**params, "now": sysdate()})
+        if not rows:
+            return []
+        sub_ids, user_ids, used, prices, payment_ids, paid = zip(*rows)
+        charges = subscription_charges(used, prices)
+        due = [charge if payment_id is None else 0 for charge, payment_id in zip(charges, payment_ids)]
+        return list(zip(sub_ids, user_ids, charges, paid, due))
+
+    def _billing_filter(self, alias, key, user_id, ids):
+        where, params = ["1 = 1"], {}
+        if user_id is not None:
+            where.append(f"{alias}.user_id = :user_id")
+            params["user_id"] = user_id
+        if ids is not None:
+            # Any number of ids in one bind, clear of SQLite's limit on bind variables
+            where.append(f"{alias}.{key} IN (SELECT value FROM json_each(:ids))")
+            params["ids"] = json.dumps(list(ids))
+        return " AND ".join(where), params
+
+    # Audit (pkg_audit_trail)
+    def log_action(self, user_id, table_name, action, details):
+        with self.transaction() as cur:
+            for target, condition in (("Audit_Log", f"NOT {AUDIT_ASYNC}"), ("Audit_Queue", AUDIT_ASYNC)):
+                cur.execute(f"INSERT INTO {target} (user_id, table_name, action, details) SELECT ?, ?, ?, ? WHERE {condition}",
+                            (user_id, table_name, action, details))
+
+    def set_audit_async(self, enabled):
+        with self.transaction() as cur:
+            cur.execute("UPDATE Audit_Config SET async_enabled = ? WHERE config_id = 1", ("Y" if enabled else "N",))
+
+    def drain_audit(self, batch_size=AUDIT_DRAIN_BATCH):
+        with self.transaction() as cur:
+            rows = cur.execute("""
+                SELECT log_id, user_id, table_name, action, timestamp, details
+                FROM Audit_Queue ORDER BY log_id LIMIT ?
+            """, (batch_size,)).fetchall()
+            if rows:
+                # Audit_Log assigns its own log_id; queue order is kept
+                cur.executemany("INSERT INTO Audit_Log (user_id, table_name, action, timestamp, details) VALUES (?, ?, ?, ?, ?)",
+                                [row[1:] for row in rows])
+                cur.execute("DELETE FROM Audit_Queue WHERE log_id <= ?", (rows[-1][0],))
+            return len(rows)
+
+    def audit_lag(self):
+        return self.fetch_one("SELECT pending, lag_seconds FROM v_audit_queue_lag")
+
+    def audit_page(self, table_name=None, start_date=None, end_date=None, before_id=None, limit=AUDIT_PAGE_SIZE):
+        return self.fetch_all(*audit_query(table_name, start_date, end_date, before_id, limit))
+
+    def set_audit_retention(self, compress_after_months=None, archive_after_months=None):
+        with self.transaction() as cur:
+            cur.execute("""
+                UPDATE Audit_Config
+                SET compress_after_months = IFNULL(?, compress_after_months),
+                    archive_after_months = IFNULL(?, archive_after_months)
+                WHERE config_id = 1
+            """, (compress_after_months, archive_after_months))
+
+    def apply_audit_retention(self):
+        # No partitions or table compression here: archiving moves the rows of
+        # every month past the cutoff, found through idx_audit_timestamp
+        with self.transaction() as cur:
+            months = cur.execute("SELECT archive_after_months FROM Audit_Config WHERE config_id = 1").fetchone()[0]
+            first = sysdate().replace(day=1, hour=0, minute=0, second=0)
+            cutoff = first.replace(year=first.year + (first.month - 1 - months) // 12,
+                                   month=(first.month - 1 - months) % 12 + 1)
+            archived = cur.execute("SELECT COUNT(DISTINCT substr(timestamp, 1, 7)) FROM Audit_Log WHERE timestamp < ?",
+                                   (cutoff,)).fetchone()[0]
+            cur.execute("INSERT INTO Audit_Archive SELECT * FROM Audit_Log WHERE timestamp < ?", (cutoff,))
+            cur.execute("DELETE FROM Audit_Log WHERE timestamp < ?", (cutoff,))
+        if archived:
+            with self.lock:
+                if self._audit_search is not None:
+                    index = self._audit_search[0]
+                    for log_id in [doc for doc, (_, (_, stamp)) in index.docs.items() if stamp < cutoff]:
+                        index.remove(log_id)
+            self.log_action(None, "Audit_Log", "RETENTION", f"0 months compressed, {archived} months archived")
+        return 0, archived
+
+    # Search (dal/search.py inverted indexes standing in for Oracle Text)
+    def _gear_index(self):
+        """The gear text index, with only the gear changed since the last search re-indexed. Hold the lock."""
+        index, mark = self._gear_search or (InvertedIndex(), -1)
+        for last_change, visible, *row in self.conn.execute(GEAR_CHANGES, (mark,)):
+            if visible:
+                index.add(row[0], " ".join(str(value) for value in row[1:4] if value is not None), tuple(row))
+            else:
+                index.remove(row[0])
+            mark = max(mark, last_change)
+        self._gear_search = (index, mark)
+        return index
+
+    def _audit_index(self):
+        """The audit details index, with the entries logged since the last search added. Hold the lock."""
+        index, last_id = self._audit_search or (InvertedIndex(), 0)
+        # Audit_Log is append-only (retention removes what it archives), so
+        # only entries past the last one indexed need reading
+        for log_id, entry_table, stamp, details in self.conn.execute(
+                "SELECT log_id, table_name, timestamp, details FROM Audit_Log WHERE log_id > ? ORDER BY log_id",
+                (last_id,)):
+            index.add(log_id, details, (entry_table, stamp or datetime.min))
+            last_id = log_id
+        self._audit_search = (index, last_id)
+        return index
+
+    # Grids
+    def grid_page(self, source, filters=None, sort=None, descending=False, offset=0, limit=GRID_PAGE_SIZE,
+                  after=None, user_id=None, search=None):
+        key = GRID_SOURCES[source][1]
+
+        def match(column, search_words):
+            # The matches and their scores go to a temp table the query joins against
+            index = self._gear_index() if source == "gear" else self._audit_index()
+            self.conn.execute("DELETE FROM temp.search_hits")
+            self.conn.executemany("INSERT INTO temp.search_hits (doc_id, score) VALUES (?, ?)",
+                                  [(doc_id, score) for doc_id, score, _ in index.search(search_words)])
+            condition, score = GRID_MATCH["sqlite"]
+            return condition.format(key=key), score.format(key=key), {}
+
+        with self.lock:
+            query, params = grid_query(source, filters, sort, descending, user_id, search, match, after)
+            return self.fetch_all(f"{query} {GRID_PAGING['sqlite']}", {"offset": offset, **params, "limit": limit})
+
+    # Export
+    def load_rows(self, table, columns, rows):
+        with self.transaction() as cur:
+            cur.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows)
+
+    def export_rows(self, source, start_date=None, end_date=None, after_id=None, batch_size=EXPORT_BATCH):
+        # Keyset batches rather than one open cursor, so the connection lock is
+        # only held while a batch is read and the GUI's own calls can run in between
+        key_index = EXPORT_SOURCES[source][3].index(EXPORT_SOURCES[source][1])
+        while True:
+            query, params = export_query(source, start_date, end_date, after_id)
+            rows = self.fetch_all(f"{query} LIMIT :batch_size", {**params, "batch_size": batch_size})
+            if not rows:
+                break
+            yield rows
+            after_id = rows[-1][key_index]
+
+    # Reports (pkg_reports)
+    def report(self, name):
+        return self.fetch_all(report_query(name))
+
+    def refresh_reports(self):
+        # The triggers already keep the summaries current, so this is a complete
+        # rebuild, for repairing them rather than for routine use
+        with self.transaction() as cur:
+            for table, query in REPORT_REBUILDS.items():
+                columns = [row[1] for row in cur.execute(f"PRAGMA table_info({table})")]
+                cur.execute(f"DELETE FROM {table}")
+                cur.execute(f"INSERT INTO {table} ({', '.join(columns)}) {query}")
+
+
+def audit_query(table_name=None, start_date=None, end_date=None, before_id=None, limit=AUDIT_PAGE_SIZE):
+    """Build the SQL and named binds behind :meth:`SQLiteDriver.audit_page`.
+
+    Only the filters actually given end up in the WHERE clause, so each one can
+    use its index instead of being hidden behind ``COALESCE(?, column)``. Rows
+    come in (timestamp, log_id) order, like get_audit_log's on Oracle.
+    """
+    where, params = [], {"limit": limit}
+    if table_name is not None:
+        where.append("table_name = :table_name")
+        params["table_name"] = table_name
+    if start_date is not None:
+        where.append("timestamp >= :start_date")
+        params["start_date"] = start_date
+    if end_date is not None:
+        where.append("timestamp <= :end_date")
+        params["end_date"] = end_date
+    if before_id is not None:
+        where.append("(timestamp, log_id) < (SELECT timestamp, log_id FROM Audit_Log WHERE log_id = :before_id)")
+        params["before_id"] = before_id
+    query = "SELECT log_id, user_id, table_name, action, timestamp, details FROM Audit_Log"
+    if where:
+        query += f" WHERE {' AND '.join(where)}"
+    return query + " ORDER BY timestamp DESC, log_id DESC LIMIT :limit", params
+
@@ -0,0 +1,439 @@
+"""Synthetic data generator: users, gear, rentals, subscriptions, payments and penalties at scale.
+
+Builds a realistic history for benchmarks and capacity planning. Activity
+grows over ``--months`` up to ``--as-of``. Customers sign up in id order
+over the first half of the period, most of them early on, and only act once
+they have signed up. A few customers and a few items account for most
+rentals (Pareto and Zipf weights). Rental lengths, late returns and damage
+follow fixed mixes. Stock is sized so the catalog can carry ``--rentals``
+at the busiest time. The same ``--seed`` loaded into an empty schema gives
+the same rows every time.
+
+Every rule the application enforces holds for the generated rows:
+
+* Rental and subscription start times never repeat, so ``uniq_rental_once``
+  and ``uniq_sub_once`` hold.
+* At every moment of the history, a customer holds at most three rentals
+  (``trg_rental_limit``) and an item has no more rentals out than its
+  capacity. A rental that rent_gear would have refused is drawn again with
+  another customer and item, and moved a little later if nobody can take
+  it yet, so exactly ``--rentals`` are made unless the last ones would move
+  past the as-of date.
+* A rental whose return would fall after the as-of date is still out. It is
+  only generated if its customer is active. Each item's stock ends up at its
+  capacity minus the rentals still out.
+* Payments reference rentals, subscriptions and penalties that exist
+  (``trg_check_payment_ref``), one payment per reference. Amounts follow
+  the dal.billing rules that the billing views also use.
+* Penalties follow pkg_penalty_center. Late returns carry an "Overdue rental"
+  penalty, and damaged or broken returns carry a damage penalty. Rentals
+  still out past their end date carry a pending overdue penalty, as the
+  sweep would assign.
+* A subscription is active only while it runs, and a user holds at most
+  one active subscription per item.
+
+Rows are bulk-loaded through ``Driver.load_rows``, ``--batch-size`` rows per
+array DML call and commit, so the audit, rental-limit and summary
+triggers fire as they do in production. Direct-path inserts (APPEND_VALUES)
+are not used: Oracle silently downgrades them to conventional inserts on
+tables with triggers or foreign keys, which is every table here. The
+triggers stamp their audit entries with the load time.
+``--audit-history`` adds entries spread back over the whole period, so
+partitioning and retention see realistic months.
+
+    python datagen.py --users 100000 --gear 5000 --rentals 10000000 --subscriptions 500000
+    python datagen.py --backend sqlite --path big.db --rentals 1000000 --audit-history 2000000
+"""
+import argparse
+import bisect
+import heapq
+import itertools
+import math
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from dal import DataError, open_driver
+from dal.base import OVERDUE_REASON
+from dal.billing import DAY, penalty_amount, rental_charges, subscription_charges
+
+BATCH = 10_000
+MAX_ACTIVE_RENTALS = 3  # trg_rental_limit
+# Draws of a rental's customer and item before its start is moved on
+REDRAWS = 100
+
+# category: (brands, daily price range)
+CATEGORIES = {
+    "Camera": (("Canon", "Nikon", "Sony", "Fujifilm", "Panasonic"), (25, 90)),
+    "Lens": (("Canon", "Nikon", "Sony", "Sigma", "Tamron"), (10, 60)),
+    "Laptop": (("Apple", "Dell", "Lenovo", "HP", "Asus"), (20, 80)),
+    "Drone": (("DJI", "Autel", "Parrot", "Skydio"), (30, 120)),
+    "Audio": (("Rode", "Shure", "Zoom", "Sennheiser"), (8, 40)),
+    "Lighting": (("Godox", "Aputure", "Profoto", "Nanlite"), (10, 50)),
+    "Tablet": (("Apple", "Samsung", "Microsoft"), (12, 45)),
+    "VR Headset": (("Meta", "HTC", "Valve", "Sony"), (15, 50)),
+}
+MODELS = ("Pro", "Max", "Mini", "X", "S", "Air", "Ultra", "Lite", "II", "III")
+FIRST_NAMES = ("James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+               "Wei", "Aisha", "Carlos", "Priya", "Kenji", "Fatima", "Lucas", "Olga", "Mateo", "Amara")
+LAST_NAMES = ("Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Martinez", "Lopez",
+              "Chen", "Khan", "Silva", "Patel", "Tanaka", "Okafor", "Novak", "Cohen", "Rossi", "Murphy")
+
+# (value, weight) mixes
+RENTAL_DAYS = ((1, 20), (2, 25), (3, 18), (4, 12), (5, 8), (7, 8), (10, 5), (14, 4))
+CAPACITIES = ((1, 2), (2, 2), (3, 1), (4, 1), (5, 1), (8, 1), (10, 1), (20, 1))
+SUBSCRIPTION_MONTHS = ((1, 50), (3, 30), (6, 15), (12, 5))
+CONDITIONS = (("GOOD", 95), ("DAMAGED", 4), ("BROKEN", 1))
+AUDITED = (("Rentals", "Rental", 40), ("Payments", "Payment", 25), ("Subscriptions", "Subscription", 10),
+           ("Users", "User", 10), ("Penalties", "Penalty", 8), ("Gear", "Gear", 7))
+AUDIT_ACTIONS = (("INSERT", 60), ("UPDATE", 35), ("DELETE", 5))
+
+# Share of returns that come back on time, late, and very late
+ON_TIME, LATE = 0.85, 0.97
+PAID_RENTALS = 0.97
+PAID_PENALTIES = 0.85
+PAID_SUBSCRIPTIONS = 0.95
+CANCELLED_SUBSCRIPTIONS = 0.10
+INACTIVE_USERS = 0.03
+# Activity at the end of the period relative to its start is 1 + GROWTH
+GROWTH = 1.0
+
+
+def mix(pairs):
+    values, weights = zip(*pairs)
+    return values, list(itertools.accumulate(weights))
+
+
+def grown(u):
+    """Where fraction ``u`` of the activity falls in the period, with the rate growing linearly by GROWTH."""
+    return (math.sqrt(1 + 2 * GROWTH * (1 + GROWTH / 2) * u) - 1) / GROWTH
+
+
+class Generator:
+    def __init__(self, db, seed=1, months=24, as_of=None, batch_size=BATCH):
+        self.db = db
+        self.rng = random.Random(seed)
+        self.as_of = as_of or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.start = self.as_of - timedelta(days=30 * months)
+        self.batch_size = batch_size
+        # table -> [rows, seconds spent loading]
+        self.stats = {}
+        # (user_id, active), (gear_id, daily price, capacity), in id order
+        self.users = []
+        self.gear = []
+        # created_at of each of self.users, increasing like the ids
+        self.created = []
+        self.active_rentals = Counter()
+
+    def load(self, table, columns, rows):
+        started = time.perf_counter()
+        if rows:
+            self.db.load_rows(table, columns, rows)
+        stats = self.stats.setdefault(table, [0, 0.0])
+        stats[0] += len(rows)
+        stats[1] += time.perf_counter() - started
+
+    def max_id(self, table, key):
+        return self.db.fetch_one(f"SELECT COALESCE(MAX({key}), 0) FROM {table}")[0]
+
+    def new_ids(self, table, key, columns, after):
+        """Key of every row added after id ``after``, by the ``columns`` that identify it."""
+        return {tuple(row[1:]): row[0] for row in self.db.fetch_all(
+            f"SELECT {key}, {', '.join(columns)} FROM {table} WHERE {key} > :after", {"after": after})}
+
+    def moment(self, u):
+        """Timestamp (to the second) at fraction ``u`` of the activity over the period."""
+        seconds = (self.as_of - self.start).total_seconds() * grown(u)
+        return (self.start + timedelta(seconds=seconds)).replace(microsecond=0)
+
+    def timeline(self, n):
+        """``n`` strictly increasing timestamps over the period, denser towards the end; stops at as-of."""
+        previous = None
+        for i in range(n):
+            at = self.moment((i + self.rng.random()) / n)
+            if previous is not None and at <= previous:
+                at = previous + timedelta(seconds=1)
+            if at >= self.as_of:
+                return
+            previous = at
+            yield at
+
+    def batches(self, iterable):
+        iterator = iter(iterable)
+        while batch := list(itertools.islice(iterator, self.batch_size)):
+            yield batch
+
+    def generate_users(self, n):
+        rng = self.rng
+        after = self.max_id("Users", "user_id")
+        admins = max(1, n // 1000)
+        for batch in self.batches(range(n)):
+            rows = []
+            for i in batch:
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                rows.append((f"{first} {last}", f"{first.lower()}.{last.lower()}.{after + i + 1}@example.com",
+                             f"555{rng.randrange(10 ** 7):07d}", "INACTIVE" if rng.random() < INACTIVE_USERS else "ACTIVE",
+                             self.moment(0.5 * (i / n) ** 2), "ADMIN" if i < admins else "CUSTOMER",
+                             "password"))
+            self.load("Users", ("name", "email", "phone", "status", "created_at", "role", "password_hash"), rows)
+        users = sorted(self.db.fetch_all(
+            "SELECT user_id, status, created_at FROM Users WHERE user_id > :after", {"after": after}))
+        self.users = [(user_id, status == "ACTIVE") for user_id, status, _ in users]
+        self.created = [created_at for _, _, created_at in users]
+
+    def stock_scale(self, gear, rentals):
+        """Multiple of the CAPACITIES mix that leaves ``gear`` items twice the stock ``rentals`` need at their peak."""
+        # Rentals run their length plus about a day of late returns, and the
+        # rate at the end of the period is (1 + GROWTH) / (1 + GROWTH / 2) times the average
+        length = sum(days * weight for days, weight in RENTAL_DAYS) / sum(weight for _, weight in RENTAL_DAYS) + 1
+        peak = rentals * length / (self.as_of - self.start).days * (1 + GROWTH) / (1 + GROWTH / 2)
+        capacity = sum(units * weight for units, weight in CAPACITIES) / sum(weight for _, weight in CAPACITIES)
+        return max(1, math.ceil(2 * peak / (capacity * max(gear, 1))))
+
+    def generate_gear(self, n, rentals=0):
+        rng = self.rng
+        after = self.max_id("Gear", "gear_id")
+        categories = list(CATEGORIES)
+        units, unit_weights = mix(CAPACITIES)
+        scale = self.stock_scale(n, rentals)
+        for batch in self.batches(range(n)):
+            rows = []
+            for i in batch:
+                category = rng.choice(categories)
+                brands, (low, high) = CATEGORIES[category]
+                price = round(rng.uniform(low, high))
+                capacity = rng.choices(units, cum_weights=unit_weights)[0] * scale
+                rows.append((f"{rng.choice(brands)} {category} {rng.choice(MODELS)} {i + 1}", category, rng.choice(brands),
+                             price, price * 12, capacity))
+            self.load("Gear", ("name", "category", "brand", "rent_price_per_day", "sub_price_per_month", "stock"), rows)
+        self.gear = sorted(self.db.fetch_all(
+            "SELECT gear_id, rent_price_per_day, stock FROM Gear WHERE gear_id > :after", {"after": after}))
+
+    def popularity(self):
+        """Cumulative weights that make a few customers and a few items account for most activity."""
+        rng = self.rng
+        users = list(itertools.accumulate(rng.paretovariate(1.2) for _ in self.users))
+        ranks = list(range(1, len(self.gear) + 1))
+        rng.shuffle(ranks)
+        gear = list(itertools.accumulate(1 / rank ** 0.9 for rank in ranks))
+        return users, gear
+
+    def pick_user(self, weights, at):
+        """A user drawn by the cumulative ``weights``, among those signed up by ``at``; None before the first."""
+        known = bisect.bisect_right(self.created, at)
+        if not known:
+            return None
+        return self.users[bisect.bisect(weights, self.rng.random() * weights[known - 1], 0, known - 1)]
+
+    def generate_rentals(self, n):
+        rng = self.rng
+        user_weights, gear_weights = self.popularity()
+        days, day_weights = mix(RENTAL_DAYS)
+        conditions, condition_weights = mix(CONDITIONS)
+        # Return times of the rentals each user and each item has out, earliest
+        # first; the starts only move forward, so anything returned by now is done
+        out_by_user, out_by_gear = {}, {}
+
+        def out_at(heap, start):
+            while heap and heap[0] <= start:
+                heapq.heappop(heap)
+            return heap
+
+        def draw(start):
+            """A rental starting at ``start`` that rent_gear would have accepted, or None."""
+            user = self.pick_user(user_weights, start)
+            if user is None:
+                return None
+            user_id, active = user
+            gear_id, price, capacity = rng.choices(self.gear, cum_weights=gear_weights)[0]
+            if (len(out_at(out_by_user.setdefault(user_id, []), start)) >= MAX_ACTIVE_RENTALS
+                    or len(out_at(out_by_gear.setdefault(gear_id, []), start)) >= capacity):
+                # Over the rental limit or out of stock at the time
+                return None
+            end = start + timedelta(days=rng.choices(days, cum_weights=day_weights)[0])
+            late = rng.random()
+            if late < ON_TIME:
+                returned = end - timedelta(seconds=rng.uniform(0, 0.2) * (end - start).total_seconds())
+            elif late < LATE:
+                returned = end + timedelta(days=rng.uniform(0.1, 5))
+            else:
+                returned = end + timedelta(days=rng.uniform(5, 20))
+            returned = returned.replace(microsecond=0)
+            condition = rng.choices(conditions, cum_weights=condition_weights)[0]
+            if returned > self.as_of:
+                # Still out on the as-of date, which only an active customer can be
+                if not active:
+                    return None
+                returned = condition = None
+            return user_id, gear_id, end, returned, condition, price
+
+        previous = None
+        for starts in self.batches(self.timeline(n)):
+            rows, rentals = [], []
+            for start in starts:
+                if previous is not None and start <= previous:
+                    start = previous + timedelta(seconds=1)
+                rental = None
+                while rental is None and start < self.as_of:
+                    for _ in range(REDRAWS):
+                        rental = draw(start)
+                        if rental is not None:
+                            break
+                    else:
+                        # Everyone drawn is at the limit or out of stock: try again a little later
+                        start += timedelta(minutes=rng.randint(1, 60))
+                previous = start
+                if rental is None:
+                    # Moved past the as-of date, and so will every start after it
+                    continue
+                user_id, gear_id, end, returned, condition, price = rental
+                if returned is None:
+                    self.active_rentals[gear_id] += 1
+                heapq.heappush(out_by_user[user_id], returned or datetime.max)
+                heapq.heappush(out_by_gear[gear_id], returned or datetime.max)
+                rows.append((user_id, gear_id, start, end, returned,
+                             "RETURNED" if returned else "RENTED", condition))
+                rentals.append((user_id, gear_id, start, end, returned, condition, price))
+            after = self.max_id("Rentals", "rent_id")
+            self.load("Rentals", ("user_id", "gear_id", "start_date", "end_date", "return_date", "status",
+                                  "condition_returned"), rows)
+            ids = self.new_ids("Rentals", "rent_id", ("user_id", "gear_id", "start_date"), after)
+            self.bill_rentals(ids, rentals)
+
+    def bill_rentals(self, ids, rentals):
+        """Payments and penalties for one batch of rentals, as the app would have recorded them."""
+        rng = self.rng
+        payments, penalties, paid_penalties = [], [], []
+        for user_id, gear_id, start, end, returned, condition, price in rentals:
+            rent_id = ids[(user_id, gear_id, start)]
+            if returned is None:
+                if end < self.as_of:
+                    overdue = (self.as_of - end).total_seconds()
+                    penalties.append((rent_id, penalty_amount(overdue, price, None), OVERDUE_REASON, "PENDING"))
+                continue
+            if rng.random() < PAID_RENTALS:
+                charge = rental_charges([(returned - start).total_seconds()], [price])[0]
+                payments.append((user_id, charge, self.paid_on(returned, 2), "RENTAL", rent_id))
+            overdue = (returned - end).total_seconds()
+            due = []
+            if overdue > 0:
+                due.append((penalty_amount(overdue, price, None), OVERDUE_REASON))
+            if condition != "GOOD":
+                due.append((penalty_amount(overdue, price, condition), f"Gear returned in {condition.lower()} condition"))
+            for amount, reason in due:
+                status = "PAID" if rng.random() < PAID_PENALTIES else "PENDING"
+                penalties.append((rent_id, amount, reason, status))
+                if status == "PAID":
+                    paid_penalties.append((rent_id, reason, user_id, amount, self.paid_on(returned, 7)))
+        after = self.max_id("Penalties", "penalty_id")
+        self.load("Penalties", ("rent_id", "amount", "reason", "status"), penalties)
+        penalty_ids = self.new_ids("Penalties", "penalty_id", ("rent_id", "reason"), after)
+        payments += [(user_id, amount, paid_on, "PENALTY", penalty_ids[(rent_id, reason)])
+                     for rent_id, reason, user_id, amount, paid_on in paid_penalties]
+        self.load("Payments", ("user_id", "amount", "payment_date", "type", "ref_id"), payments)
+
+    def paid_on(self, after, within_days):
+        return min(after + timedelta(seconds=round(self.rng.uniform(0, within_days * DAY))), self.as_of)
+
+    def generate_subscriptions(self, n):
+        rng = self.rng
+        user_weights, gear_weights = self.popularity()
+        months, month_weights = mix(SUBSCRIPTION_MONTHS)
+        running = set()
+        for starts in self.batches(self.timeline(n)):
+            items = rng.choices(self.gear, cum_weights=gear_weights, k=len(starts))
+            rows, subscriptions = [], []
+            for start, (gear_id, price, _) in zip(starts, items):
+                user = self.pick_user(user_weights, start)
+                if user is None:
+                    continue
+                user_id, active = user
+                end = start + timedelta(days=30 * rng.choices(months, cum_weights=month_weights)[0])
+                # Active only while it runs, and only one at a time per user and item
+                is_active = (end >= self.as_of and active and rng.random() >= CANCELLED_SUBSCRIPTIONS
+                             and (user_id, gear_id) not in running)
+                if is_active:
+                    running.add((user_id, gear_id))
+                rows.append((user_id, gear_id, start, end, "Y" if is_active else "N"))
+                subscriptions.append((user_id, gear_id, start, end, is_active, price))
+            after = self.max_id("Subscriptions", "sub_id")
+            self.load("Subscriptions", ("user_id", "gear_id", "start_date", "end_date", "is_active"), rows)
+            ids = self.new_ids("Subscriptions", "sub_id", ("user_id", "gear_id", "start_date"), after)
+            # Ended and cancelled subscriptions were charged for their whole term
+            payments = [(user_id, subscription_charges([(end - start).total_seconds()], [price])[0],
+                         min(end, self.as_of), "SUBSCRIPTION", ids[(user_id, gear_id, start)])
+                        for user_id, gear_id, start, end, is_active, price in subscriptions
+                        if not is_active and rng.random() < PAID_SUBSCRIPTIONS]
+            self.load("Payments", ("user_id", "amount", "payment_date", "type", "ref_id"), payments)
+
+    def generate_audit_history(self, n):
+        rng = self.rng
+        tables, table_weights = zip(*((table[:2], table[2]) for table in AUDITED))
+        table_weights = list(itertools.accumulate(table_weights))
+        actions, action_weights = mix(AUDIT_ACTIONS)
+        verbs = {"INSERT": "added", "UPDATE": "updated", "DELETE": "deleted"}
+        for batch in self.batches(range(n)):
+            rows = []
+            for _ in batch:
+                table, label = rng.choices(tables, cum_weights=table_weights)[0]
+                action = rng.choices(actions, cum_weights=action_weights)[0]
+                at = self.moment(rng.random())
+                # Someone who had signed up by then
+                known = bisect.bisect_right(self.created, at)
+                user_id = self.users[rng.randrange(known)][0] if known else None
+                rows.append((user_id, table, action, at, f"{label} {verbs[action]}: ID={rng.randrange(1, 10 ** 7)}"))
+            self.load("Audit_Log", ("user_id", "table_name", "action", "timestamp", "details"), rows)
+
+    def settle_stock(self):
+        """Take the rentals still out off each item's stock, as rent_gear would have."""
+        for gear_id, out in sorted(self.active_rentals.items()):
+            self.db.update_stock(gear_id, -out)
+
+    def run(self, users, gear, rentals, subscriptions, audit_history=0):
+        self.generate_users(users)
+        self.generate_gear(gear, rentals)
+        self.generate_rentals(rentals)
+        self.settle_stock()
+        self.generate_subscriptions(subscriptions)
+        self.generate_audit_history(audit_history)
+        # Oracle's summaries are materialized views; bring them up to date with what was loaded
+        self.db.refresh_reports()
+        return self.stats
+
+
+def report(stats):
+    print(f"{'table':<16}{'rows':>12}{'seconds':>10}{'rows/s':>12}")
+    for table, (rows, seconds) in stats.items():
+        print(f"{table:<16}{rows:>12}{seconds:>10.1f}{rows / seconds if seconds else 0:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", help="oracle or sqlite (default: RENTAL_DB_BACKEND)")
+    parser.add_argument("--path", help="SQLite database file (default: RENTAL_DB_PATH)")
+    parser.add_argument("--users", type=int, default=10_000, help="users to create (0.1%% of them admins)")
+    parser.add_argument("--gear", type=int, default=1_000, help="gear items to create")
+    parser.add_argument("--rentals", type=int, default=1_000_000, help="rentals over the period")
+    parser.add_argument("--subscriptions", type=int, default=50_000, help="subscriptions over the period")
+    parser.add_argument("--audit-history", type=int, default=0, help="extra audit entries spread over the period")
+    parser.add_argument("--months", type=int, default=24, help="length of the period")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, help="end of the period (default: today)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed; the same seed gives the same data")
+    parser.add_argument("--batch-size", type=int, default=BATCH, help="rows per array insert and commit")
+    args = parser.parse_args()
+
+    db = open_driver(args.backend, path=args.path)
+    try:
+        generator = Generator(db, seed=args.seed, months=args.months, as_of=args.as_of, batch_size=args.batch_size)
+        stats = generator.run(args.users, args.gear, args.rentals, args.subscriptions, args.audit_history)
+    except DataError as e:
+        sys.exit(f"Data generation failed: {e}")
+    finally:
+        db.close()
+    report(stats)
+
+
+if __name__ == "__main__":
+    main()
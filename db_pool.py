@@ -0,0 +1,147 @@
+"""Oracle session pool shared by the GUI and background workers.
+
+Each database operation borrows a session from the pool and opens its own
+short-lived cursor, so refreshes submitted in parallel no longer queue behind
+a single shared connection. Connection settings are read from the
+environment, falling back to the development defaults used by the app.
+"""
+import os
+from contextlib import contextmanager
+
+import oracledb
+
+# Errors that mean the session is gone rather than the statement being wrong
+DISCONNECT_ERRORS = {
+    "DPI-1010",  # not connected
+    "DPI-1080",  # connection was closed by ORA-%d
+    "DPY-1001",  # not connected to database
+    "DPY-4011",  # the database or network closed the connection
+    "ORA-00028",  # your session has been killed
+    "ORA-01012",  # not logged on
+    "ORA-03113",  # end-of-file on communication channel
+    "ORA-03114",  # not connected to ORACLE
+    "ORA-03135",  # connection lost contact
+    "ORA-12537",  # TNS:connection closed
+}
+
+
+def is_disconnect(e):
+    error = e.args[0] if e.args else None
+    return getattr(error, "full_code", None) in DISCONNECT_ERRORS or bool(getattr(error, "isrecoverable", False))
+
+
+class ConnectionPool:
+    def __init__(self, user, password, dsn, min=1, max=4, increment=1, ping_interval=60, retries=1):
+        self.user = user
+        self.dsn = dsn
+        self.min = min
+        self.max = max
+        self.increment = increment
+        self.ping_interval = ping_interval
+        self.retries = retries
+        self._password = password
+        self._pool = self._create_pool()
+        # dal.metrics.Metrics that tags sessions and traces cursors (Driver.trace), if any
+        self.tracer = None
+
+    @classmethod
+    def from_env(cls, **overrides):
+        """Pool configured from RENTAL_DB_* variables; keyword arguments take precedence."""
+        settings = dict(
+            user=os.environ.get("RENTAL_DB_USER", "DEISHAUN"),
+            password=os.environ.get("RENTAL_DB_PASSWORD", "4313"),
+            dsn=os.environ.get("RENTAL_DB_DSN", "localhost/xepdb1"),
+            min=int(os.environ.get("RENTAL_DB_POOL_MIN", 1)),
+            max=int(os.environ.get("RENTAL_DB_POOL_MAX", 4)),
+            increment=int(os.environ.get("RENTAL_DB_POOL_INCREMENT", 1)),
+            ping_interval=int(os.environ.get("RENTAL_DB_PING_INTERVAL", 60)),
+        )
+        settings.update(overrides)
+        return cls(**settings)
+
+    def _create_pool(self):
+        return oracledb.create_pool(
+            user=self.user,
+            password=self._password,
+            dsn=self.dsn,
+            min=self.min,
+            max=self.max,
+            increment=self.increment,
+            ping_interval=self.ping_interval,
+            getmode=oracledb.POOL_GETMODE_WAIT,
+        )
+
+    @property
+    def busy(self):
+        return self._pool.busy
+
+    @property
+    def opened(self):
+        return self._pool.opened
+
+    @contextmanager
+    def connection(self):
+        """Borrow a session; sessions that lost their connection are dropped, not reused."""
+        conn = self._pool.acquire()
+        try:
+            yield conn
+        except oracledb.Error as e:
+            if is_disconnect(e):
+                self._pool.drop(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._pool.release(conn)
+
+    @contextmanager
+    def cursor(self):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            if self.tracer is not None:
+                self.tracer.tag_session(conn)
+                cursor = self.tracer.wrap(cursor)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def run(self, func, retry=False):
+        """Call ``func(cursor)`` with a fresh cursor and return its result.
+
+        With ``retry=True`` the call is repeated on a new session when the
+        first one turns out to be disconnected. Only use it for statements
+        that are safe to run twice (queries), never for committing PL/SQL.
+        """
+        attempts = self.retries + 1 if retry else 1
+        for attempt in range(attempts):
+            try:
+                with self.cursor() as cursor:
+                    return func(cursor)
+            except oracledb.Error as e:
+                if attempt + 1 < attempts and is_disconnect(e):
+                    continue
+                raise
+
+    def health_check(self):
+        """Round trip to the database; recreates the pool if every session is dead."""
+        try:
+            with self.connection() as conn:
+                conn.ping()
+        except oracledb.Error as e:
+            if not is_disconnect(e):
+                raise
+            self.reconnect()
+            with self.connection() as conn:
+                conn.ping()
+        return True
+
+    def reconnect(self):
+        old_pool, self._pool = self._pool, self._create_pool()
+        try:
+            old_pool.close(force=True)
+        except oracledb.Error:
+            pass
+
+    def close(self):
+        self._pool.close(force=True)
@@ -0,0 +1,110 @@
+"""Background executor for database calls.
+
+Tkinter widgets may only be touched from the thread running the main loop, so
+every database round trip is submitted here instead of being run inline in a
+button callback. Work runs on a small thread pool; when it finishes, the
+result (or the exception) is queued and picked up by a poll scheduled with
+``root.after``, which then calls the success/error callback on the Tk thread.
+Both run in a copy of the submitter's context, so context variables such as
+the current action (dal.metrics) follow the call onto the worker thread.
+"""
+import contextvars
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _Task:
+    def __init__(self, tag, on_success, on_error):
+        self.tag = tag
+        self.context = contextvars.copy_context()
+        self.on_success = on_success
+        self.on_error = on_error
+        self.future = None
+        self.cancelled = False
+
+
+class DBWorker:
+    POLL_MS = 50
+
+    def __init__(self, root, max_workers=1, on_busy_change=None):
+        self.root = root
+        self.on_busy_change = on_busy_change
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._tasks = set()
+        self._polling = False
+        self._closed = False
+
+    @property
+    def in_flight(self):
+        with self._lock:
+            return len(self._tasks)
+
+    def submit(self, func, *args, on_success=None, on_error=None, tag=None):
+        """Run ``func(*args)`` on a worker thread.
+
+        ``on_success(result)`` or ``on_error(exc)`` is invoked on the Tk thread
+        once the call finishes, unless the task was cancelled in the meantime.
+        ``tag`` groups tasks (one per notebook tab) so they can be cancelled
+        together with :meth:`cancel`. Must be called from the Tk thread.
+        """
+        if self._closed:
+            return None
+        task = _Task(tag, on_success, on_error)
+        with self._lock:
+            self._tasks.add(task)
+        task.future = self._executor.submit(task.context.run, func, *args)
+        task.future.add_done_callback(lambda future: self._results.put((task, future)))
+        self._busy_changed()
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+        return task
+
+    def cancel(self, tag=None):
+        """Cancel every pending or running task with ``tag`` (all tasks if None).
+
+        Tasks that have not started yet are dropped from the pool queue; a task
+        already talking to the database runs to completion, but its callbacks
+        are discarded so stale results never reach the widgets. Returns the
+        number of tasks cancelled.
+        """
+        with self._lock:
+            tasks = [task for task in self._tasks if tag is None or task.tag == tag]
+        for task in tasks:
+            task.cancelled = True
+            task.future.cancel()
+        return len(tasks)
+
+    def shutdown(self):
+        self._closed = True
+        self.cancel()
+        self._executor.shutdown(wait=False)
+
+    def _poll(self):
+        while True:
+            try:
+                task, future = self._results.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._tasks.discard(task)
+            self._busy_changed()
+            if task.cancelled or future.cancelled() or self._closed:
+                continue
+            exc = future.exception()
+            if exc is not None:
+                if task.on_error:
+                    task.context.run(task.on_error, exc)
+            elif task.on_success:
+                task.context.run(task.on_success, future.result())
+        if self.in_flight and not self._closed:
+            self.root.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+    def _busy_changed(self):
+        if self.on_busy_change and not self._closed:
+            self.on_busy_change(self.in_flight)
@@ -0,0 +1,250 @@
+"""Streaming export of audit log, payments, rentals and subscriptions to CSV or Parquet.
+
+Rows come from ``Driver.export_rows`` in key order, a batch at a time
+(``cursor.arraysize``/prefetch of ``batch_size`` on Oracle), and each batch is
+written straight to the output, so memory stays bounded however many rows
+are exported. CSV goes to one file. Parquet goes to a directory of
+``part-NNNNN.parquet`` files of up to ``part_rows`` rows, one row group per
+batch; it needs the optional pyarrow package.
+
+Progress is checkpointed next to the output (``<output>.checkpoint.json``)
+each time the written rows are safely on disk: after every batch for CSV,
+after every finished part for Parquet. ``--resume`` drops anything written
+after the last checkpoint and carries on from the last exported id with the
+same date range. Run it again after a completed export to append the rows
+added since.
+
+    python exporter.py payments payments-2026-01.csv --from 2026-01-01 --to 2026-01-31
+    python exporter.py audit audit.parquet --resume
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from dal import DataError, open_driver
+from dal.base import EXPORT_BATCH, EXPORT_SOURCES
+
+PART_ROWS = 500_000
+DATE_COLUMNS = {"timestamp", "payment_date", "start_date", "end_date", "return_date"}
+
+
+class ExportStats:
+    def __init__(self, rows=0):
+        self.rows = rows
+        self.exported = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        """Rows exported per second in this run."""
+        return self.exported / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return f"{self.exported} rows exported ({self.rows} in total) in {self.elapsed:.1f}s ({self.rate:.0f} rows/s)"
+
+
+class CsvWriter:
+    """Appends batches to one CSV file; every batch is a checkpoint."""
+
+    def __init__(self, path, columns, state=None):
+        # Binary mode so the checkpoint can hold an exact byte offset to truncate back to
+        if state:
+            self.file = open(path, "r+b")
+            self.file.truncate(state["offset"])
+            self.file.seek(state["offset"])
+        else:
+            self.file = open(path, "wb")
+            self._write_rows([columns])
+
+    def _write_rows(self, rows):
+        text = io.StringIO()
+        csv.writer(text).writerows(rows)
+        self.file.write(text.getvalue().encode("utf-8"))
+
+    def write(self, rows):
+        self._write_rows(rows)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {"offset": self.file.tell()}
+
+    def close(self):
+        self.file.close()
+        return None
+
+
+class ParquetWriter:
+    """Writes batches as row groups of part files; every finished part is a checkpoint."""
+
+    def __init__(self, path, columns, state=None, part_rows=PART_ROWS):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export needs the pyarrow package (pip install pyarrow)") from None
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.part_rows = part_rows
+        self.schema = pa.schema([(column, self.arrow_type(column)) for column in columns])
+        self.part = state["parts"] if state else 0
+        self.writer = None
+        self.part_size = 0
+        os.makedirs(path, exist_ok=True)
+        # Parts past the checkpoint were cut off before they were finished
+        for name in os.listdir(path):
+            if name.startswith("part-") and name.endswith(".parquet") and int(name[5:-8]) >= self.part:
+                os.remove(os.path.join(path, name))
+
+    def arrow_type(self, column):
+        if column in DATE_COLUMNS:
+            return self.pa.timestamp("s")
+        if column.endswith("_id"):
+            return self.pa.int64()
+        if column == "amount":
+            return self.pa.float64()
+        return self.pa.string()
+
+    def write(self, rows):
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(os.path.join(self.path, f"part-{self.part:05d}.parquet"), self.schema)
+        arrays = [self.pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(self.schema)]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        self.part_size += len(rows)
+        if self.part_size >= self.part_rows:
+            return self.close()
+        return None
+
+    def close(self):
+        if self.writer is None:
+            return None
+        self.writer.close()
+        self.writer = None
+        self.part += 1
+        self.part_size = 0
+        return {"parts": self.part}
+
+
+def checkpoint_path(output):
+    return f"{output}.checkpoint.json"
+
+
+def load_checkpoint(output):
+    try:
+        with open(checkpoint_path(output)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(output, checkpoint):
+    # Written aside and renamed, so a crash never leaves a half-written checkpoint
+    path = checkpoint_path(output)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def export(db, source, output, fmt="csv", start_date=None, end_date=None, resume=False,
+           batch_size=EXPORT_BATCH, part_rows=PART_ROWS, on_progress=None):
+    """Export ``source`` (a key of EXPORT_SOURCES) to ``output``; return the ExportStats.
+
+    With ``resume`` the date range and position come from the checkpoint
+    left by an earlier run, if there is one. ``on_progress(stats)`` is
+    called after every batch.
+    """
+    _, key, _, columns = EXPORT_SOURCES[source]
+    checkpoint = load_checkpoint(output) if resume else None
+    if checkpoint:
+        if (checkpoint["source"], checkpoint["format"]) != (source, fmt):
+            raise ValueError(f"{checkpoint_path(output)} is for a {checkpoint['format']} export of {checkpoint['source']}")
+        start_date, end_date = (datetime.fromisoformat(value) if value else None
+                                for value in (checkpoint["start_date"], checkpoint["end_date"]))
+    else:
+        checkpoint = {
+            "source": source,
+            "format": fmt,
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None,
+            "last_id": None,
+            "rows": 0,
+            "writer": None,
+        }
+    if fmt == "parquet":
+        writer = ParquetWriter(output, columns, checkpoint["writer"], part_rows)
+    else:
+        writer = CsvWriter(output, columns, checkpoint["writer"])
+
+    stats = ExportStats(checkpoint["rows"])
+    key_index = columns.index(key)
+    last_id, rows_written = checkpoint["last_id"], checkpoint["rows"]
+
+    def reached(state):
+        checkpoint.update(last_id=last_id, rows=rows_written, writer=state)
+        save_checkpoint(output, checkpoint)
+
+    try:
+        for rows in db.export_rows(source, start_date, end_date, checkpoint["last_id"], batch_size):
+            state = writer.write(rows)
+            last_id = rows[-1][key_index]
+            rows_written += len(rows)
+            stats.exported += len(rows)
+            stats.rows = rows_written
+            if state:
+                reached(state)
+            if on_progress:
+                on_progress(stats)
+    finally:
+        state = writer.close()
+    if state:
+        reached(state)
+    elif checkpoint["writer"] is None:
+        # Nothing was written at all: still record where a later run starts from
+        reached(None)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", choices=sorted(EXPORT_SOURCES))
+    parser.add_argument("output", help="CSV file, or directory of Parquet parts")
+    parser.add_argument("--format", choices=["csv", "parquet"],
+                        help="default: parquet if the output ends in .parquet, else csv")
+    parser.add_argument("--from", dest="start", help="first day to export (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", help="last day to export, inclusive (YYYY-MM-DD)")
+    parser.add_argument("--resume", action="store_true", help="carry on from the checkpoint of an earlier run")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH, help="rows fetched and written at a time")
+    parser.add_argument("--part-rows", type=int, default=PART_ROWS, help="rows per Parquet part file")
+    parser.add_argument("--backend", help="oracle or sqlite (default: RENTAL_DB_BACKEND)")
+    args = parser.parse_args()
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    try:
+        start = datetime.strptime(args.start, "%Y-%m-%d") if args.start else None
+        end = datetime.strptime(args.end, "%Y-%m-%d") + timedelta(days=1, seconds=-1) if args.end else None
+    except ValueError:
+        parser.error("dates must be in YYYY-MM-DD format")
+
+    def report_progress(stats):
+        print(f"\r{stats}", end="", file=sys.stderr, flush=True)
+
+    db = open_driver(args.backend)
+    try:
+        stats = export(db, args.source, args.output, fmt, start, end, args.resume,
+                       args.batch_size, args.part_rows, report_progress)
+    except (DataError, ImportError, ValueError) as e:
+        sys.exit(f"\nExport failed: {e}")
+    finally:
+        db.close()
+    print(f"\r{stats}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
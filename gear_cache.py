@@ -0,0 +1,77 @@
+"""Client-side cache of the Gear tab's pages (``Driver.grid_page("gear", ...)``).
+
+The catalog is read far more often than it changes: every Gear tab render,
+and after every rental, return and stock update. ``GearCatalog`` keeps each
+page the grid has fetched, keyed by everything that selects it: filters,
+sort, offset, the row it follows and the search text. Within the TTL,
+renders are served from memory without touching the database. Once the TTL
+runs out, the next render reads the change token, the highest Gear
+``last_change`` stamp. If it has not moved, the cached pages stay good for
+another TTL, so changes made by other clients are picked up with one round
+trip that returns a single value. ``invalidate()`` drops every page, e.g.
+after this client changed Gear.
+"""
+import os
+import threading
+import time
+
+from dal.base import GRID_PAGE_SIZE
+
+DEFAULT_TTL = 30.0
+# Pages kept at most; the oldest one goes first
+MAX_PAGES = 256
+
+
+class GearCatalog:
+    def __init__(self, db, ttl=None, clock=time.monotonic):
+        self.db = db
+        self.ttl = ttl if ttl is not None else float(os.environ.get("RENTAL_GEAR_CACHE_TTL", DEFAULT_TTL))
+        self.clock = clock
+        self._lock = threading.Lock()
+        # (filters, sort, descending, offset, limit, after, search) -> rows
+        self._pages = {}
+        self._token = None
+        self._checked_at = None
+        # Bumped whenever the pages are dropped, so a fetch that overlapped it is not kept
+        self._generation = 0
+
+    @property
+    def fresh(self):
+        """True while pages can be served from memory alone."""
+        with self._lock:
+            return self._checked_at is not None and self.clock() - self._checked_at < self.ttl
+
+    def invalidate(self):
+        """Drop every page, e.g. after this client changed Gear."""
+        with self._lock:
+            self._pages.clear()
+            self._checked_at = None
+            self._generation += 1
+
+    def page(self, filters=None, sort=None, descending=False, offset=0, limit=GRID_PAGE_SIZE, after=None,
+             search=None):
+        """Rows of ``Driver.grid_page("gear", ...)``, from memory while the catalog is unchanged.
+
+        Runs on the worker thread.
+        """
+        if not self.fresh:
+            token = self.db.gear_change_token()
+            with self._lock:
+                if token != self._token:
+                    self._pages.clear()
+                    self._token = token
+                    self._generation += 1
+                self._checked_at = self.clock()
+        key = (tuple(sorted((filters or {}).items())), sort, descending, offset, limit, after, search)
+        with self._lock:
+            rows = self._pages.get(key)
+            generation = self._generation
+        if rows is not None:
+            return rows
+        rows = self.db.grid_page("gear", filters, sort, descending, offset, limit, after, search=search)
+        with self._lock:
+            if generation == self._generation:
+                if len(self._pages) >= MAX_PAGES:
+                    del self._pages[next(iter(self._pages))]
+                self._pages[key] = rows
+        return rows
@@ -0,0 +1,182 @@
+"""Bulk gear import from CSV or JSON.
+
+Records are streamed from the file, validated in Python against the same
+rules as ``pkg_gear_ops.add_gear`` and loaded ``chunk_size`` at a time with
+``Driver.import_gear`` (one ``executemany(..., batcherrors=True)`` per chunk
+on Oracle). Rejected rows are reported one by one and the rest are loaded.
+Only one chunk is held in memory however large the file is.
+
+Columns are the Gear columns: name, category, brand, rent_price_per_day,
+sub_price_per_month and stock. CSV needs a header row; JSON may be an array
+of objects or one object per line (JSON Lines).
+
+    python gear_import.py warehouse.csv --user-id 1
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from dal import DataError, open_driver
+
+COLUMNS = ("name", "category", "brand", "rent_price_per_day", "sub_price_per_month", "stock")
+CHUNK_SIZE = 1000
+
+
+class ImportStats:
+    def __init__(self):
+        self.read = 0
+        self.loaded = 0
+        self.rejected = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        """Rows read per second so far."""
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f"{self.read} rows read, {self.loaded} loaded, {self.rejected} rejected "
+                f"in {self.elapsed:.1f}s ({self.rate:.0f} rows/s)")
+
+
+def read_csv(f):
+    """Yield (line number, record) for each data row of a CSV file with a header."""
+    reader = csv.DictReader(f)
+    if "name" not in (reader.fieldnames or ()):
+        raise DataError(0, f"CSV header must name the columns: {', '.join(COLUMNS)}")
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_json(f, buffer_size=65536):
+    """Yield (record number, record) from a JSON array or JSON Lines, reading ``buffer_size`` at a time."""
+    decoder = json.JSONDecoder()
+    buffer, pos, number, eof = "", 0, 0, False
+    while True:
+        # Skip the array brackets and separators between records
+        while pos < len(buffer) and buffer[pos] in " \t\r\n[,]":
+            pos += 1
+        if pos == len(buffer) and eof:
+            return
+        try:
+            if pos == len(buffer):
+                raise json.JSONDecodeError("Need more data", buffer, pos)
+            record, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The next record runs past the end of what has been read
+            chunk = f.read(buffer_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        number += 1
+        yield number, record
+
+
+def read_records(path):
+    reader = read_json if os.path.splitext(path)[1].lower() in (".json", ".jsonl") else read_csv
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from reader(f)
+
+
+def parse(record):
+    """Turn a record into an import_gear row, raising DataError as add_gear would."""
+    if not isinstance(record, dict):
+        raise DataError(0, "Record must be an object with the Gear columns")
+
+    def text(column):
+        value = record.get(column)
+        value = str(value).strip() if value is not None else ""
+        return value or None
+
+    def number(column, convert):
+        value = text(column)
+        if value is None:
+            return None
+        try:
+            return convert(value)
+        except ValueError:
+            raise DataError(0, f"{column} must be a number, got {value!r}") from None
+
+    name = text("name")
+    if not name:
+        raise DataError(20016, "Gear name is required")
+    row = (name, text("category"), text("brand"),
+           number("rent_price_per_day", float), number("sub_price_per_month", float), number("stock", int) or 0)
+    if any(value is not None and value < 0 for value in row[3:]):
+        raise DataError(20017, "Prices and stock cannot be negative")
+    return row
+
+
+def import_gear(db, user_id, path, chunk_size=CHUNK_SIZE, on_error=None, on_progress=None):
+    """Import every record in ``path``; return the final ImportStats.
+
+    ``on_error(number, error)`` is called for each rejected record (line
+    number for CSV, record number for JSON) and ``on_progress(stats)`` after
+    each chunk. A user who may not add gear stops the import with DataError.
+    """
+    stats = ImportStats()
+    chunk = []
+
+    def reject(number, error):
+        stats.rejected += 1
+        if on_error:
+            on_error(number, error)
+
+    def flush():
+        errors = db.import_gear(user_id, [row for _, row in chunk]) if chunk else []
+        for index, error in errors:
+            reject(chunk[index][0], error)
+        stats.loaded += len(chunk) - len(errors)
+        chunk.clear()
+        if on_progress:
+            on_progress(stats)
+
+    for number, record in read_records(path):
+        stats.read += 1
+        try:
+            chunk.append((number, parse(record)))
+        except DataError as e:
+            reject(number, e)
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="CSV, JSON or JSON Lines file")
+    parser.add_argument("--user-id", type=int, required=True, help="admin the gear is added as")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per executemany call")
+    parser.add_argument("--backend", help="oracle or sqlite (default: RENTAL_DB_BACKEND)")
+    args = parser.parse_args()
+
+    def report_error(number, error):
+        print(f"\r{args.path}:{number}: {error}", file=sys.stderr)
+
+    def report_progress(stats):
+        print(f"\r{stats}", end="", file=sys.stderr, flush=True)
+
+    db = open_driver(args.backend)
+    try:
+        stats = import_gear(db, args.user_id, args.path, args.chunk_size, report_error, report_progress)
+    except DataError as e:
+        sys.exit(f"\nImport failed: {e}")
+    finally:
+        db.close()
+    print(f"\n{stats}", file=sys.stderr)
+    if stats.rejected:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
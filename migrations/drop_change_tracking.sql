@@ -0,0 +1,40 @@
+-- Remove the delta-refresh change tracking from an existing schema (backend.sql
+-- no longer creates it). The paged grids replaced the lists that re-read rows by
+-- last_change, so the stamps and their indexes only slowed down every write.
+-- Gear keeps its stamp, change_seq and idx_gear_last_change: MAX(last_change)
+-- is the gear cache's change token. Safe to re-run.
+
+DECLARE
+    e_missing EXCEPTION;       -- index does not exist
+    e_no_trigger EXCEPTION;
+    e_no_column EXCEPTION;     -- already dropped
+    PRAGMA EXCEPTION_INIT(e_missing, -1418);
+    PRAGMA EXCEPTION_INIT(e_no_trigger, -4080);
+    PRAGMA EXCEPTION_INIT(e_no_column, -904);
+
+    PROCEDURE run(p_ddl IN VARCHAR2) IS
+    BEGIN
+        EXECUTE IMMEDIATE p_ddl;
+    EXCEPTION
+        WHEN e_missing OR e_no_trigger OR e_no_column THEN
+            NULL;
+    END run;
+BEGIN
+    run('DROP TRIGGER trg_rentals_change');
+    run('DROP TRIGGER trg_subs_change');
+    run('DROP TRIGGER trg_payments_change');
+
+    run('DROP INDEX idx_rentals_last_change');
+    run('DROP INDEX idx_subs_last_change');
+    run('DROP INDEX idx_payments_last_change');
+
+    -- SET UNUSED is a dictionary change, so it does not rewrite the tables;
+    -- ALTER TABLE ... DROP UNUSED COLUMNS reclaims the space later, off-hours
+    run('ALTER TABLE Rentals SET UNUSED (last_change)');
+    run('ALTER TABLE Subscriptions SET UNUSED (last_change)');
+    run('ALTER TABLE Payments SET UNUSED (last_change)');
+END;
+/
+
+-- Then re-run v_user_rentals and v_user_subscriptions from the VIEWS FOR
+-- FRONTEND section of backend.sql, which no longer select last_change.
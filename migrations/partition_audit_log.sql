@@ -0,0 +1,46 @@
+-- Turn an existing Audit_Log into the monthly partitioned log with retention
+-- (backend.sql already creates it this way on a fresh schema). Run once.
+-- Converting the table online needs Oracle 12.2 or later; it rewrites every
+-- row, so on a large log expect it to take a while, without blocking writers.
+
+ALTER TABLE Audit_Config ADD (
+    compress_after_months NUMBER DEFAULT 3 CHECK (compress_after_months >= 1),
+    archive_after_months  NUMBER DEFAULT 24 CHECK (archive_after_months >= 1)
+);
+
+-- The partition key cannot be NULL (queue_action has always set it)
+ALTER TABLE Audit_Log MODIFY (timestamp NOT NULL);
+
+-- Replaced by local indexes that follow get_audit_log's (timestamp, log_id) order
+DROP INDEX idx_audit_table_log;
+DROP INDEX idx_audit_timestamp;
+
+ALTER TABLE Audit_Log MODIFY
+PARTITION BY RANGE (timestamp) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+(PARTITION p_audit_start VALUES LESS THAN (DATE '2000-01-01'))
+ONLINE;
+
+CREATE INDEX idx_audit_table_ts ON Audit_Log(table_name, timestamp, log_id) LOCAL;
+CREATE INDEX idx_audit_timestamp ON Audit_Log(timestamp, log_id) LOCAL;
+
+CREATE TABLE Audit_Archive (
+    log_id      NUMBER NOT NULL,
+    user_id     NUMBER,
+    table_name  VARCHAR2(30),
+    action      VARCHAR2(100),
+    timestamp   DATE NOT NULL,
+    details     VARCHAR2(4000)
+)
+COMPRESS
+PARTITION BY RANGE (timestamp) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+(PARTITION p_archive_start VALUES LESS THAN (DATE '2000-01-01'));
+
+CREATE INDEX idx_audit_archive_ts ON Audit_Archive(timestamp, log_id) LOCAL;
+
+BEGIN
+    DBMS_STATS.GATHER_TABLE_STATS(USER, 'AUDIT_LOG', cascade => TRUE);
+END;
+/
+
+-- Then re-run pkg_audit_trail (spec and body) from backend.sql, and schedule
+-- the retention job with: BEGIN pkg_audit_trail.schedule_retention; END;
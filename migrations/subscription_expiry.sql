@@ -0,0 +1,45 @@
+-- Move an existing schema from the update-time expiry trigger to the
+-- scheduled expiry job (backend.sql already does this on a fresh one).
+-- Safe to re-run.
+
+DECLARE
+    e_exists EXCEPTION;   -- name is already used by an existing object
+    e_missing EXCEPTION;  -- index does not exist
+    e_no_trigger EXCEPTION;
+    PRAGMA EXCEPTION_INIT(e_exists, -955);
+    PRAGMA EXCEPTION_INIT(e_missing, -1418);
+    PRAGMA EXCEPTION_INIT(e_no_trigger, -4080);
+    v_columns NUMBER;
+
+    PROCEDURE run(p_ddl IN VARCHAR2) IS
+    BEGIN
+        EXECUTE IMMEDIATE p_ddl;
+    EXCEPTION
+        WHEN e_exists OR e_missing OR e_no_trigger THEN
+            NULL;
+    END run;
+BEGIN
+    -- Replaced by pkg_subscription_service.expire_subscriptions
+    run('DROP TRIGGER trg_subscriptions_expiry');
+
+    -- idx_subs_active no longer needs end_date once lapsed rows are deactivated
+    SELECT COUNT(*) INTO v_columns FROM user_ind_columns WHERE index_name = 'IDX_SUBS_ACTIVE';
+    IF v_columns > 2 THEN
+        run('DROP INDEX idx_subs_active');
+    END IF;
+    run('CREATE INDEX idx_subs_active ON Subscriptions('
+        || 'CASE WHEN is_active = ''Y'' THEN user_id END, '
+        || 'CASE WHEN is_active = ''Y'' THEN gear_id END)');
+    run('CREATE INDEX idx_subs_expiry ON Subscriptions(CASE WHEN is_active = ''Y'' THEN end_date END)');
+
+    DBMS_STATS.GATHER_TABLE_STATS(USER, 'SUBSCRIPTIONS', cascade => TRUE);
+END;
+/
+
+-- Then re-run from backend.sql: pkg_subscription_service (spec and body), the
+-- REPORTING SUMMARIES section after DROP MATERIALIZED VIEW LOG ON Rentals,
+-- Subscriptions and Gear (the Subscriptions log now records sub_id and
+-- is_active, for mv_sub_revenue_by_gear and the new mv_category_subs; the
+-- Rentals and Gear logs record their keys rent_id and gear_id) and the final
+-- BEGIN ... END block, which schedules SUBSCRIPTION_EXPIRY_JOB. Its first run
+-- deactivates every subscription that lapsed without being updated.
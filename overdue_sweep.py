@@ -0,0 +1,35 @@
+"""Overdue penalty sweep: charge every rental still out past its end date.
+
+Runs ``Driver.sweep_overdue`` once: all overdue rentals are found with one
+indexed query and priced together with the calc_penalty_amt rule (2x the
+daily rate per overdue day), and their penalties are inserted or brought up to
+date in one MERGE. Re-running it is harmless, so it can be scheduled as often
+as wanted. On Oracle the OVERDUE_SWEEP_JOB scheduler job runs it nightly
+(``pkg_penalty_center.schedule_sweep``); elsewhere schedule this script, e.g.
+from cron:
+
+    0 2 * * * python overdue_sweep.py
+"""
+import argparse
+import sys
+
+from dal import DataError, open_driver
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", help="oracle or sqlite (default: RENTAL_DB_BACKEND)")
+    args = parser.parse_args()
+
+    db = open_driver(args.backend)
+    try:
+        processed, elapsed = db.sweep_overdue()
+    except DataError as e:
+        sys.exit(f"Overdue sweep failed: {e}")
+    finally:
+        db.close()
+    print(f"{processed} overdue penalties assessed or updated in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
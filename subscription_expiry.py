@@ -0,0 +1,36 @@
+"""Subscription expiry: deactivate every subscription past its end date.
+
+Runs ``Driver.expire_subscriptions`` once: a single UPDATE over the active
+subscriptions only (idx_subs_expiry) sets ``is_active`` to 'N' wherever the
+end date has passed, and the report summaries' active subscription counts
+follow. Re-running it is harmless. On Oracle the SUBSCRIPTION_EXPIRY_JOB
+scheduler job runs it hourly (``pkg_subscription_service.schedule_expiry``);
+elsewhere schedule this script, e.g. from cron:
+
+    0 * * * * python subscription_expiry.py
+"""
+import argparse
+import sys
+import time
+
+from dal import DataError, open_driver
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", help="oracle or sqlite (default: RENTAL_DB_BACKEND)")
+    args = parser.parse_args()
+
+    db = open_driver(args.backend)
+    started = time.perf_counter()
+    try:
+        expired = db.expire_subscriptions()
+    except DataError as e:
+        sys.exit(f"Subscription expiry failed: {e}")
+    finally:
+        db.close()
+    print(f"{expired} lapsed subscriptions deactivated in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Reusable Tk widgets backed by the background database worker."""
+import tkinter as tk
+from tkinter import ttk
+
+from dal.base import GRID_PAGE_SIZE
+from dal.metrics import action
+
+
+class PagedGrid:
+    """Server-side sorted, filtered and paged view over a ``ttk.Treeview``.
+
+    The tree only ever holds one page. Clicking a heading sorts by that
+    column (clicking it again reverses the order), pressing Return in the
+    entry above a column filters by it, and the page bar steps through the
+    results. Each of these fetches the page through ``fetch_page(filters,
+    sort, descending, offset, limit, after)`` on the worker, so ordering,
+    filtering and paging all happen in the database (``Driver.grid_page``);
+    ``after`` is the last row of the page before, which lets the default
+    order seek to the page by key rather than count past ``offset`` rows.
+    ``fields`` are the source columns shown in the tree's columns, in order;
+    one row more than a page is fetched to tell whether there is a next page.
+
+    The caller lays out ``filter_bar`` above the tree and ``page_bar`` below it.
+    """
+
+    ARROWS = {False: " ▲", True: " ▼"}
+
+    def __init__(self, tree, fields, worker, tag, fetch_page, page_size=GRID_PAGE_SIZE, on_error=None):
+        self.tree = tree
+        self.fields = dict(zip(tree["columns"], fields))
+        self.worker = worker
+        self.tag = tag
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.on_error = on_error
+        self.sort = None
+        self.descending = False
+        self.offset = 0
+        # Last row of each page before the current one, for Next and Prev
+        self._afters = []
+        self._last_row = None
+        self._generation = 0
+        self._task = None
+        self.headings = {column: tree.heading(column, "text") for column in tree["columns"]}
+        for column in tree["columns"]:
+            tree.heading(column, command=lambda column=column: self.sort_by(column))
+
+        # One entry per column, kept lined up under its heading
+        self.filter_bar = ttk.Frame(tree.master, height=24)
+        self.filters = {}
+        for column in tree["columns"]:
+            entry = ttk.Entry(self.filter_bar)
+            entry.bind("<Return>", lambda event: self.apply_filters())
+            self.filters[column] = entry
+        tree.bind("<Configure>", self._place_filters, add="+")
+        tree.bind("<ButtonRelease-1>", self._place_filters, add="+")
+
+        self.page_bar = ttk.Frame(tree.master)
+        self.prev_button = ttk.Button(self.page_bar, text="< Prev", state="disabled", command=lambda: self.turn(-1))
+        self.prev_button.pack(side="left", padx=5)
+        self.page_var = tk.StringVar()
+        ttk.Label(self.page_bar, textvariable=self.page_var).pack(side="left", padx=5)
+        self.next_button = ttk.Button(self.page_bar, text="Next >", state="disabled", command=lambda: self.turn(1))
+        self.next_button.pack(side="left", padx=5)
+        ttk.Button(self.page_bar, text="Clear Filters", command=self.clear_filters).pack(side="left", padx=5)
+
+    def _place_filters(self, event=None):
+        x = 0
+        for column, entry in self.filters.items():
+            width = self.tree.column(column, "width")
+            entry.place(x=x, y=0, width=width, relheight=1)
+            x += width
+
+    def sort_by(self, column):
+        if self.sort == column:
+            self.descending = not self.descending
+        else:
+            self.sort, self.descending = column, False
+        self._show_sort()
+        self.apply_filters()
+
+    def _show_sort(self):
+        for column, text in self.headings.items():
+            self.tree.heading(column, text=text + (self.ARROWS[self.descending] if column == self.sort else ""))
+
+    def apply_filters(self):
+        self.offset = 0
+        self._afters = []
+        self.refresh()
+
+    def clear_filters(self):
+        for entry in self.filters.values():
+            entry.delete(0, tk.END)
+        self.apply_filters()
+
+    def reset(self):
+        """Back to the first page in the default order, keeping the filters, e.g. for a new search."""
+        self.sort, self.descending = None, False
+        self._show_sort()
+        self.apply_filters()
+
+    def turn(self, step):
+        if step > 0:
+            self._afters.append(self._last_row)
+        elif self._afters:
+            self._afters.pop()
+        self.offset = max(0, self.offset + step * self.page_size)
+        self.refresh()
+
+    def refresh(self):
+        """Fetch the current page again."""
+        # Only this grid's own fetch is dropped; other work under the tag (e.g. totals) carries on
+        if self._task is not None:
+            self._task.future.cancel()
+        self._generation += 1
+        generation = self._generation
+        filters = {self.fields[column]: entry.get().strip() for column, entry in self.filters.items() if entry.get().strip()}
+        offset = self.offset
+        after = self._afters[-1] if self._afters else None
+
+        def done(rows):
+            if generation != self._generation:
+                return
+            self._task = None
+            if not rows and offset:
+                # The page emptied since it was shown, e.g. its last rows were returned: step back
+                self.turn(-1)
+                return
+            self._show(rows, offset)
+
+        def failed(e):
+            if generation == self._generation:
+                self._task = None
+                if self.on_error:
+                    self.on_error(e)
+
+        # Sorting, filtering and paging count as "<tag>_grid"; a refresh keeps the action that asked for it
+        with action(f"{self.tag}_grid", inherit=True):
+            self._task = self.worker.submit(self.fetch_page, filters, self.fields.get(self.sort), self.descending,
+                                            offset, self.page_size + 1, after, on_success=done, on_error=failed,
+                                            tag=self.tag)
+
+    def _show(self, rows, offset):
+        self.tree.delete(*self.tree.get_children())
+        # Rows may carry columns the tree does not show, e.g. gear stock for customers
+        shown = rows[:self.page_size]
+        self._last_row = shown[-1] if shown else None
+        for row in shown:
+            self.tree.insert("", "end", values=row[:len(self.fields)])
+        page = offset // self.page_size + 1
+        self.page_var.set(f"Page {page}: rows {offset + 1}-{offset + len(shown)}" if shown else "No matching rows")
+        self.prev_button.state(["!disabled"] if offset else ["disabled"])
+        self.next_button.state(["!disabled"] if len(rows) > self.page_size else ["disabled"])